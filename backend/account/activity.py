@@ -0,0 +1,137 @@
+import json
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from submission.models import JudgeStatus, Submission
+from .models import UserActivity
+
+# submissions in these states were not judged (yet), the dispatcher does not count them either
+UNJUDGED_RESULTS = (JudgeStatus.PENDING, JudgeStatus.JUDGING, JudgeStatus.SYSTEM_ERROR)
+
+
+def _merge_counts(column):
+    # add the counts of EXCLUDED.column to the stored ones key by key, the deltas may be negative
+    return f"{column} = user_activity.{column} || (SELECT COALESCE(jsonb_object_agg(" \
+           f"key, COALESCE((user_activity.{column} ->> key)::int, 0) + value::int), '{{}}') " \
+           f"FROM jsonb_each_text(EXCLUDED.{column}))"
+
+
+_RECORD_SQL = "INSERT INTO user_activity " \
+              "(user_id, date, submission_number, accepted_number, solved_number, languages, difficulties) " \
+              "VALUES (%s, %s, %s, %s, %s, %s, %s) ON CONFLICT (user_id, date) DO UPDATE SET " \
+              "submission_number = user_activity.submission_number + EXCLUDED.submission_number, " \
+              "accepted_number = user_activity.accepted_number + EXCLUDED.accepted_number, " \
+              "solved_number = user_activity.solved_number + EXCLUDED.solved_number, " \
+              f"{_merge_counts('languages')}, {_merge_counts('difficulties')}"
+
+
+def record_activity(user_id, create_time, submission_number=0, accepted_number=0, language=None, difficulty=None):
+    """
+    Add to the activity of the day of create_time in a single upsert, so concurrent judges do not lose counts
+    :param language: counted once per submission if submission_number is set
+    :param difficulty: if set, a problem of this difficulty was solved for the first time
+    """
+    languages = {language: submission_number} if language and submission_number else {}
+    difficulties = {difficulty: 1} if difficulty else {}
+    with connection.cursor() as cursor:
+        cursor.execute(_RECORD_SQL, [user_id, timezone.localdate(create_time), submission_number, accepted_number,
+                                     1 if difficulty else 0, json.dumps(languages), json.dumps(difficulties)])
+
+
+class UserActivityBuilder(object):
+    """
+    Rebuild UserActivity from the submission history, following the same rules as JudgeDispatcher.
+    Submissions are streamed ordered by (user_id, create_time), so only the days of one user are held in memory,
+    and the rows of every chunk_size users are replaced in one transaction.
+    """
+    chunk_size = 2000
+
+    def __init__(self, user_ids=None):
+        self.user_ids = user_ids
+
+    def _submissions(self):
+        submissions = Submission.objects.exclude(result__in=UNJUDGED_RESULTS)
+        if self.user_ids is not None:
+            submissions = submissions.filter(user_id__in=self.user_ids)
+        return submissions.order_by("user_id", "create_time") \
+            .values_list("user_id", "create_time", "result", "language", "contest_id", "problem_id",
+                         "problem__difficulty") \
+            .iterator(chunk_size=self.chunk_size)
+
+    def _user_rows(self):
+        """
+        :return: iterator of (user_id, [UserActivity])
+        """
+        user_id, days, solved = None, {}, set()
+        for submission_user_id, create_time, result, language, contest_id, problem_id, difficulty in self._submissions():
+            if submission_user_id != user_id:
+                if user_id is not None:
+                    yield user_id, list(days.values())
+                user_id, days, solved = submission_user_id, {}, set()
+            date = timezone.localdate(create_time)
+            if date not in days:
+                days[date] = UserActivity(user_id=user_id, date=date, languages=Counter(),
+                                          difficulties=Counter())
+            day = days[date]
+            day.submission_number += 1
+            day.languages[language] += 1
+            if result == JudgeStatus.ACCEPTED:
+                day.accepted_number += 1
+                if contest_id is None and problem_id not in solved:
+                    solved.add(problem_id)
+                    day.solved_number += 1
+                    day.difficulties[difficulty] += 1
+        if user_id is not None:
+            yield user_id, list(days.values())
+
+    def _write(self, user_ids, rows):
+        with transaction.atomic():
+            UserActivity.objects.filter(user_id__in=user_ids).delete()
+            UserActivity.objects.bulk_create(rows, batch_size=self.chunk_size)
+
+    def build(self):
+        """
+        :return: number of activity rows written
+        """
+        if self.user_ids is not None:
+            # users without judged submissions keep no rows
+            UserActivity.objects.filter(user_id__in=self.user_ids).delete()
+        count = 0
+        user_ids, rows = [], []
+        for user_id, user_rows in self._user_rows():
+            user_ids.append(user_id)
+            rows.extend(user_rows)
+            if len(user_ids) >= self.chunk_size:
+                self._write(user_ids, rows)
+                count += len(rows)
+                user_ids, rows = [], []
+        if user_ids:
+            self._write(user_ids, rows)
+            count += len(rows)
+        return count
+
+
+def activity_summary(user_id, days):
+    """
+    One read of the (user_id, date) index
+    :return: {"calendar": daily counts, "languages": .., "difficulties": .., "total": ..} of the last `days` days
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+    calendar = []
+    languages, difficulties = Counter(), Counter()
+    total = {"submission_number": 0, "accepted_number": 0, "solved_number": 0}
+    for date, submission_number, accepted_number, solved_number, day_languages, day_difficulties in \
+            UserActivity.objects.filter(user_id=user_id, date__gte=since).order_by("date") \
+            .values_list("date", "submission_number", "accepted_number", "solved_number", "languages",
+                         "difficulties"):
+        calendar.append({"date": date.isoformat(), "submission_number": submission_number,
+                         "accepted_number": accepted_number, "solved_number": solved_number})
+        languages.update(day_languages)
+        difficulties.update(day_difficulties)
+        total["submission_number"] += submission_number
+        total["accepted_number"] += accepted_number
+        total["solved_number"] += solved_number
+    return {"calendar": calendar, "languages": dict(languages), "difficulties": dict(difficulties), "total": total}
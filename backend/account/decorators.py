@@ -3,9 +3,11 @@ import hashlib
 import time
 
 from problem.models import Problem
+from contest.cache import get_contest
 from contest.models import Contest, ContestType, ContestStatus, ContestRuleType
 from utils.api import JSONResponse, APIError
 from utils.constants import CONTEST_PASSWORD_SESSION_KEY
+from utils.shortcuts import check_is_id
 from .models import ProblemPermission
 
 
@@ -105,10 +107,12 @@ def check_contest_permission(check_type="details"):
                 contest_id = request.GET.get("contest_id")
             if not contest_id:
                 return self.error("Parameter error, contest_id is required")
+            if not check_is_id(contest_id):
+                return self.error("Contest %s doesn't exist" % contest_id)
 
             try:
                 # use self.contest to avoid query contest again in view.
-                self.contest = Contest.objects.select_related("created_by").get(id=contest_id, visible=True)
+                self.contest = get_contest(int(contest_id))
             except Contest.DoesNotExist:
                 return self.error("Contest %s doesn't exist" % contest_id)
 
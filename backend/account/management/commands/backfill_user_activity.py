@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from account.activity import UserActivityBuilder
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily activity of users from their submission history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user_id", type=int, nargs="*", help="only these users, all users by default")
+        parser.add_argument("--chunk_size", type=int, default=UserActivityBuilder.chunk_size)
+
+    def handle(self, *args, **options):
+        builder = UserActivityBuilder(user_ids=options["user_id"])
+        builder.chunk_size = options["chunk_size"]
+        start = time.time()
+        count = builder.build()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} activity rows in {time.time() - start:.2f}s"))
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-19 16:00
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0017_auto_20210703_1612'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('submission_number', models.IntegerField(default=0)),
+                ('accepted_number', models.IntegerField(default=0)),
+                ('solved_number', models.IntegerField(default=0)),
+                ('languages', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('difficulties', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_activity',
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
@@ -109,3 +109,25 @@ class UserProfile(models.Model):
 
     class Meta:
         db_table = "user_profile"
+
+
+class UserActivity(models.Model):
+    """
+    Daily aggregate of the judged submissions of a user, the date is the local date of the submission create_time.
+    Updated incrementally by the judge dispatcher and rebuilt by the backfill_user_activity command
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    date = models.DateField()
+    submission_number = models.IntegerField(default=0)
+    accepted_number = models.IntegerField(default=0)
+    # problems outside of contests accepted for the first time, like UserProfile.accepted_number
+    solved_number = models.IntegerField(default=0)
+    # {"C++": 3, "Python3": 1}
+    languages = JSONField(default=dict)
+    # {"Level1": 1}, solved problems by difficulty
+    difficulties = JSONField(default=dict)
+
+    class Meta:
+        db_table = "user_activity"
+        # the unique index on (user_id, date) serves the profile reads
+        unique_together = (("user", "date"),)
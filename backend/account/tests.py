@@ -10,8 +10,12 @@ from django.utils.timezone import now
 from utils.api.tests import APIClient, APITestCase
 from utils.shortcuts import rand_str
 from options.options import SysOptions
+from problem.models import Problem
+from submission.models import JudgeStatus, Submission
+from submission.tests import DEFAULT_PROBLEM_DATA, DEFAULT_SUBMISSION_DATA
 
-from .models import AdminType, ProblemPermission, User
+from .activity import UserActivityBuilder, record_activity
+from .models import AdminType, ProblemPermission, User, UserActivity
 
 
 class PermissionDecoratorTest(APITestCase):
@@ -199,6 +203,62 @@ class UserProfileAPITest(APITestCase):
         self.assertEqual(data["language"], "en-US")
 
 
+class UserActivityAPITest(APITestCase):
+    def setUp(self):
+        self.user = self.create_user("2020222000", "test123")
+        problem_data = deepcopy(DEFAULT_PROBLEM_DATA)
+        problem_data.pop("tags")
+        self.problem = Problem.objects.create(created_by=self.user, **problem_data)
+        self.url = self.reverse("user_activity_api")
+
+    def _create_submission(self, result, days_ago, language="C"):
+        data = deepcopy(DEFAULT_SUBMISSION_DATA)
+        data.update({"problem_id": self.problem.id, "user_id": self.user.id, "username": self.user.username,
+                     "result": result, "language": language})
+        submission = Submission.objects.create_with_detail(**data)
+        Submission.objects.filter(id=submission.id).update(create_time=now() - timedelta(days=days_ago))
+        return Submission.objects.get(id=submission.id)
+
+    def _record(self, submission, solved=False):
+        # what JudgeDispatcher.update_user_activity records for a judged submission
+        record_activity(self.user.id, submission.create_time, submission_number=1,
+                        accepted_number=int(submission.result == JudgeStatus.ACCEPTED), language=submission.language,
+                        difficulty=self.problem.difficulty if solved else None)
+
+    def _rows(self):
+        return list(UserActivity.objects.filter(user=self.user).order_by("date")
+                    .values_list("date", "submission_number", "accepted_number", "solved_number", "languages",
+                                 "difficulties"))
+
+    def test_incremental_matches_backfill(self):
+        self._record(self._create_submission(JudgeStatus.WRONG_ANSWER, 2, language="C++"))
+        self._record(self._create_submission(JudgeStatus.ACCEPTED, 2), solved=True)
+        self._record(self._create_submission(JudgeStatus.ACCEPTED, 0))
+        self._create_submission(JudgeStatus.PENDING, 0)
+        incremental = self._rows()
+        self.assertEqual(len(incremental), 2)
+        self.assertEqual(incremental[0][1:], (2, 1, 1, {"C": 1, "C++": 1}, {"Level1": 1}))
+        self.assertEqual(incremental[1][1:], (1, 1, 0, {"C": 1}, {}))
+
+        self.assertEqual(UserActivityBuilder().build(), 2)
+        self.assertEqual(self._rows(), incremental)
+
+    def test_get_activity(self):
+        self._record(self._create_submission(JudgeStatus.ACCEPTED, 400), solved=True)
+        self._record(self._create_submission(JudgeStatus.WRONG_ANSWER, 0))
+        resp = self.client.get(self.url, data={"username": self.user.username, "days": "30"})
+        self.assertSuccess(resp)
+        data = resp.data["data"]
+        # the submission of 400 days ago is out of the range
+        self.assertEqual(len(data["calendar"]), 1)
+        self.assertEqual(data["languages"], {"C": 1})
+        self.assertEqual(data["difficulties"], {})
+        self.assertEqual(data["total"], {"submission_number": 1, "accepted_number": 0, "solved_number": 0})
+
+    def test_invalid_days(self):
+        self.assertFailed(self.client.get(self.url, data={"days": "0"}), "Invalid days")
+
+
 @mock.patch("account.views.oj.send_email_async.send")
 class ApplyResetPasswordAPITest(CaptchaTest):
     def setUp(self):
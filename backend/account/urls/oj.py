@@ -3,7 +3,7 @@ from django.conf.urls import url
 from ..views.oj import (ApplyResetPasswordAPI, ResetPasswordAPI,
                         UserChangePasswordAPI, UserRegisterAPI, EmailAuthAPI, UserChangeEmailAPI,
                         UserLoginAPI, UserLogoutAPI, UsernameOrEmailCheck,
-                        AvatarUploadAPI, UserProfileAPI, UserSettingAPI)
+                        AvatarUploadAPI, UserProfileAPI, UserSettingAPI, UserActivityAPI)
 
 from utils.captcha.views import CaptchaAPIView
 
@@ -19,6 +19,7 @@ urlpatterns = [
     url(r"^captcha/?$", CaptchaAPIView.as_view(), name="show_captcha"),
     url(r"^check_username_or_email", UsernameOrEmailCheck.as_view(), name="check_username_or_email"),
     url(r"^profile/?$", UserProfileAPI.as_view(), name="user_profile_api"),
+    url(r"^profile/activity/?$", UserActivityAPI.as_view(), name="user_activity_api"),
     url(r"^user/?$", UserSettingAPI.as_view(), name="user_setting_api"),
     url(r"^upload_avatar/?$", AvatarUploadAPI.as_view(), name="avatar_upload_api"),
 ]
@@ -16,6 +16,7 @@ from options.options import SysOptions
 from utils.api import APIView, validate_serializer
 from utils.captcha import Captcha
 from utils.shortcuts import rand_str
+from ..activity import activity_summary
 from ..decorators import login_required
 from ..models import User, UserProfile
 from ..serializers import (ApplyResetPasswordSerializer, ResetPasswordSerializer,
@@ -77,6 +78,43 @@ class UserProfileAPI(APIView):
         return self.success(UserProfileSerializer(user_profile, show_real_name=True).data)
 
 
+class UserActivityAPI(APIView):
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                name="username",
+                in_=openapi.IN_QUERY,
+                description="Specific user activity with `username`",
+                type=openapi.TYPE_STRING,
+            ),
+            openapi.Parameter(
+                name="days",
+                in_=openapi.IN_QUERY,
+                description="Days of the calendar and of the totals, 1 to 366, default 366",
+                type=openapi.TYPE_INTEGER,
+            ),
+        ],
+        operation_description="Daily submission calendar, language mix and solved problems by difficulty of a user",
+    )
+    def get(self, request):
+        if not request.user.is_authenticated:
+            return self.success()
+        try:
+            days = int(request.GET.get("days", "366"))
+            if not 1 <= days <= 366:
+                raise ValueError()
+        except ValueError:
+            return self.error("Invalid days")
+        username = request.GET.get("username")
+        if username:
+            user_id = User.objects.filter(username=username, is_disabled=False).values_list("id", flat=True).first()
+            if user_id is None:
+                return self.error("User does not exist")
+        else:
+            user_id = request.user.id
+        return self.success(activity_summary(user_id, days))
+
+
 class UserSettingAPI(APIView):
     @validate_serializer(EditUserSettingSerializer)
     @login_required
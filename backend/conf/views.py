@@ -25,7 +25,7 @@ from problem.models import Problem
 from submission.models import Submission
 from utils.api import APIView, CSRFExemptAPIView, validate_serializer
 from utils.shortcuts import send_email, get_env
-from utils.xss_filter import XSSHtml
+from utils.xss_filter import clean_html
 from .models import JudgeServer
 from .serializers import (CreateEditWebsiteConfigSerializer,
                           CreateSMTPConfigSerializer, EditSMTPConfigSerializer,
@@ -120,8 +120,7 @@ class WebsiteConfigAPI(APIView):
     def post(self, request):
         for k, v in request.data.items():
             if k == "website_footer":
-                with XSSHtml() as parser:
-                    v = parser.clean(v)
+                v = clean_html(v)
             setattr(SysOptions, k, v)
         return self.success()
 
@@ -0,0 +1,177 @@
+from array import array
+
+import numpy as np
+from django.db.models import Q
+
+from account.models import AdminType, User
+from submission.models import JudgeStatus, Submission
+
+# every failed attempt before the first AC costs 20 minutes in ACM rule
+ACM_PENALTY_SECONDS = 20 * 60
+
+
+class ContestAnalytics(object):
+    """
+    Columnar view of the judged submissions of a contest, all statistics are computed in vectorized passes.
+    Arrays are ordered by create_time and hold one element per submission:
+      - users / problems: dense indexes into self.user_ids / self.problem_ids
+      - results: JudgeStatus
+      - times: seconds since contest start
+      - scores: OI score of the submission
+    """
+    chunk_size = 2000
+    # submissions in these states have not been counted into the rank by the dispatcher yet
+    skipped_results = (JudgeStatus.PENDING, JudgeStatus.JUDGING)
+
+    def __init__(self, user_ids, problem_ids, results, times, scores):
+        self.user_ids, self.users = np.unique(np.asarray(user_ids, dtype=np.int64), return_inverse=True)
+        self.problem_ids, self.problems = np.unique(np.asarray(problem_ids, dtype=np.int64), return_inverse=True)
+        self.results = np.asarray(results, dtype=np.int8)
+        self.times = np.asarray(times, dtype=np.float64)
+        self.scores = np.asarray(scores, dtype=np.int64)
+        self.user_count = len(self.user_ids)
+        self.problem_count = len(self.problem_ids)
+        # one cell per (user, problem) pair
+        self.keys = self.users * self.problem_count + self.problems
+
+    @classmethod
+    def from_contest(cls, contest):
+        admin_ids = User.objects.filter(Q(id=contest.created_by_id) | Q(admin_type=AdminType.SUPER_ADMIN)) \
+            .values_list("id", flat=True)
+        submissions = Submission.objects.filter(contest_id=contest.id,
+                                                create_time__gte=contest.start_time,
+                                                create_time__lte=contest.end_time) \
+            .exclude(result__in=cls.skipped_results) \
+            .exclude(user_id__in=list(admin_ids)) \
+            .order_by("create_time") \
+            .values_list("user_id", "problem_id", "result", "create_time", "statistic_info") \
+            .iterator(chunk_size=cls.chunk_size)
+
+        user_ids, problem_ids, results, times, scores = array("q"), array("q"), array("b"), array("d"), array("q")
+        for user_id, problem_id, result, create_time, statistic_info in submissions:
+            user_ids.append(user_id)
+            problem_ids.append(problem_id)
+            results.append(result)
+            times.append((create_time - contest.start_time).total_seconds())
+            scores.append(statistic_info.get("score", 0))
+        return cls(user_ids, problem_ids, results, times, scores)
+
+    def _first_ac(self):
+        """
+        :return: index of the first accepted submission of every solved (user, problem) pair, in time order
+        """
+        ac_index = np.flatnonzero(self.results == JudgeStatus.ACCEPTED)
+        _, first = np.unique(self.keys[ac_index], return_index=True)
+        return np.sort(ac_index[first])
+
+    def first_bloods(self):
+        """
+        :return: {problem_id: (user_id, seconds since contest start)} of the first accepted submission of each problem
+        """
+        first_ac = self._first_ac()
+        _, first_blood = np.unique(self.problems[first_ac], return_index=True)
+        return {int(self.problem_ids[self.problems[index]]): (int(self.user_ids[self.users[index]]), float(self.times[index]))
+                for index in first_ac[first_blood]}
+
+    def acm_standings(self):
+        """
+        Same rules as JudgeDispatcher._update_acm_contest_rank:
+        submissions after the first AC of a problem are ignored, compile errors are not penalized.
+        :return: list of rank dicts ordered by (accepted_number desc, total_time asc)
+        """
+        cells = self.user_count * self.problem_count
+        first_ac = self._first_ac()
+        first_ac_of_key = np.full(cells, len(self.keys), dtype=np.int64)
+        first_ac_of_key[self.keys[first_ac]] = first_ac
+        counted = np.arange(len(self.keys)) <= first_ac_of_key[self.keys]
+
+        error_mask = counted & (self.results != JudgeStatus.ACCEPTED) & (self.results != JudgeStatus.COMPILE_ERROR)
+        error_number = np.bincount(self.keys[error_mask], minlength=cells)
+        submission_number = np.bincount(self.users[counted], minlength=self.user_count)
+
+        solved_keys = self.keys[first_ac]
+        ac_time = np.zeros(cells)
+        ac_time[solved_keys] = self.times[first_ac]
+        solved_users = solved_keys // self.problem_count
+        accepted_number = np.bincount(solved_users, minlength=self.user_count)
+        total_time = np.bincount(solved_users, minlength=self.user_count,
+                                 weights=ac_time[solved_keys] + error_number[solved_keys] * ACM_PENALTY_SECONDS)
+
+        is_first_ac = np.zeros(cells, dtype=bool)
+        _, first_blood = np.unique(self.problems[first_ac], return_index=True)
+        is_first_ac[solved_keys[first_blood]] = True
+
+        solved = np.zeros(cells, dtype=bool)
+        solved[solved_keys] = True
+        tried_keys = np.unique(self.keys)
+        problem_keys = [str(problem_id) for problem_id in self.problem_ids.tolist()]
+        submission_info = [{} for _ in range(self.user_count)]
+        columns = zip(tried_keys.tolist(), solved[tried_keys].tolist(), ac_time[tried_keys].tolist(),
+                      error_number[tried_keys].tolist(), is_first_ac[tried_keys].tolist())
+        for key, is_ac, time, errors, first in columns:
+            user, problem = divmod(key, self.problem_count)
+            submission_info[user][problem_keys[problem]] = {"is_ac": is_ac, "ac_time": time,
+                                                            "error_number": errors, "is_first_ac": first}
+
+        order = np.lexsort((total_time, -accepted_number))
+        return [{"user_id": int(self.user_ids[user]),
+                 "submission_number": int(submission_number[user]),
+                 "accepted_number": int(accepted_number[user]),
+                 "total_time": int(total_time[user]),
+                 "submission_info": submission_info[user]} for user in order]
+
+    def oi_standings(self):
+        """
+        Same rules as JudgeDispatcher._update_oi_contest_rank: the latest score of each problem counts.
+        :return: list of rank dicts ordered by total_score desc
+        """
+        # np.unique returns the first occurrence, so search the reversed arrays to get the latest submission
+        _, last = np.unique(self.keys[::-1], return_index=True)
+        last = len(self.keys) - 1 - last
+        last_keys = self.keys[last]
+        last_scores = self.scores[last]
+        total_score = np.bincount(last_keys // self.problem_count, minlength=self.user_count, weights=last_scores)
+
+        problem_keys = [str(problem_id) for problem_id in self.problem_ids.tolist()]
+        submission_info = [{} for _ in range(self.user_count)]
+        for key, score in zip(last_keys.tolist(), last_scores.tolist()):
+            user, problem = divmod(key, self.problem_count)
+            submission_info[user][problem_keys[problem]] = score
+
+        order = np.argsort(-total_score, kind="stable")
+        return [{"user_id": int(self.user_ids[user]),
+                 "submission_number": 0,
+                 "total_score": int(total_score[user]),
+                 "submission_info": submission_info[user]} for user in order]
+
+    def problem_statistics(self, bin_seconds=10 * 60):
+        """
+        Per problem statistics for post contest reports
+        :param bin_seconds: width of a bin in the solve time histogram
+        :return: {problem_id: {...}}
+        """
+        first_ac = self._first_ac()
+        submission_number = np.bincount(self.problems, minlength=self.problem_count)
+        accepted_number = np.bincount(self.problems[self.results == JudgeStatus.ACCEPTED], minlength=self.problem_count)
+        tried_keys = np.unique(self.keys)
+        tried_user_number = np.bincount(tried_keys % self.problem_count, minlength=self.problem_count)
+        solved_user_number = np.bincount(self.problems[first_ac], minlength=self.problem_count)
+        first_bloods = self.first_bloods()
+
+        bin_number = int(self.times.max() // bin_seconds) + 1 if len(self.times) else 1
+        histograms = np.zeros((self.problem_count, bin_number), dtype=np.int64)
+        np.add.at(histograms, (self.problems[first_ac], (self.times[first_ac] // bin_seconds).astype(np.int64)), 1)
+
+        ret = {}
+        for problem in range(self.problem_count):
+            problem_id = int(self.problem_ids[problem])
+            first_blood = first_bloods.get(problem_id)
+            ret[problem_id] = {
+                "submission_number": int(submission_number[problem]),
+                "accepted_number": int(accepted_number[problem]),
+                "tried_user_number": int(tried_user_number[problem]),
+                "solved_user_number": int(solved_user_number[problem]),
+                "first_blood": None if first_blood is None else {"user_id": first_blood[0], "time": first_blood[1]},
+                "solve_time_histogram": histograms[problem].tolist()
+            }
+        return ret
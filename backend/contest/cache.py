@@ -0,0 +1,63 @@
+from django.utils.timezone import now
+
+from problem.models import Problem
+from problem.serializers import ProblemSerializer, ProblemSafeSerializer
+from utils.cache import cache, get_or_build
+from utils.constants import CacheKey
+from .models import Contest
+
+# contest rows only change through the admin api, which invalidates them
+CONTEST_CACHE_TIMEOUT = 60 * 60
+# problem lists carry submission counters, so they are only cached for a short time
+CONTEST_PROBLEMS_CACHE_TIMEOUT = 2 * 60
+
+
+def _contest_key(contest_id):
+    return f"{CacheKey.contest_cache}:{contest_id}"
+
+
+def _contest_problems_key(contest_id, details):
+    return f"{CacheKey.contest_problems_cache}:{contest_id}:{'details' if details else 'safe'}"
+
+
+def _load_contest(contest_id):
+    return Contest.objects.select_related("created_by").get(id=contest_id, visible=True)
+
+
+def _serialize_contest_problems(contest, details):
+    serializer = ProblemSerializer if details else ProblemSafeSerializer
+    problems = Problem.objects.select_related("created_by", "contest").filter(contest=contest, visible=True)
+    return list(serializer(problems, many=True).data)
+
+
+def get_contest(contest_id):
+    """
+    Visible contest with created_by loaded, raise Contest.DoesNotExist like Contest.objects.get
+    """
+    return get_or_build(_contest_key(contest_id), lambda: _load_contest(contest_id), CONTEST_CACHE_TIMEOUT)
+
+
+def get_contest_problems(contest, details):
+    """
+    :param details: use ProblemSerializer if True, otherwise ProblemSafeSerializer
+    """
+    return get_or_build(_contest_problems_key(contest.id, details),
+                        lambda: _serialize_contest_problems(contest, details),
+                        CONTEST_PROBLEMS_CACHE_TIMEOUT)
+
+
+def warm_contest_cache(contest):
+    """
+    Build the caches read by every participant at start_time, they stay valid until shortly after the start
+    """
+    until_start = max(int((contest.start_time - now()).total_seconds()), 0)
+    cache.set(_contest_key(contest.id), contest, timeout=CONTEST_CACHE_TIMEOUT + until_start)
+    for details in (True, False):
+        cache.set(_contest_problems_key(contest.id, details), _serialize_contest_problems(contest, details),
+                  timeout=CONTEST_PROBLEMS_CACHE_TIMEOUT + until_start)
+
+
+def invalidate_contest_cache(contest_id):
+    cache.delete_many([_contest_key(contest_id),
+                       _contest_problems_key(contest_id, True),
+                       _contest_problems_key(contest_id, False)])
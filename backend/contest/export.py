@@ -0,0 +1,142 @@
+import csv
+import tempfile
+import zipfile
+
+import xlsxwriter
+
+from account.models import AdminType, User
+from submission.archive import read_archived_detail
+from submission.compression import decompress_code
+from submission.models import JudgeStatus, Submission
+from utils.shortcuts import ZipStream
+from .models import ACMContestRank, ContestRuleType, OIContestRank
+
+
+class _EchoBuffer(object):
+    """
+    csv.writer writes into this buffer and gets the line back, so every row can be yielded as soon as it is built
+    """
+    def write(self, value):
+        return value
+
+
+def _format_seconds(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class ContestRankExporter(object):
+    """
+    Export the final standings of a contest.
+    Rank rows are read with a server-side cursor and written out one by one,
+    the whole contest is never materialized in memory.
+    """
+    chunk_size = 1000
+
+    def __init__(self, contest):
+        self.contest = contest
+        self.problems = list(contest.problem_set.values_list("id", "_id"))
+
+    def header(self):
+        if self.contest.rule_type == ContestRuleType.ACM:
+            columns = ["Rank", "Username", "Real Name", "Accepted", "Penalty"]
+        else:
+            columns = ["Rank", "Username", "Real Name", "Total Score"]
+        return columns + [display_id for _, display_id in self.problems]
+
+    def _acm_cell(self, info):
+        if not info:
+            return ""
+        if info["is_ac"]:
+            errors = f"+{info['error_number']}" if info["error_number"] else "+"
+            return f"{errors} {_format_seconds(info['ac_time'])}"
+        return f"-{info['error_number']}" if info["error_number"] else ""
+
+    def rows(self):
+        if self.contest.rule_type == ContestRuleType.ACM:
+            ranks = ACMContestRank.objects.order_by("-accepted_number", "total_time") \
+                .values_list("user__username", "user__userprofile__real_name",
+                             "accepted_number", "total_time", "submission_info")
+        else:
+            ranks = OIContestRank.objects.order_by("-total_score") \
+                .values_list("user__username", "user__userprofile__real_name", "total_score", "submission_info")
+        ranks = ranks.filter(contest=self.contest, user__is_disabled=False).iterator(chunk_size=self.chunk_size)
+
+        for index, rank in enumerate(ranks, start=1):
+            submission_info = rank[-1]
+            if self.contest.rule_type == ContestRuleType.ACM:
+                username, real_name, accepted_number, total_time, _ = rank
+                row = [index, username, real_name or "", accepted_number, _format_seconds(total_time)]
+                row += [self._acm_cell(submission_info.get(str(problem_id))) for problem_id, _ in self.problems]
+            else:
+                username, real_name, total_score, _ = rank
+                row = [index, username, real_name or "", total_score]
+                row += [submission_info.get(str(problem_id), "") for problem_id, _ in self.problems]
+            yield row
+
+    def iter_csv(self):
+        writer = csv.writer(_EchoBuffer())
+        # BOM, so that Excel opens the file as utf-8
+        yield "\ufeff" + writer.writerow(self.header())
+        for row in self.rows():
+            yield writer.writerow(row)
+
+    def write_xlsx(self):
+        """
+        :return: a temporary file holding the workbook, it is deleted once closed
+        """
+        file = tempfile.TemporaryFile()
+        # constant_memory flushes every row to disk once the next row is started
+        workbook = xlsxwriter.Workbook(file, {"constant_memory": True})
+        worksheet = workbook.add_worksheet()
+        worksheet.write_row(0, 0, self.header())
+        for index, row in enumerate(self.rows(), start=1):
+            worksheet.write_row(index, 0, row)
+        workbook.close()
+        file.seek(0)
+        return file
+
+
+class ContestSubmissionExporter(object):
+    """
+    Zip of the latest accepted code of every user for every problem of a contest.
+    One DISTINCT ON query is read with a server-side cursor and every entry is yielded once it is compressed,
+    so neither the submissions nor the zip file are held in memory or on disk.
+    """
+    chunk_size = 500
+
+    def __init__(self, contest, exclude_admin=True):
+        self.contest = contest
+        self.exclude_admin = exclude_admin
+
+    def files(self):
+        id2display_id = dict(self.contest.problem_set.values_list("id", "_id"))
+        submissions = Submission.objects.filter(contest=self.contest, result=JudgeStatus.ACCEPTED)
+        if self.exclude_admin:
+            admins = User.objects.filter(admin_type__in=[AdminType.ADMIN, AdminType.SUPER_ADMIN]).values("id")
+            submissions = submissions.exclude(user_id__in=admins)
+        submissions = submissions.order_by("user_id", "problem_id", "-create_time") \
+            .distinct("user_id", "problem_id") \
+            .values_list("id", "create_time", "username", "problem_id", "detail__raw_code", "detail__compressed_code") \
+            .iterator(chunk_size=self.chunk_size)
+
+        for submission_id, create_time, username, problem_id, raw_code, compressed_code in submissions:
+            if compressed_code is not None:
+                code = decompress_code(compressed_code)
+            elif raw_code is not None:
+                code = raw_code
+            else:
+                archived = read_archived_detail(submission_id, create_time)
+                if archived is None:
+                    continue
+                code = decompress_code(archived[0])
+            yield f"{username}_{id2display_id[problem_id]}.txt", code
+
+    def iter_zip(self):
+        stream = ZipStream()
+        with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            for file_name, code in self.files():
+                zip_file.writestr(file_name, code)
+                yield stream.pop()
+        # central directory
+        yield stream.pop()
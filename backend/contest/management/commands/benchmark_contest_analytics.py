@@ -0,0 +1,75 @@
+import random
+import time
+from array import array
+
+from django.core.management.base import BaseCommand
+
+from contest.analytics import ACM_PENALTY_SECONDS, ContestAnalytics
+from submission.models import JudgeStatus
+
+
+def replay_acm_rank(submissions):
+    """
+    Row by row replay of JudgeDispatcher._update_acm_contest_rank, used as the baseline
+    """
+    ranks = {}
+    first_ac_problems = set()
+    for user_id, problem_id, result, ac_time in submissions:
+        rank = ranks.setdefault(user_id, {"user_id": user_id, "submission_number": 0, "accepted_number": 0,
+                                          "total_time": 0, "submission_info": {}})
+        info = rank["submission_info"].setdefault(str(problem_id), {"is_ac": False, "ac_time": 0,
+                                                                    "error_number": 0, "is_first_ac": False})
+        if info["is_ac"]:
+            continue
+        rank["submission_number"] += 1
+        if result == JudgeStatus.ACCEPTED:
+            rank["accepted_number"] += 1
+            info["is_ac"] = True
+            info["ac_time"] = ac_time
+            rank["total_time"] += ac_time + info["error_number"] * ACM_PENALTY_SECONDS
+            if problem_id not in first_ac_problems:
+                first_ac_problems.add(problem_id)
+                info["is_first_ac"] = True
+        elif result != JudgeStatus.COMPILE_ERROR:
+            info["error_number"] += 1
+    for rank in ranks.values():
+        rank["total_time"] = int(rank["total_time"])
+    return sorted(ranks.values(), key=lambda item: (-item["accepted_number"], item["total_time"], item["user_id"]))
+
+
+class Command(BaseCommand):
+    help = "Compare vectorized contest analytics with the row by row replay on generated submissions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--submissions", type=int, default=100000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--problems", type=int, default=12)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rand = random.Random(options["seed"])
+        results = [JudgeStatus.ACCEPTED, JudgeStatus.WRONG_ANSWER, JudgeStatus.COMPILE_ERROR,
+                   JudgeStatus.CPU_TIME_LIMIT_EXCEEDED, JudgeStatus.RUNTIME_ERROR]
+        duration = 5 * 60 * 60
+        times = sorted(rand.uniform(0, duration) for _ in range(options["submissions"]))
+        submissions = [(rand.randint(1, options["users"]), rand.randint(1, options["problems"]),
+                        rand.choice(results), t) for t in times]
+
+        start = time.time()
+        expected = replay_acm_rank(submissions)
+        row_cost = time.time() - start
+
+        # both sides start from submissions already loaded into memory, the way from_contest stores them
+        columns = (array("q", [item[0] for item in submissions]), array("q", [item[1] for item in submissions]),
+                   array("b", [item[2] for item in submissions]), array("d", times), array("q", [0] * len(times)))
+        start = time.time()
+        analytics = ContestAnalytics(*columns)
+        actual = analytics.acm_standings()
+        analytics.problem_statistics()
+        vectorized_cost = time.time() - start
+
+        if expected != sorted(actual, key=lambda item: (-item["accepted_number"], item["total_time"], item["user_id"])):
+            self.stdout.write(self.style.ERROR("Vectorized standings differ from the row by row replay"))
+            exit(1)
+        self.stdout.write(self.style.SUCCESS(f"{len(submissions)} submissions: row by row {row_cost:.3f}s, "
+                                             f"vectorized {vectorized_cost:.3f}s"))
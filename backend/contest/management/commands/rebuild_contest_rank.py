@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from contest.models import Contest
+from contest.rank import ContestRankRebuilder
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("--contest_id", type=int)
+
+    def handle(self, *args, **options):
+        contest_id = options["contest_id"]
+        if not contest_id:
+            self.stdout.write(self.style.ERROR("Invalid args"))
+            exit(1)
+
+        try:
+            contest = Contest.objects.get(id=contest_id)
+        except Contest.DoesNotExist:
+            self.stdout.write(self.style.ERROR(f"Contest {contest_id} does not exist"))
+            exit(1)
+
+        start = time.time()
+        count = ContestRankRebuilder(contest).rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} rank rows of contest {contest_id} "
+                                             f"in {time.time() - start:.2f}s"))
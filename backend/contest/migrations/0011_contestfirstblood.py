@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-19 15:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problem', '0014_problem_share_submission'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contest', '0010_auto_20190326_0201'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContestFirstBlood',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submit_time', models.DateTimeField()),
+                ('contest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contest.Contest')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='problem.Problem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'contest_first_blood',
+                'unique_together': {('contest', 'problem')},
+            },
+        ),
+    ]
@@ -1,10 +1,10 @@
 from utils.constants import ContestRuleType  # noqa
-from django.db import models
+from django.db import connection, models, transaction, IntegrityError
 from django.utils.timezone import now
 from utils.models import JSONField
 
 from utils.constants import ContestStatus, ContestType
-from account.models import User
+from account.models import AdminType, User
 from utils.models import RichTextField
 
 
@@ -60,6 +60,20 @@ class AbstractContestRank(models.Model):
     contest = models.ForeignKey(Contest, on_delete=models.CASCADE)
     submission_number = models.IntegerField(default=0)
 
+    # first key of the advisory locks on the rank of a contest, the second is the contest id
+    RANK_LOCK_KEY = 1
+
+    @classmethod
+    def lock_contest(cls, contest_id, shared=False):
+        """
+        Keep the judge of submissions from writing the rank rows of a contest while ContestRankRebuilder runs.
+        The verdicts take the lock shared, so they only wait for a rebuild and not for each other,
+        the rebuild takes it exclusive. The lock is held until the end of the current transaction.
+        """
+        function = "pg_advisory_xact_lock_shared" if shared else "pg_advisory_xact_lock"
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT {function}(%s, %s)", [cls.RANK_LOCK_KEY, contest_id])
+
     class Meta:
         abstract = True
 
@@ -88,6 +102,85 @@ class OIContestRank(AbstractContestRank):
         unique_together = (("user", "contest"),)
 
 
+class ContestFirstBlood(models.Model):
+    """
+    The first accepted submission of a contest problem.
+    The claim is keyed on submit time, so an earlier submission accepted later (e.g. by rejudge) takes it over.
+    """
+    contest = models.ForeignKey(Contest, on_delete=models.CASCADE)
+    problem = models.ForeignKey("problem.Problem", on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    submit_time = models.DateTimeField()
+
+    @staticmethod
+    def _earliest_accepted(contest_id, problem_id):
+        """
+        Same rules as ContestAnalytics: submissions of the contest time, contest admins excluded
+        :return: (user_id, submit_time) of the first accepted submission of the problem or None
+        """
+        # submission.models imports this module
+        from submission.models import JudgeStatus, Submission
+        contest = Contest.objects.get(id=contest_id)
+        admin_ids = User.objects.filter(models.Q(id=contest.created_by_id) | models.Q(admin_type=AdminType.SUPER_ADMIN)) \
+            .values("id")
+        return Submission.objects.filter(contest_id=contest_id, problem_id=problem_id, result=JudgeStatus.ACCEPTED,
+                                         create_time__gte=contest.start_time, create_time__lte=contest.end_time) \
+            .exclude(user_id__in=admin_ids).order_by("create_time").values_list("user_id", "create_time").first()
+
+    @classmethod
+    def claim(cls, contest_id, problem_id, user_id, submit_time):
+        """
+        :return: (whether the submission is the first blood now, user_id of the displaced holder or None)
+        """
+        # Most accepted submissions are not the first one, this read doesn't need any lock
+        current = cls.objects.filter(contest_id=contest_id, problem_id=problem_id).first()
+        if current and current.submit_time <= submit_time:
+            return False, None
+        if not current:
+            # contests running when the claims were introduced have accepted submissions without claim.
+            # The submission is saved as accepted, so it is the one found if it is the first
+            holder_id, holder_time = cls._earliest_accepted(contest_id, problem_id) or (user_id, submit_time)
+            try:
+                with transaction.atomic():
+                    cls.objects.create(contest_id=contest_id, problem_id=problem_id,
+                                       user_id=holder_id, submit_time=holder_time)
+                return (holder_id, holder_time) == (user_id, submit_time), None
+            except IntegrityError:
+                pass
+        with transaction.atomic():
+            current = cls.objects.select_for_update().get(contest_id=contest_id, problem_id=problem_id)
+            if current.submit_time <= submit_time:
+                return False, None
+            displaced_user_id = current.user_id
+            current.user_id = user_id
+            current.submit_time = submit_time
+            current.save(update_fields=["user", "submit_time"])
+        return True, displaced_user_id
+
+    @classmethod
+    def release(cls, contest_id, problem_id, user_id, submit_time):
+        """
+        The accepted submission of user_id at submit_time was judged again to another result.
+        If it held the claim, the claim goes to the next accepted submission of the problem, or is removed.
+        :return: (whether the submission held the claim, user_id of the new holder or None)
+        """
+        with transaction.atomic():
+            current = cls.objects.select_for_update().filter(contest_id=contest_id, problem_id=problem_id).first()
+            if not current or current.user_id != user_id or current.submit_time != submit_time:
+                return False, None
+            holder = cls._earliest_accepted(contest_id, problem_id)
+            if holder is None:
+                current.delete()
+                return True, None
+            current.user_id, current.submit_time = holder
+            current.save(update_fields=["user", "submit_time"])
+        return True, holder[0]
+
+    class Meta:
+        db_table = "contest_first_blood"
+        unique_together = (("contest", "problem"),)
+
+
 class ContestAnnouncement(models.Model):
     contest = models.ForeignKey(Contest, on_delete=models.CASCADE)
     title = models.TextField()
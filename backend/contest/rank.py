@@ -0,0 +1,73 @@
+import json
+from datetime import timedelta
+
+from django.db import connection, transaction
+from psycopg2.extras import execute_values
+
+from utils.cache import cache
+from utils.constants import CacheKey
+from .analytics import ContestAnalytics
+from .models import AbstractContestRank, ACMContestRank, ContestFirstBlood, ContestRuleType, OIContestRank
+
+
+class ContestRankRebuilder(object):
+    """
+    Rebuild ACMContestRank / OIContestRank of a contest by replaying its submissions,
+    following the same rules as JudgeDispatcher.update_contest_rank.
+    Submissions are loaded by ContestAnalytics and only the final rows are written back,
+    so the contest stays readable while the rebuild runs. Verdicts wait for the rebuild to finish.
+    """
+    chunk_size = 2000
+
+    def __init__(self, contest):
+        self.contest = contest
+
+    def _compute_acm(self, analytics):
+        return [(rank["user_id"], self.contest.id, rank["submission_number"], rank["accepted_number"],
+                 rank["total_time"], json.dumps(rank["submission_info"]))
+                for rank in analytics.acm_standings()]
+
+    def _compute_oi(self, analytics):
+        return [(rank["user_id"], self.contest.id, rank["submission_number"], rank["total_score"],
+                 json.dumps(rank["submission_info"]))
+                for rank in analytics.oi_standings()]
+
+    def _upsert(self, model, columns, rows):
+        table = model._meta.db_table
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns[2:])
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s " \
+              f"ON CONFLICT (user_id, contest_id) DO UPDATE SET {updates}"
+        with connection.cursor() as cursor:
+            execute_values(cursor, sql, rows, page_size=self.chunk_size)
+
+    def rebuild(self):
+        """
+        The judge is kept from updating the rank of the contest from the snapshot of the submissions
+        to the write of the rows, a verdict landing in between would be overwritten otherwise.
+        :return: number of rank rows written
+        """
+        with transaction.atomic():
+            AbstractContestRank.lock_contest(self.contest.id)
+            analytics = ContestAnalytics.from_contest(self.contest)
+            if self.contest.rule_type == ContestRuleType.ACM:
+                model = ACMContestRank
+                columns = ("user_id", "contest_id", "submission_number", "accepted_number", "total_time",
+                           "submission_info")
+                rows = self._compute_acm(analytics)
+                first_bloods = [ContestFirstBlood(contest=self.contest, problem_id=problem_id, user_id=user_id,
+                                                  submit_time=self.contest.start_time + timedelta(seconds=seconds))
+                                for problem_id, (user_id, seconds) in analytics.first_bloods().items()]
+            else:
+                model = OIContestRank
+                columns = ("user_id", "contest_id", "submission_number", "total_score", "submission_info")
+                rows = self._compute_oi(analytics)
+                first_bloods = []
+
+            model.objects.filter(contest=self.contest).exclude(user_id__in=[row[0] for row in rows]).delete()
+            if rows:
+                self._upsert(model, columns, rows)
+            # first blood claims follow the rebuilt rank, this is how a rejudge corrects them
+            ContestFirstBlood.objects.filter(contest=self.contest).delete()
+            ContestFirstBlood.objects.bulk_create(first_bloods)
+        cache.delete(f"{CacheKey.contest_rank_cache}:{self.contest.id}")
+        return len(rows)
@@ -70,6 +70,10 @@ class ContestPasswordVerifySerializer(serializers.Serializer):
     password = serializers.CharField(max_length=30, required=True)
 
 
+class ContestRankRebuildSerializer(serializers.Serializer):
+    contest_id = serializers.IntegerField()
+
+
 class ACMContesHelperSerializer(serializers.Serializer):
     contest_id = serializers.IntegerField()
     problem_id = serializers.CharField()
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+import dramatiq
+from django.utils.timezone import now
+
+from utils.shortcuts import DRAMATIQ_WORKER_ARGS
+from .cache import warm_contest_cache
+from .models import Contest
+
+# how long before start_time the contest caches are built
+PREWARM_AHEAD = timedelta(seconds=60)
+
+
+# contests are usually created days ahead, so the delayed message must not expire
+@dramatiq.actor(**DRAMATIQ_WORKER_ARGS(max_retries=3, max_age=None))
+def prewarm_contest_cache(contest_id, start_timestamp):
+    try:
+        contest = Contest.objects.select_related("created_by").get(id=contest_id, visible=True)
+    except Contest.DoesNotExist:
+        return
+    # the contest has been rescheduled after this job was queued, the new job will do it
+    if int(contest.start_time.timestamp()) != start_timestamp:
+        return
+    warm_contest_cache(contest)
+
+
+def schedule_contest_prewarm(contest):
+    if not contest.visible or contest.start_time <= now():
+        return
+    delay = max((contest.start_time - PREWARM_AHEAD - now()).total_seconds(), 0)
+    prewarm_contest_cache.send_with_options(args=(contest.id, int(contest.start_time.timestamp())),
+                                            delay=int(delay * 1000))
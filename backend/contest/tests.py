@@ -1,11 +1,23 @@
 import copy
+import functools
+import io
+import zipfile
 from datetime import datetime, timedelta
 
+from django.test import TestCase
 from django.utils import timezone
 
+from problem.models import Problem
+from submission.models import Submission, JudgeStatus
+from submission.tasks import save_submission_fingerprints
+from submission.tests import DEFAULT_PROBLEM_DATA, DEFAULT_SUBMISSION_DATA
 from utils.api.tests import APITestCase
+from utils.cache import cache
+from utils.constants import CacheKey
 
-from .models import ContestAnnouncement, ContestRuleType, Contest
+from .analytics import ContestAnalytics
+from .models import ACMContestRank, ContestAnnouncement, ContestFirstBlood, ContestRuleType, Contest
+from .tasks import prewarm_contest_cache
 
 DEFAULT_CONTEST_DATA = {"title": "test title", "description": "test description",
                         "start_time": timezone.localtime(timezone.now()),
@@ -75,6 +87,18 @@ class ContestAPITest(APITestCase):
         resp = self.client.get(self.url)
         self.assertSuccess(resp)
 
+    def test_contest_cache_invalidated_on_edit(self):
+        self.assertEqual(self.client.get(self.url).data["data"]["title"], DEFAULT_CONTEST_DATA["title"])
+        data = copy.deepcopy(DEFAULT_CONTEST_DATA)
+        data.update({"id": self.contest.id, "title": "new title"})
+        self.assertSuccess(self.client.put(self.reverse("contest_admin_api"), data=data))
+        self.assertEqual(self.client.get(self.url).data["data"]["title"], "new title")
+
+    def test_prewarm_contest_cache(self):
+        prewarm_contest_cache.fn(self.contest.id, int(self.contest.start_time.timestamp()))
+        self.assertEqual(cache.get(f"{CacheKey.contest_cache}:{self.contest.id}").id, self.contest.id)
+        self.assertEqual(cache.get(f"{CacheKey.contest_problems_cache}:{self.contest.id}:details"), [])
+
     def test_regular_user_validate_contest_password(self):
         self.create_user("test", "test123")
         url = self.reverse("contest_password_api")
@@ -148,3 +172,153 @@ class ContestAnnouncementListAPITest(APITestCase):
         contest_id = self.create_contest_announcements()
         response = self.client.get(self.url, data={"contest_id": contest_id})
         self.assertSuccess(response)
+
+
+class ContestRankRebuildAPITest(APITestCase):
+    def setUp(self):
+        admin = self.create_admin()
+        self.contest = Contest.objects.create(created_by=admin, **DEFAULT_CONTEST_DATA)
+        problem_data = copy.deepcopy(DEFAULT_PROBLEM_DATA)
+        problem_data.pop("tags")
+        self.problem = Problem.objects.create(created_by=admin, contest=self.contest, **problem_data)
+        self.user = self.create_user("test", "test123", login=False)
+        self.url = self.reverse("contest_rank_rebuild_api")
+
+    def _create_submission(self, result, minutes, **kwargs):
+        data = copy.deepcopy(DEFAULT_SUBMISSION_DATA)
+        data.update({"problem_id": self.problem.id, "contest_id": self.contest.id,
+                     "user_id": self.user.id, "username": self.user.username, "result": result})
+        data.update(kwargs)
+        submission = Submission.objects.create_with_detail(**data)
+        Submission.objects.filter(id=submission.id).update(
+            create_time=self.contest.start_time + timedelta(minutes=minutes))
+        return submission
+
+    def test_rebuild_acm_rank(self):
+        self._create_submission(JudgeStatus.WRONG_ANSWER, 1)
+        self._create_submission(JudgeStatus.COMPILE_ERROR, 2)
+        self._create_submission(JudgeStatus.ACCEPTED, 3)
+        self._create_submission(JudgeStatus.ACCEPTED, 4)
+        self._create_submission(JudgeStatus.PENDING, 5)
+
+        resp = self.client.post(self.url, data={"contest_id": self.contest.id})
+        self.assertSuccess(resp)
+        self.assertEqual(resp.data["data"]["rank_count"], 1)
+        rank = ACMContestRank.objects.get(contest=self.contest, user=self.user)
+        self.assertEqual(rank.submission_number, 3)
+        self.assertEqual(rank.accepted_number, 1)
+        self.assertEqual(rank.total_time, 3 * 60 + 20 * 60)
+        self.assertDictEqual(rank.submission_info[str(self.problem.id)],
+                             {"is_ac": True, "ac_time": 3 * 60, "error_number": 1, "is_first_ac": True})
+        first_blood = ContestFirstBlood.objects.get(contest=self.contest, problem=self.problem)
+        self.assertEqual(first_blood.user_id, self.user.id)
+        self.assertEqual(first_blood.submit_time, self.contest.start_time + timedelta(minutes=3))
+
+    def test_export_rank_csv(self):
+        self._create_submission(JudgeStatus.WRONG_ANSWER, 1)
+        self._create_submission(JudgeStatus.ACCEPTED, 3)
+        self.client.post(self.url, data={"contest_id": self.contest.id})
+
+        resp = self.client.get(self.reverse("contest_rank_export_api"), data={"contest_id": self.contest.id})
+        lines = b"".join(resp.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(lines[0], f"Rank,Username,Real Name,Accepted,Penalty,{self.problem._id}")
+        self.assertEqual(lines[1], "1,test,,1,0:23:00,+1 0:03:00")
+
+    def test_download_submissions(self):
+        self._create_submission(JudgeStatus.ACCEPTED, 3, code="first")
+        self._create_submission(JudgeStatus.ACCEPTED, 4, code="latest")
+        self._create_submission(JudgeStatus.WRONG_ANSWER, 5, code="wrong")
+        self._create_submission(JudgeStatus.ACCEPTED, 6, code="admin", user_id=self.contest.created_by_id,
+                                username=self.contest.created_by.username)
+
+        resp = self.client.get(self.reverse("acm_contest_helper"), data={"contest_id": self.contest.id, "exclude_admin": "1"})
+        zip_file = zipfile.ZipFile(io.BytesIO(b"".join(resp.streaming_content)))
+        self.assertEqual(zip_file.namelist(), [f"test_{self.problem._id}.txt"])
+        self.assertEqual(zip_file.read(f"test_{self.problem._id}.txt"), b"latest")
+
+    def test_similarity_report(self):
+        template = 'int main() {{\n    int {n}, {s} = 0;\n    scanf("%d", &{n});\n' \
+                   '    for (int i = 0; i < {n}; i++) {s} += i;\n    printf("%d\\n", {s});\n    return 0;\n}}\n'
+        code = template.format(n="n", s="s")
+        # renamed variables and an extra comment
+        copied = template.format(n="count", s="total") + "// mine\n"
+        other = self.create_user("other", "test123", login=False)
+        submissions = [self._create_submission(JudgeStatus.ACCEPTED, 3, code=code),
+                       self._create_submission(JudgeStatus.ACCEPTED, 4, code=copied, user_id=other.id, username="other")]
+        for submission in submissions:
+            save_submission_fingerprints(Submission.objects.get(id=submission.id))
+
+        resp = self.client.get(self.reverse("contest_similarity_api"), data={"contest_id": self.contest.id})
+        self.assertSuccess(resp)
+        pairs = resp.data["data"][self.problem._id]
+        self.assertEqual(len(pairs), 1)
+        self.assertEqual(pairs[0]["similarity"], 1.0)
+        self.assertEqual(sorted(pairs[0]["users"]), ["other", "test"])
+
+    def test_claim_first_blood(self):
+        other = self.create_user("other", "test123", login=False)
+        start = self.contest.start_time
+        claim = functools.partial(ContestFirstBlood.claim, self.contest.id, self.problem.id)
+        self.assertEqual(claim(other.id, start + timedelta(minutes=5)), (True, None))
+        self.assertEqual(claim(self.user.id, start + timedelta(minutes=6)), (False, None))
+        # an earlier submission accepted by rejudge takes over
+        self.assertEqual(claim(self.user.id, start + timedelta(minutes=4)), (True, other.id))
+        self.assertEqual(ContestFirstBlood.objects.get(contest=self.contest, problem=self.problem).user_id, self.user.id)
+
+    def test_seed_and_release_first_blood(self):
+        other = self.create_user("other", "test123", login=False)
+        # accepted before the claims existed
+        first = self._create_submission(JudgeStatus.ACCEPTED, 3)
+        second = self._create_submission(JudgeStatus.ACCEPTED, 5, user_id=other.id, username="other")
+        first, second = Submission.objects.get(id=first.id), Submission.objects.get(id=second.id)
+        claim = functools.partial(ContestFirstBlood.claim, self.contest.id, self.problem.id)
+        self.assertEqual(claim(other.id, second.create_time), (False, None))
+        self.assertEqual(ContestFirstBlood.objects.get(contest=self.contest, problem=self.problem).user_id, self.user.id)
+
+        release = functools.partial(ContestFirstBlood.release, self.contest.id, self.problem.id)
+        self.assertEqual(release(other.id, second.create_time), (False, None))
+        # the first one is judged again to wrong answer
+        Submission.objects.filter(id=first.id).update(result=JudgeStatus.WRONG_ANSWER)
+        self.assertEqual(release(self.user.id, first.create_time), (True, other.id))
+        Submission.objects.filter(id=second.id).update(result=JudgeStatus.WRONG_ANSWER)
+        self.assertEqual(release(other.id, second.create_time), (True, None))
+        self.assertFalse(ContestFirstBlood.objects.filter(contest=self.contest, problem=self.problem).exists())
+
+    def test_get_contest_statistics(self):
+        self._create_submission(JudgeStatus.WRONG_ANSWER, 1)
+        self._create_submission(JudgeStatus.ACCEPTED, 15)
+
+        resp = self.client.get(self.reverse("contest_statistics_api"), data={"contest_id": self.contest.id})
+        self.assertSuccess(resp)
+        statistics = resp.data["data"][self.problem._id]
+        self.assertEqual(statistics["submission_number"], 2)
+        self.assertEqual(statistics["solved_user_number"], 1)
+        self.assertEqual(statistics["first_blood"]["user_id"], self.user.id)
+        self.assertEqual(statistics["solve_time_histogram"], [0, 1])
+
+
+class ContestAnalyticsTest(TestCase):
+    def test_acm_standings(self):
+        # user, problem, result, seconds since start, score
+        analytics = ContestAnalytics([1, 2, 1, 1, 2, 1],
+                                     [10, 10, 10, 11, 11, 10],
+                                     [JudgeStatus.WRONG_ANSWER, JudgeStatus.ACCEPTED, JudgeStatus.ACCEPTED,
+                                      JudgeStatus.COMPILE_ERROR, JudgeStatus.ACCEPTED, JudgeStatus.WRONG_ANSWER],
+                                     [60, 120, 180, 200, 300, 400],
+                                     [0] * 6)
+        standings = analytics.acm_standings()
+        self.assertEqual([item["user_id"] for item in standings], [2, 1])
+        self.assertEqual(standings[0]["total_time"], 420)
+        self.assertEqual(standings[1]["submission_number"], 3)
+        self.assertEqual(standings[1]["total_time"], 180 + 20 * 60)
+        self.assertDictEqual(standings[1]["submission_info"]["10"],
+                             {"is_ac": True, "ac_time": 180, "error_number": 1, "is_first_ac": False})
+        self.assertDictEqual(standings[1]["submission_info"]["11"],
+                             {"is_ac": False, "ac_time": 0, "error_number": 0, "is_first_ac": False})
+        self.assertTrue(standings[0]["submission_info"]["10"]["is_first_ac"])
+
+    def test_oi_standings(self):
+        analytics = ContestAnalytics([1, 1, 1], [10, 11, 10], [0, 0, 8], [1, 2, 3], [100, 50, 30])
+        standings = analytics.oi_standings()
+        self.assertEqual(standings[0]["total_score"], 80)
+        self.assertDictEqual(standings[0]["submission_info"], {"10": 30, "11": 50})
@@ -1,9 +1,14 @@
 from django.conf.urls import url
 
-from ..views.admin import ContestAnnouncementAPI, ContestAPI, DownloadContestSubmissions
+from ..views.admin import (ContestAnnouncementAPI, ContestAPI, DownloadContestSubmissions, ContestRankRebuildAPI,
+                           ContestStatisticsAPI, ContestRankExportAPI, ContestSimilarityAPI)
 
 urlpatterns = [
     url(r"^contest/?$", ContestAPI.as_view(), name="contest_admin_api"),
     url(r"^contest/announcement/?$", ContestAnnouncementAPI.as_view(), name="contest_announcement_admin_api"),
+    url(r"^contest/rebuild_rank/?$", ContestRankRebuildAPI.as_view(), name="contest_rank_rebuild_api"),
+    url(r"^contest/statistics/?$", ContestStatisticsAPI.as_view(), name="contest_statistics_api"),
+    url(r"^contest/similarity/?$", ContestSimilarityAPI.as_view(), name="contest_similarity_api"),
+    url(r"^contest/rank_export/?$", ContestRankExportAPI.as_view(), name="contest_rank_export_api"),
     url(r"^download_submissions/?$", DownloadContestSubmissions.as_view(), name="acm_contest_helper"),
 ]
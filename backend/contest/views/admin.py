@@ -1,25 +1,28 @@
-import copy
-import os
-import zipfile
 from ipaddress import ip_network
 
 import dateutil.parser
-from django.http import FileResponse
+from django.db.models import Count
+from django.http import FileResponse, StreamingHttpResponse
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from account.decorators import ensure_created_by
 from account.models import User
-from submission.models import Submission, JudgeStatus
+from submission.models import SubmissionFingerprint
+from submission.similarity import similar_pairs
 from utils.api import APIView, validate_serializer
 from utils.cache import cache
 from utils.constants import CacheKey
-from utils.shortcuts import rand_str
-from utils.tasks import delete_files
+from ..analytics import ContestAnalytics
+from ..cache import invalidate_contest_cache
+from ..export import ContestRankExporter, ContestSubmissionExporter
 from ..models import Contest, ContestAnnouncement
+from ..rank import ContestRankRebuilder
+from ..tasks import schedule_contest_prewarm
 from ..serializers import (ContestAnnouncementSerializer, ContestAdminSerializer,
                            CreateConetestSeriaizer, CreateContestAnnouncementSerializer,
-                           EditConetestSeriaizer, EditContestAnnouncementSerializer,)
+                           EditConetestSeriaizer, EditContestAnnouncementSerializer,
+                           ContestRankRebuildSerializer)
 
 
 class ContestAPI(APIView):
@@ -44,6 +47,7 @@ class ContestAPI(APIView):
             except ValueError:
                 return self.error(f"{ip_range} is not a valid cidr network")
         contest = Contest.objects.create(**data)
+        schedule_contest_prewarm(contest)
         return self.success(ContestAdminSerializer(contest).data)
 
     @swagger_auto_schema(
@@ -77,6 +81,8 @@ class ContestAPI(APIView):
         for k, v in data.items():
             setattr(contest, k, v)
         contest.save()
+        invalidate_contest_cache(contest.id)
+        schedule_contest_prewarm(contest)
         return self.success(ContestAdminSerializer(contest).data)
 
     @swagger_auto_schema(
@@ -151,6 +157,7 @@ class ContestAPI(APIView):
         ensure_created_by(contest, request.user)
 
         contest.delete()
+        invalidate_contest_cache(id)
         return self.success()
 
 
@@ -271,33 +278,146 @@ class ContestAnnouncementAPI(APIView):
         return self.success(ContestAnnouncementSerializer(contest_announcements, many=True).data)
 
 
-class DownloadContestSubmissions(APIView):
-    def _dump_submissions(self, contest, exclude_admin=True):
-        problem_ids = contest.problem_set.all().values_list("id", "_id")
-        id2display_id = {k[0]: k[1] for k in problem_ids}
-        ac_map = {k[0]: False for k in problem_ids}
-        submissions = Submission.objects.filter(contest=contest, result=JudgeStatus.ACCEPTED).order_by("-create_time")
-        user_ids = submissions.values_list("user_id", flat=True)
-        users = User.objects.filter(id__in=user_ids)
-        path = f"/tmp/{rand_str()}.zip"
-        with zipfile.ZipFile(path, "w") as zip_file:
-            for user in users:
-                if user.is_admin_role() and exclude_admin:
-                    continue
-                user_ac_map = copy.deepcopy(ac_map)
-                user_submissions = submissions.filter(user_id=user.id)
-                for submission in user_submissions:
-                    problem_id = submission.problem_id
-                    if user_ac_map[problem_id]:
-                        continue
-                    file_name = f"{user.username}_{id2display_id[submission.problem_id]}.txt"
-                    compression = zipfile.ZIP_DEFLATED
-                    zip_file.writestr(zinfo_or_arcname=f"{file_name}",
-                                      data=submission.code,
-                                      compress_type=compression)
-                    user_ac_map[problem_id] = True
-        return path
+class ContestRankRebuildAPI(APIView):
+    @swagger_auto_schema(
+        request_body=ContestRankRebuildSerializer,
+        operation_description="Rebuild rank of a contest from its submissions",
+    )
+    @validate_serializer(ContestRankRebuildSerializer)
+    def post(self, request):
+        try:
+            contest = Contest.objects.get(id=request.data["contest_id"])
+            ensure_created_by(contest, request.user)
+        except Contest.DoesNotExist:
+            return self.error("Contest does not exist")
+        count = ContestRankRebuilder(contest).rebuild()
+        return self.success({"rank_count": count})
+
+
+class ContestStatisticsAPI(APIView):
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                name="contest_id",
+                in_=openapi.IN_QUERY,
+                description="ID of contest",
+                required=True,
+                type=openapi.TYPE_INTEGER,
+            ),
+        ],
+        operation_description="Get per problem statistics of a contest, such as solve counts, first blood and solve time histogram",
+    )
+    def get(self, request):
+        contest_id = request.GET.get("contest_id")
+        if not contest_id:
+            return self.error("Parameter error")
+        try:
+            contest = Contest.objects.get(id=contest_id)
+            ensure_created_by(contest, request.user)
+        except Contest.DoesNotExist:
+            return self.error("Contest does not exist")
+        statistics = ContestAnalytics.from_contest(contest).problem_statistics()
+        id2display_id = dict(contest.problem_set.values_list("id", "_id"))
+        return self.success({id2display_id[problem_id]: item for problem_id, item in statistics.items()
+                             if problem_id in id2display_id})
+
+
+class ContestSimilarityAPI(APIView):
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                name="contest_id",
+                in_=openapi.IN_QUERY,
+                description="ID of contest",
+                required=True,
+                type=openapi.TYPE_INTEGER,
+            ),
+            openapi.Parameter(
+                name="limit",
+                in_=openapi.IN_QUERY,
+                description="Pairs per problem, 20 by default",
+                type=openapi.TYPE_INTEGER,
+            ),
+        ],
+        operation_description="Get the most similar pairs of accepted submissions of every problem of a contest",
+    )
+    def get(self, request):
+        contest_id = request.GET.get("contest_id")
+        if not contest_id:
+            return self.error("Parameter error")
+        try:
+            contest = Contest.objects.get(id=contest_id)
+            ensure_created_by(contest, request.user)
+        except Contest.DoesNotExist:
+            return self.error("Contest does not exist")
+        try:
+            limit = max(min(int(request.GET.get("limit", "20")), 100), 1)
+        except ValueError:
+            limit = 20
+
+        report = {}
+        for problem_id, display_id in contest.problem_set.values_list("id", "_id"):
+            fingerprints = SubmissionFingerprint.objects.filter(problem_id=problem_id)
+            sizes = {(submission_id, user_id): count for submission_id, user_id, count in
+                     fingerprints.values_list("submission_id", "user_id").annotate(count=Count("id")).order_by()}
+            # a range scan of fingerprint_problem_idx, read with a server side cursor
+            postings = fingerprints.order_by("problem_id", "fingerprint") \
+                .values_list("fingerprint", "submission_id", "user_id").iterator(chunk_size=5000)
+            report[display_id] = similar_pairs(postings, sizes, limit=limit)
+
+        user_ids = {submission[1] for pairs in report.values() for pair in pairs for submission in pair[2:]}
+        usernames = dict(User.objects.filter(id__in=user_ids).values_list("id", "username"))
+        return self.success({display_id: [{"similarity": round(similarity, 3),
+                                           "shared_fingerprints": shared,
+                                           "submissions": [a[0], b[0]],
+                                           "users": [usernames.get(a[1]), usernames.get(b[1])]}
+                                          for similarity, shared, a, b in pairs]
+                             for display_id, pairs in report.items()})
 
+
+class ContestRankExportAPI(APIView):
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                name="contest_id",
+                in_=openapi.IN_QUERY,
+                description="ID of contest",
+                required=True,
+                type=openapi.TYPE_INTEGER,
+            ),
+            openapi.Parameter(
+                name="format",
+                in_=openapi.IN_QUERY,
+                description="'csv' (default) or 'xlsx'",
+                type=openapi.TYPE_STRING,
+            ),
+        ],
+        operation_description="Download the standings of a contest as a spreadsheet",
+    )
+    def get(self, request):
+        contest_id = request.GET.get("contest_id")
+        if not contest_id:
+            return self.error("Parameter error")
+        file_format = request.GET.get("format", "csv")
+        if file_format not in ("csv", "xlsx"):
+            return self.error("Invalid format")
+        try:
+            contest = Contest.objects.get(id=contest_id)
+            ensure_created_by(contest, request.user)
+        except Contest.DoesNotExist:
+            return self.error("Contest does not exist")
+
+        exporter = ContestRankExporter(contest)
+        if file_format == "csv":
+            resp = StreamingHttpResponse(exporter.iter_csv(), content_type="text/csv; charset=utf-8")
+        else:
+            resp = FileResponse(exporter.write_xlsx(),
+                                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        resp["Content-Disposition"] = f"attachment;filename=contest_{contest.id}_rank.{file_format}"
+        return resp
+
+
+class DownloadContestSubmissions(APIView):
     @swagger_auto_schema(
         manual_parameters=[
             openapi.Parameter(
@@ -327,9 +447,7 @@ class DownloadContestSubmissions(APIView):
             return self.error("Contest does not exist")
 
         exclude_admin = request.GET.get("exclude_admin") == "1"
-        zip_path = self._dump_submissions(contest, exclude_admin)
-        delete_files.send_with_options(args=(zip_path,), delay=300_000)
-        resp = FileResponse(open(zip_path, "rb"))
-        resp["Content-Type"] = "application/zip"
-        resp["Content-Disposition"] = f"attachment;filename={os.path.basename(zip_path)}"
+        exporter = ContestSubmissionExporter(contest, exclude_admin)
+        resp = StreamingHttpResponse(exporter.iter_zip(), content_type="application/zip")
+        resp["Content-Disposition"] = f"attachment;filename=contest_{contest.id}_submissions.zip"
         return resp
@@ -8,6 +8,7 @@ from utils.shortcuts import datetime2str, check_is_id
 from account.decorators import login_required, check_contest_permission, check_contest_password
 
 from utils.constants import ContestStatus
+from ..cache import get_contest
 from ..models import ContestAnnouncement, Contest
 from ..serializers import ContestAnnouncementSerializer
 from ..serializers import ContestSerializer, ContestPasswordVerifySerializer
@@ -62,7 +63,7 @@ class ContestAPI(APIView):
         if not id or not check_is_id(id):
             return self.error("Invalid parameter, id is required")
         try:
-            contest = Contest.objects.get(id=id, visible=True)
+            contest = get_contest(int(id))
         except Contest.DoesNotExist:
             return self.error("Contest does not exist")
         data = ContestSerializer(contest).data
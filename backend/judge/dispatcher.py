@@ -7,13 +7,18 @@ import requests
 from django.db import transaction, IntegrityError
 from django.db.models import F
 
+from account.activity import record_activity
 from account.models import User
 from conf.models import JudgeServer
-from contest.models import ContestRuleType, ACMContestRank, OIContestRank, ContestStatus
+from contest.models import (AbstractContestRank, ContestRuleType, ACMContestRank, OIContestRank, ContestStatus,
+                            ContestFirstBlood)
 from options.options import SysOptions
 from problem.models import Problem, ProblemRuleType
 from problem.utils import parse_problem_template
+from submission.archive import load_submission_detail
 from submission.models import JudgeStatus, Submission
+from submission.status import set_submission_status
+from submission.tasks import fingerprint_submission
 from utils.cache import cache
 from utils.constants import CacheKey
 
@@ -92,9 +97,11 @@ class SPJCompiler(DispatcherBase):
 class JudgeDispatcher(DispatcherBase):
     def __init__(self, submission_id, problem_id):
         super().__init__()
-        self.submission = Submission.objects.get(id=submission_id)
+        self.submission = Submission.objects.select_related("detail").get(id=submission_id)
         self.contest_id = self.submission.contest_id
-        self.last_result = self.submission.result if self.submission.info else None
+        # old submissions are archived, put them back before rejudging
+        load_submission_detail(self.submission)
+        self.last_result = self.submission.result if self.submission.detail.info else None
 
         if self.contest_id:
             self.problem = Problem.objects.select_related("contest").get(id=problem_id, contest_id=self.contest_id)
@@ -135,9 +142,9 @@ class JudgeDispatcher(DispatcherBase):
 
         if language in self.problem.template:
             template = parse_problem_template(self.problem.template[language])
-            code = f"{template['prepend']}\n{self.submission.code}\n{template['append']}"
+            code = f"{template['prepend']}\n{self.submission.detail.code}\n{template['append']}"
         else:
-            code = self.submission.code
+            code = self.submission.detail.code
 
         data = {
             "language_config": sub_config["config"],
@@ -159,10 +166,12 @@ class JudgeDispatcher(DispatcherBase):
                 cache.lpush(CacheKey.waiting_queue, json.dumps(data))
                 return
             Submission.objects.filter(id=self.submission.id).update(result=JudgeStatus.JUDGING)
+            set_submission_status(self.submission.id, self.submission.user_id, JudgeStatus.JUDGING)
             resp = self._request(urljoin(server.service_url, "/judge"), data=data)
 
         if not resp:
             Submission.objects.filter(id=self.submission.id).update(result=JudgeStatus.SYSTEM_ERROR)
+            set_submission_status(self.submission.id, self.submission.user_id, JudgeStatus.SYSTEM_ERROR)
             return
 
         if resp["err"]:
@@ -171,7 +180,8 @@ class JudgeDispatcher(DispatcherBase):
             self.submission.statistic_info["score"] = 0
         else:
             resp["data"].sort(key=lambda x: int(x["test_case"]))
-            self.submission.info = resp
+            self.submission.detail.info = resp
+            self.submission.detail.save(update_fields=["raw_info", "compressed_info"])
             self._compute_statistic_info(resp["data"])
             error_test_case = list(filter(lambda case: case["result"] != 0, resp["data"]))
             # In ACM mode, if multiple test points are all correct, then AC,
@@ -185,27 +195,57 @@ class JudgeDispatcher(DispatcherBase):
                 self.submission.result = error_test_case[0]["result"]
             else:
                 self.submission.result = JudgeStatus.PARTIALLY_ACCEPTED
-        self.submission.save()
-
+        ranked = self.contest_id and self.contest.status == ContestStatus.CONTEST_UNDERWAY and \
+            not User.objects.get(id=self.submission.user_id).is_contest_admin(self.contest)
+        if ranked:
+            # the verdict is saved with its rank update, ContestRankRebuilder sees both or neither
+            with transaction.atomic():
+                AbstractContestRank.lock_contest(self.contest_id, shared=True)
+                self.submission.save()
+                self.update_contest_problem_status()
+                self.update_contest_rank()
+        else:
+            self.submission.save()
+        set_submission_status(self.submission.id, self.submission.user_id, self.submission.result,
+                              self.submission.statistic_info)
         if self.contest_id:
-            if self.contest.status != ContestStatus.CONTEST_UNDERWAY or \
-                    User.objects.get(id=self.submission.user_id).is_contest_admin(self.contest):
+            fingerprint_submission.send(self.submission.id)
+            self.update_user_activity()
+            if not ranked:
                 logger.info(
                     "Contest debug mode, id: " + str(self.contest_id) + ", submission id: " + self.submission.id)
                 return
-            with transaction.atomic():
-                self.update_contest_problem_status()
-                self.update_contest_rank()
         else:
             if self.last_result:
-                self.update_problem_status_rejudge()
+                solved_difficulty = self.update_problem_status_rejudge()
             else:
-                self.update_problem_status()
+                solved_difficulty = self.update_problem_status()
+            self.update_user_activity(solved_difficulty)
 
         # At this point, the judgment is over, try to process the remaining tasks in the task queue
         process_pending_task()
 
+    def update_user_activity(self, solved_difficulty=None):
+        """
+        A single upsert of the activity row per verdict
+        :param solved_difficulty: difficulty of the problem if this verdict solved it for the first time,
+                                  attributed to the day of the submission like the backfill does
+        """
+        accepted_number = int(self.submission.result == JudgeStatus.ACCEPTED)
+        if self.last_result is None:
+            record_activity(self.submission.user_id, self.submission.create_time, submission_number=1,
+                            accepted_number=accepted_number, language=self.submission.language,
+                            difficulty=solved_difficulty)
+        else:
+            accepted_number -= int(self.last_result == JudgeStatus.ACCEPTED)
+            if accepted_number or solved_difficulty:
+                record_activity(self.submission.user_id, self.submission.create_time, accepted_number=accepted_number,
+                                difficulty=solved_difficulty)
+
     def update_problem_status_rejudge(self):
+        """
+        :return: difficulty of the problem if it is solved for the first time, else None
+        """
         result = str(self.submission.result)
         problem_id = str(self.problem.id)
         with transaction.atomic():
@@ -219,6 +259,7 @@ class JudgeDispatcher(DispatcherBase):
             problem.save(update_fields=["accepted_number", "statistic_info"])
 
             profile = User.objects.select_for_update().get(id=self.submission.user_id).userprofile
+            accepted_number = profile.accepted_number
             if problem.rule_type == ProblemRuleType.ACM:
                 acm_problems_status = profile.acm_problems_status.get("problems", {})
                 if acm_problems_status[problem_id]["status"] != JudgeStatus.ACCEPTED:
@@ -241,8 +282,14 @@ class JudgeDispatcher(DispatcherBase):
                         profile.accepted_number += 1
                 profile.oi_problems_status["problems"] = oi_problems_status
                 profile.save(update_fields=["accepted_number", "oi_problems_status"])
+        if profile.accepted_number > accepted_number:
+            return problem.difficulty
+        return None
 
     def update_problem_status(self):
+        """
+        :return: difficulty of the problem if it is solved for the first time, else None
+        """
         result = str(self.submission.result)
         problem_id = str(self.problem.id)
         with transaction.atomic():
@@ -259,6 +306,7 @@ class JudgeDispatcher(DispatcherBase):
             user = User.objects.select_for_update().get(id=self.submission.user_id)
             user_profile = user.userprofile
             user_profile.submission_number += 1
+            accepted_number = user_profile.accepted_number
             if problem.rule_type == ProblemRuleType.ACM:
                 acm_problems_status = user_profile.acm_problems_status.get("problems", {})
                 if problem_id not in acm_problems_status:
@@ -292,6 +340,9 @@ class JudgeDispatcher(DispatcherBase):
                         user_profile.accepted_number += 1
                 user_profile.oi_problems_status["problems"] = oi_problems_status
                 user_profile.save(update_fields=["submission_number", "accepted_number", "oi_problems_status"])
+        if user_profile.accepted_number > accepted_number:
+            return problem.difficulty
+        return None
 
     def update_contest_problem_status(self):
         with transaction.atomic():
@@ -323,14 +374,9 @@ class JudgeDispatcher(DispatcherBase):
                 user_profile.oi_problems_status["contest_problems"] = contest_problems_status
                 user_profile.save(update_fields=["oi_problems_status"])
 
-            problem = Problem.objects.select_for_update().get(contest_id=self.contest_id, id=self.problem.id)
-            result = str(self.submission.result)
-            problem_info = problem.statistic_info
-            problem_info[result] = problem_info.get(result, 0) + 1
-            problem.submission_number += 1
-            if self.submission.result == JudgeStatus.ACCEPTED:
-                problem.accepted_number += 1
-            problem.save(update_fields=["submission_number", "accepted_number", "statistic_info"])
+            # counted once the verdict is committed, the row of the problem stays unlocked while the rank is updated
+            result = self.submission.result
+            transaction.on_commit(lambda: self.problem.add_verdict(result, result == JudgeStatus.ACCEPTED))
 
     def update_contest_rank(self):
         if self.contest.rule_type == ContestRuleType.OI or self.contest.real_time_rank:
@@ -356,13 +402,44 @@ class JudgeDispatcher(DispatcherBase):
                 rank = get_rank(model)
         func(rank)
 
+    def _claim_first_ac(self):
+        is_first_ac, displaced_user_id = ContestFirstBlood.claim(self.contest_id, self.problem.id,
+                                                                 self.submission.user_id, self.submission.create_time)
+        if displaced_user_id is not None and displaced_user_id != self.submission.user_id:
+            transaction.on_commit(lambda: self._set_first_ac(displaced_user_id, False))
+        return is_first_ac
+
+    def _release_first_ac(self):
+        """
+        :return: whether the submission, accepted before this judge, held the first blood
+        """
+        released, holder_id = ContestFirstBlood.release(self.contest_id, self.problem.id,
+                                                        self.submission.user_id, self.submission.create_time)
+        if holder_id is not None and holder_id != self.submission.user_id:
+            transaction.on_commit(lambda: self._set_first_ac(holder_id, True))
+        return released and holder_id != self.submission.user_id
+
+    def _set_first_ac(self, user_id, is_first_ac):
+        with transaction.atomic():
+            AbstractContestRank.lock_contest(self.contest_id, shared=True)
+            rank = ACMContestRank.objects.select_for_update().filter(user_id=user_id, contest=self.contest).first()
+            info = rank.submission_info.get(str(self.problem.id)) if rank else None
+            if info and info["is_first_ac"] != is_first_ac:
+                info["is_first_ac"] = is_first_ac
+                rank.save(update_fields=["submission_info"])
+        cache.delete(f"{CacheKey.contest_rank_cache}:{self.contest.id}")
+
     def _update_acm_contest_rank(self, rank):
         info = rank.submission_info.get(str(self.submission.problem_id))
-        # Because of the previous changes, you need to get it again here
-        problem = Problem.objects.select_for_update().get(contest_id=self.contest_id, id=self.problem.id)
         # This question has been submitted
         if info:
             if info["is_ac"]:
+                # a rejudge of the first blood to another result hands it over, the rest of the rank
+                # is only corrected by ContestRankRebuilder
+                if self.last_result == JudgeStatus.ACCEPTED and self.submission.result != JudgeStatus.ACCEPTED and \
+                        info["is_first_ac"] and self._release_first_ac():
+                    info["is_first_ac"] = False
+                    rank.save(update_fields=["submission_info"])
                 return
 
             rank.submission_number += 1
@@ -372,7 +449,7 @@ class JudgeDispatcher(DispatcherBase):
                 info["ac_time"] = (self.submission.create_time - self.contest.start_time).total_seconds()
                 rank.total_time += info["ac_time"] + info["error_number"] * 20 * 60
 
-                if problem.accepted_number == 1:
+                if self._claim_first_ac():
                     info["is_first_ac"] = True
             elif self.submission.result != JudgeStatus.COMPILE_ERROR:
                 info["error_number"] += 1
@@ -387,7 +464,7 @@ class JudgeDispatcher(DispatcherBase):
                 info["ac_time"] = (self.submission.create_time - self.contest.start_time).total_seconds()
                 rank.total_time += info["ac_time"]
 
-                if problem.accepted_number == 1:
+                if self._claim_first_ac():
                     info["is_first_ac"] = True
 
             elif self.submission.result != JudgeStatus.COMPILE_ERROR:
@@ -0,0 +1,148 @@
+import copy
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TransactionTestCase
+
+from account.models import AdminType, User, UserProfile
+from contest.analytics import ContestAnalytics
+from contest.models import ACMContestRank, Contest, ContestFirstBlood
+from contest.rank import ContestRankRebuilder
+from contest.tests import DEFAULT_CONTEST_DATA
+from options.options import SysOptions
+from problem.models import Problem
+from submission.models import JudgeStatus, Submission
+from submission.tests import DEFAULT_PROBLEM_DATA, DEFAULT_SUBMISSION_DATA
+from utils.cache import cache
+
+from .dispatcher import JudgeDispatcher
+
+
+def fake_judge_server(dispatcher, url, data=None):
+    # the code of the test submissions is the result they get
+    return {"err": None, "data": [{"cpu_time": 1, "memory": 1024, "result": int(data["src"]), "test_case": "1"}]}
+
+
+class ContestJudgeConcurrencyTest(TransactionTestCase):
+    """
+    Verdicts and rank rebuilds of a contest running in threads, each with a connection and transactions of its own
+    """
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create(username="admin", admin_type=AdminType.ADMIN)
+        self.contest = Contest.objects.create(created_by=admin, **DEFAULT_CONTEST_DATA)
+        problem_data = copy.deepcopy(DEFAULT_PROBLEM_DATA)
+        problem_data.pop("tags")
+        self.problem = Problem.objects.create(created_by=admin, contest=self.contest, **problem_data)
+        self.users = []
+        for username in ("first", "second"):
+            user = User.objects.create(username=username)
+            UserProfile.objects.create(user=user)
+            self.users.append(user)
+        # created on first use, not by the judging threads at the same time
+        SysOptions.languages
+
+        patcher = mock.patch("judge.dispatcher.ChooseJudgeServer")
+        patcher.start().return_value.__enter__.return_value.service_url = "http://judge-server"
+        self.addCleanup(patcher.stop)
+        for patcher in (mock.patch.object(JudgeDispatcher, "_request", fake_judge_server),
+                        mock.patch("judge.dispatcher.fingerprint_submission"),
+                        mock.patch("judge.dispatcher.process_pending_task")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.errors = []
+
+    def _create_submission(self, user, minutes, result):
+        data = copy.deepcopy(DEFAULT_SUBMISSION_DATA)
+        data.update({"problem_id": self.problem.id, "contest_id": self.contest.id, "user_id": user.id,
+                     "username": user.username, "code": str(result), "result": JudgeStatus.PENDING})
+        submission = Submission.objects.create_with_detail(**data)
+        Submission.objects.filter(id=submission.id).update(
+            create_time=self.contest.start_time + timedelta(minutes=minutes))
+        return submission
+
+    def _start(self, target):
+        def run():
+            try:
+                target()
+            except Exception as e:
+                self.errors.append(e)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def _judge(self, submission):
+        return self._start(lambda: JudgeDispatcher(submission.id, self.problem.id).judge())
+
+    def _wait_for_lock(self):
+        for _ in range(50):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND NOT granted")
+                if cursor.fetchone()[0]:
+                    return True
+            time.sleep(0.1)
+        return False
+
+    def _submission_info(self, user):
+        return ACMContestRank.objects.get(contest=self.contest, user=user).submission_info[str(self.problem.id)]
+
+    def test_concurrent_accepted(self):
+        first = self._create_submission(self.users[0], 3, JudgeStatus.ACCEPTED)
+        second = self._create_submission(self.users[1], 5, JudgeStatus.ACCEPTED)
+        # both verdicts wait for each other inside their transactions before the rank is updated,
+        # the barrier breaks if one holds a lock the other one needs
+        barrier = threading.Barrier(2, timeout=5)
+        update_contest_problem_status = JudgeDispatcher.update_contest_problem_status
+
+        def update_together(dispatcher):
+            update_contest_problem_status(dispatcher)
+            barrier.wait()
+
+        with mock.patch.object(JudgeDispatcher, "update_contest_problem_status", update_together):
+            for thread in [self._judge(second), self._judge(first)]:
+                thread.join()
+        self.assertEqual(self.errors, [])
+
+        self.assertTrue(self._submission_info(self.users[0])["is_first_ac"])
+        self.assertFalse(self._submission_info(self.users[1])["is_first_ac"])
+        self.assertEqual(ContestFirstBlood.objects.get(contest=self.contest, problem=self.problem).user_id,
+                         self.users[0].id)
+        problem = Problem.objects.get(id=self.problem.id)
+        self.assertEqual((problem.submission_number, problem.accepted_number), (2, 2))
+        self.assertEqual(problem.statistic_info, {str(JudgeStatus.ACCEPTED): 2})
+
+    def test_verdict_during_rebuild(self):
+        judged = self._create_submission(self.users[0], 3, JudgeStatus.ACCEPTED)
+        Submission.objects.filter(id=judged.id).update(result=JudgeStatus.ACCEPTED)
+        wrong = self._create_submission(self.users[1], 5, JudgeStatus.WRONG_ANSWER)
+        locked, resume = threading.Event(), threading.Event()
+        from_contest = ContestAnalytics.from_contest
+
+        def from_contest_later(contest):
+            locked.set()
+            resume.wait(5)
+            return from_contest(contest)
+
+        with mock.patch.object(ContestAnalytics, "from_contest", from_contest_later):
+            rebuild = self._start(lambda: ContestRankRebuilder(self.contest).rebuild())
+            self.assertTrue(locked.wait(5))
+            verdict = self._judge(wrong)
+            # the verdict waits for the rebuild, which doesn't see it
+            waited = self._wait_for_lock()
+            resume.set()
+            rebuild.join()
+            verdict.join()
+        self.assertTrue(waited)
+        self.assertEqual(self.errors, [])
+
+        self.assertTrue(self._submission_info(self.users[0])["is_ac"])
+        # counted once, by the verdict on top of the rebuilt rank
+        rank = ACMContestRank.objects.get(contest=self.contest, user=self.users[1])
+        self.assertEqual(rank.submission_number, 1)
+        self.assertEqual(self._submission_info(self.users[1])["error_number"], 1)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/1.8/ref/settings/
 """
 import os
+import sys
 import raven
 from copy import deepcopy
 from utils.shortcuts import get_env
@@ -126,6 +127,9 @@ STATIC_URL = '/public/'
 AUTH_USER_MODEL = 'account.User'
 
 TEST_CASE_DIR = os.path.join(DATA_DIR, "test_case")
+SUBMISSION_ARCHIVE_DIR = os.path.join(DATA_DIR, "submission_archive")
+# test case zips built for download, kept out of TEST_CASE_DIR which is synced to the judge servers
+TEST_CASE_CACHE_DIR = os.path.join(DATA_DIR, "test_case_cache")
 LOG_PATH = os.path.join(DATA_DIR, "log")
 
 AVATAR_URI_PREFIX = "/public/avatar"
@@ -216,6 +220,11 @@ CACHES = {
     "default": redis_config(db=1)
 }
 
+# APITestCase flushes the cache before every test, the test run gets a redis database of its own
+# so that the sessions and caches of a running instance survive it
+if sys.argv[1:2] == ["test"]:
+    CACHES["default"] = redis_config(db=15)
+
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"
 
@@ -0,0 +1,59 @@
+import hashlib
+import json
+
+from django.db.models import Count
+
+from utils.cache import cache, get_or_build
+from utils.constants import CacheKey
+from .models import ProblemTag
+from .serializers import TagSerializer
+
+# admin edits bump the version, so the timeout only bounds how far the submission counters of a page can lag
+PROBLEM_LIST_CACHE_TIMEOUT = 5 * 60
+# the counts only change with public problems, whose changes bump the version
+PROBLEM_TAGS_CACHE_TIMEOUT = 24 * 60 * 60
+# query parameters that select the page, anything else does not change the response
+PROBLEM_LIST_PARAMS = ("tag", "keyword", "difficulty", "offset", "limit", "exact_total")
+
+
+def get_problem_list_version():
+    return cache.get(CacheKey.problem_list_version, 0)
+
+
+def bump_problem_list_version():
+    """
+    Called after every change of public problems, pages and tag counts cached under older versions are never
+    read again and expire
+    """
+    try:
+        cache.incr(CacheKey.problem_list_version)
+    except ValueError:
+        cache.set(CacheKey.problem_list_version, 1, timeout=None)
+
+
+def _problem_list_key(params):
+    signature = hashlib.md5(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{CacheKey.problem_list_cache}:{get_problem_list_version()}:{signature}"
+
+
+def get_problem_list(request, build):
+    """
+    Serialized page of the public problem list, shared by all users
+    :param build: called on a miss, returns the page for the request
+    """
+    params = {name: request.GET.get(name) for name in PROBLEM_LIST_PARAMS}
+    return get_or_build(_problem_list_key(params), build, PROBLEM_LIST_CACHE_TIMEOUT)
+
+
+def _count_problem_tags():
+    tags = ProblemTag.objects.filter(problem__contest_id__isnull=True, problem__visible=True) \
+        .annotate(problem_count=Count("problem")).order_by("id")
+    return list(TagSerializer(tags, many=True).data)
+
+
+def get_problem_tags():
+    """
+    Tags of visible public problems with their number of problems, rebuilt once per problem list version
+    """
+    return get_or_build(f"{CacheKey.problem_tags_cache}:{get_problem_list_version()}", _count_problem_tags,
+                        PROBLEM_TAGS_CACHE_TIMEOUT)
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.28 on 2026-10-19 16:03
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problem', '0014_problem_share_submission'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        # title__icontains and _id__icontains are compiled to UPPER(column::text) LIKE UPPER(...)
+        migrations.RunSQL(
+            "CREATE INDEX problem_title_trgm_idx ON problem USING gin (UPPER(title) gin_trgm_ops)",
+            "DROP INDEX problem_title_trgm_idx",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX problem_display_id_trgm_idx ON problem USING gin (UPPER(_id) gin_trgm_ops)",
+            "DROP INDEX problem_display_id_trgm_idx",
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='problem_search_vector_idx'),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE problem SET search_vector =
+                setweight(to_tsvector('simple', COALESCE(problem.title, '')), 'A') ||
+                setweight(to_tsvector('simple', COALESCE((
+                    SELECT string_agg(problem_tag.name, ' ') FROM problem_tags
+                    JOIN problem_tag ON problem_tag.id = problem_tags.problemtag_id
+                    WHERE problem_tags.problem_id = problem.id), '')), 'B') ||
+                setweight(to_tsvector('simple', COALESCE(problem.source, '')), 'C') ||
+                setweight(to_tsvector('simple', COALESCE(problem.description, '')), 'D')
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
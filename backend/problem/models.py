@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.expressions import RawSQL
 from utils.models import JSONField
 
 from account.models import User
@@ -85,11 +88,15 @@ class Problem(models.Model):
     # {JudgeStatus.ACCEPTED: 3, JudgeStaus.WRONG_ANSWER: 11}, the number means count
     statistic_info = JSONField(default=dict)
     share_submission = models.BooleanField(default=False)
+    # title, tags, source and description, maintained by problem.search.update_search_vector
+    search_vector = SearchVectorField(null=True)
 
     class Meta:
         db_table = "problem"
         unique_together = (("_id", "contest"),)
         ordering = ("create_time",)
+        # title__icontains and _id__icontains are served by the trigram indexes created in migration 0015
+        indexes = [GinIndex(fields=["search_vector"], name="problem_search_vector_idx")]
 
     def add_submission_number(self):
         self.submission_number = models.F("submission_number") + 1
@@ -98,3 +105,14 @@ class Problem(models.Model):
     def add_ac_number(self):
         self.accepted_number = models.F("accepted_number") + 1
         self.save(update_fields=["accepted_number"])
+
+    def add_verdict(self, result, accepted):
+        """
+        Count a verdict with a single UPDATE, concurrent verdicts don't have to lock the row first
+        """
+        result = str(result)
+        Problem.objects.filter(id=self.id).update(
+            submission_number=models.F("submission_number") + 1,
+            accepted_number=models.F("accepted_number") + int(accepted),
+            statistic_info=RawSQL("jsonb_set(statistic_info, %s, to_jsonb(COALESCE((statistic_info ->> %s)::int, 0) + 1))",
+                                  ([result], result)))
@@ -0,0 +1,58 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, Q
+
+# there is no Korean dictionary in Postgres, "simple" only lowercases so Korean words are indexed as written
+SEARCH_CONFIG = "simple"
+# characters with a meaning in tsquery syntax
+_TSQUERY_SPECIAL = re.compile(r"[&|!():*<>'\\]")
+
+# kept in sync with the initial fill in migration 0015_problem_search_vector
+_UPDATE_SEARCH_VECTOR_SQL = f"""
+UPDATE problem SET search_vector =
+    setweight(to_tsvector('{SEARCH_CONFIG}', COALESCE(problem.title, '')), 'A') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', COALESCE((
+        SELECT string_agg(problem_tag.name, ' ') FROM problem_tags
+        JOIN problem_tag ON problem_tag.id = problem_tags.problemtag_id
+        WHERE problem_tags.problem_id = problem.id), '')), 'B') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', COALESCE(problem.source, '')), 'C') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', COALESCE(problem.description, '')), 'D')
+WHERE problem.id = ANY(%s)
+"""
+
+
+def update_search_vector(*problem_ids):
+    """
+    The vector includes the tag names, so it is updated after the tags of the problems are set, not on save
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(_UPDATE_SEARCH_VECTOR_SQL, [list(problem_ids)])
+
+
+def _prefix_query(keyword):
+    """
+    Every word of the keyword as a prefix, so Korean words match with their particles attached
+    """
+    words = _TSQUERY_SPECIAL.sub(" ", keyword).split()
+    if not words:
+        return None
+    return SearchQuery(" & ".join(f"{word}:*" for word in words), config=SEARCH_CONFIG, search_type="raw")
+
+
+def search_problems(problems, keyword):
+    """
+    Full text matches on title, tags, source and description ranked by relevance, followed by the title and
+    display id substring matches the full text search misses, like a part of a compound word.
+    Both conditions are served by GIN indexes.
+    """
+    condition = Q(title__icontains=keyword) | Q(_id__icontains=keyword)
+    query = _prefix_query(keyword)
+    if query is None:
+        return problems.filter(condition)
+    # the original order breaks ties
+    ordering = problems.query.order_by or problems.model._meta.ordering
+    return problems.filter(condition | Q(search_vector=query)) \
+        .annotate(rank=SearchRank(F("search_vector"), query)) \
+        .order_by("-rank", *ordering)
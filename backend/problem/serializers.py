@@ -13,6 +13,7 @@ from .utils import parse_problem_template
 class TestCaseUploadForm(forms.Form):
     spj = forms.CharField(max_length=12)
     file = forms.FileField()
+    background = forms.CharField(max_length=12, required=False)
 
 
 class CreateSampleSerializer(serializers.Serializer):
@@ -94,6 +95,9 @@ class EditContestProblemSerializer(CreateOrEditProblemSerializer):
 
 
 class TagSerializer(serializers.ModelSerializer):
+    # number of visible public problems with the tag
+    problem_count = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = ProblemTag
         fields = "__all__"
@@ -123,7 +127,7 @@ class BaseProblemSerializer(serializers.ModelSerializer):
 class ProblemAdminSerializer(BaseProblemSerializer):
     class Meta:
         model = Problem
-        fields = "__all__"
+        exclude = ("search_vector",)
 
 
 class ProblemSerializer(BaseProblemSerializer):
@@ -131,7 +135,7 @@ class ProblemSerializer(BaseProblemSerializer):
     class Meta:
         model = Problem
         exclude = ("test_case_score", "test_case_id", "visible", "is_public",
-                   "spj_code", "spj_version", "spj_compile_ok")
+                   "spj_code", "spj_version", "spj_compile_ok", "search_vector")
 
 
 class ProblemSafeSerializer(BaseProblemSerializer):
@@ -141,7 +145,7 @@ class ProblemSafeSerializer(BaseProblemSerializer):
         model = Problem
         exclude = ("test_case_score", "test_case_id", "visible", "is_public",
                    "spj_code", "spj_version", "spj_compile_ok",
-                   "difficulty", "submission_number", "accepted_number", "statistic_info")
+                   "difficulty", "submission_number", "accepted_number", "statistic_info", "search_vector")
 
 
 class ContestProblemMakePublicSerializer(serializers.Serializer):
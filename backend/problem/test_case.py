@@ -0,0 +1,442 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+
+from utils.api import APIError
+from utils.cache import cache
+from utils.constants import CacheKey
+from utils.shortcuts import ZipStream, rand_str, natural_sort_key
+
+logger = logging.getLogger(__name__)
+
+# bytes read from a zip member at a time, the only buffer held while a test case is extracted
+CHUNK_SIZE = 64 * 1024
+# threads extracting the files of one upload
+TEST_CASE_WORKERS = min(4, os.cpu_count() or 1)
+# the job state is kept for the admin to pick the result up
+TEST_CASE_JOB_TIMEOUT = 24 * 60 * 60
+# a queued or running job saves its state at least this often, a job without news for TEST_CASE_JOB_STALE_TIMEOUT
+# seconds died with the web worker running it
+TEST_CASE_JOB_HEARTBEAT_INTERVAL = 10
+TEST_CASE_JOB_STALE_TIMEOUT = 5 * 60
+# total size of the cached download zips, the least recently downloaded ones are removed first
+TEST_CASE_CACHE_MAX_SIZE = 2 * 1024 * 1024 * 1024
+# bytes of the start and of the end of a file shown by the preview by default, and the largest single read
+PREVIEW_HEAD_SIZE = 4 * 1024
+PREVIEW_TAIL_SIZE = 1024
+PREVIEW_MAX_SIZE = 1024 * 1024
+# bytes of test case content in one page of the preview
+PREVIEW_PAGE_SIZE = 4 * 1024 * 1024
+
+
+class TestCaseWriter(object):
+    """
+    Normalize line endings of a test case file while it is written in chunks.
+    A \r at the end of a chunk is held back until the next chunk shows whether it starts a \r\n.
+    size and stripped_output_md5 (md5 of the content without trailing whitespace) are computed on the way:
+    `full` hashes everything written so far, `stripped` is a copy of it taken at the last non whitespace byte.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.size = 0
+        self.full = hashlib.md5()
+        self.stripped = self.full.copy()
+        self.pending_cr = False
+
+    def _write(self, data):
+        if not data:
+            return
+        self.file.write(data)
+        self.size += len(data)
+        content_length = len(data.rstrip())
+        if content_length:
+            self.full.update(data[:content_length])
+            self.stripped = self.full.copy()
+            self.full.update(data[content_length:])
+        else:
+            self.full.update(data)
+
+    def write(self, chunk):
+        if self.pending_cr:
+            chunk = b"\r" + chunk
+        self.pending_cr = chunk.endswith(b"\r")
+        if self.pending_cr:
+            chunk = chunk[:-1]
+        self._write(chunk.replace(b"\r\n", b"\n"))
+
+    def close(self):
+        if self.pending_cr:
+            self._write(b"\r")
+            self.pending_cr = False
+
+    @property
+    def stripped_output_md5(self):
+        return self.stripped.hexdigest()
+
+
+def extract_test_case(zip_file, name, path, lock=None):
+    """
+    Copy a zip member to path with \r\n replaced by \n, never holding more than CHUNK_SIZE bytes of it
+    :param lock: shared by the threads extracting from zip_file, reads are safe but opening and closing members
+                 updates the reference count of the underlying file
+    :return: (size, stripped_output_md5) of the written file
+    """
+    lock = lock or threading.Lock()
+    with lock:
+        source = zip_file.open(name)
+    try:
+        with open(path, "wb") as f:
+            writer = TestCaseWriter(f)
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.write(chunk)
+            writer.close()
+    finally:
+        with lock:
+            source.close()
+    return writer.size, writer.stripped_output_md5
+
+
+class TestCaseZipProcessor(object):
+    def process_zip(self, uploaded_zip_file, spj, dir="", progress=None):
+        """
+        :param progress: called with (number of extracted files, number of files) after every file
+        :return: (info, test_case_id), info follows the order of the test cases whatever the order of extraction
+        """
+        try:
+            zip_file = zipfile.ZipFile(uploaded_zip_file, "r")
+        except zipfile.BadZipFile:
+            raise APIError("Bad zip file")
+        name_list = zip_file.namelist()
+        test_case_list = self.filter_name_list(name_list, spj=spj, dir=dir)
+        if not test_case_list:
+            raise APIError("Empty file")
+
+        test_case_id = rand_str()
+        test_case_dir = os.path.join(settings.TEST_CASE_DIR, test_case_id)
+        os.mkdir(test_case_dir)
+        os.chmod(test_case_dir, 0o710)
+
+        size_cache = {}
+        md5_cache = {}
+
+        # zlib, md5 and file writes release the GIL, and zipfile supports concurrent reads of its members
+        lock = threading.Lock()
+        with ThreadPoolExecutor(max_workers=TEST_CASE_WORKERS) as executor:
+            futures = {executor.submit(extract_test_case, zip_file, f"{dir}{item}",
+                                       os.path.join(test_case_dir, item), lock): item for item in test_case_list}
+            for done, future in enumerate(as_completed(futures), 1):
+                item = futures[future]
+                size_cache[item], md5_cache[item] = future.result()
+                if progress:
+                    progress(done, len(test_case_list))
+        zip_file.close()
+        test_case_info = {"spj": spj, "test_cases": {}}
+
+        info = []
+
+        if spj:
+            for index, item in enumerate(test_case_list):
+                data = {"input_name": item, "input_size": size_cache[item]}
+                info.append(data)
+                test_case_info["test_cases"][str(index + 1)] = data
+        else:
+            # ["1.in", "1.out", "2.in", "2.out"] => [("1.in", "1.out"), ("2.in", "2.out")]
+            test_case_list = zip(*[test_case_list[i::2] for i in range(2)])
+            for index, item in enumerate(test_case_list):
+                data = {"stripped_output_md5": md5_cache[item[1]],
+                        "input_size": size_cache[item[0]],
+                        "output_size": size_cache[item[1]],
+                        "input_name": item[0],
+                        "output_name": item[1]}
+                info.append(data)
+                test_case_info["test_cases"][str(index + 1)] = data
+
+        with open(os.path.join(test_case_dir, "info"), "w", encoding="utf-8") as f:
+            f.write(json.dumps(test_case_info, indent=4))
+
+        for item in os.listdir(test_case_dir):
+            os.chmod(os.path.join(test_case_dir, item), 0o640)
+
+        return info, test_case_id
+
+    def filter_name_list(self, name_list, spj, dir=""):
+        name_list = set(name_list)
+        ret = []
+        prefix = 1
+        if spj:
+            while True:
+                in_name = f"{prefix}.in"
+                if f"{dir}{in_name}" in name_list:
+                    ret.append(in_name)
+                    prefix += 1
+                    continue
+                else:
+                    return sorted(ret, key=natural_sort_key)
+        else:
+            while True:
+                in_name = f"{prefix}.in"
+                out_name = f"{prefix}.out"
+                if f"{dir}{in_name}" in name_list and f"{dir}{out_name}" in name_list:
+                    ret.append(in_name)
+                    ret.append(out_name)
+                    prefix += 1
+                    continue
+                else:
+                    return sorted(ret, key=natural_sort_key)
+
+
+class TestCaseJobStatus(object):
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    FINISHED = "finished"
+    FAILED = "failed"
+
+
+# background uploads run in threads of the web worker that received them: the dramatiq workers run as another user
+# without access to the test case directory. The state is in redis, so any web worker can report the progress,
+# and the heartbeat tells a job killed by a restart of its worker from a running one
+_job_executor = ThreadPoolExecutor(max_workers=2)
+
+
+def _job_key(job_id):
+    return f"{CacheKey.test_case_job}:{job_id}"
+
+
+def _save_job(job_id, job):
+    cache.set(_job_key(job_id), job, timeout=TEST_CASE_JOB_TIMEOUT)
+
+
+def _remove_upload(zip_path):
+    try:
+        os.remove(zip_path)
+    except FileNotFoundError:
+        pass
+
+
+def get_test_case_job(job_id):
+    """
+    A job still queued or processing without heartbeat for TEST_CASE_JOB_STALE_TIMEOUT is reported failed
+    and its upload removed
+    :return: {"user_id", "status", "done", "total", "start_time", "heartbeat", "zip_path",
+              "result" when finished, "error" when failed} or None
+    """
+    job = cache.get(_job_key(job_id))
+    if job and job["status"] in (TestCaseJobStatus.QUEUED, TestCaseJobStatus.PROCESSING) and \
+            time.time() - job["heartbeat"] > TEST_CASE_JOB_STALE_TIMEOUT:
+        job.update(status=TestCaseJobStatus.FAILED, error="Processing was interrupted, upload the file again")
+        _remove_upload(job["zip_path"])
+        _save_job(job_id, job)
+    return job
+
+
+class _JobState(object):
+    """
+    Saves a job with a heartbeat from its submit to its end: the job may wait for a thread of _job_executor,
+    and extracting a single large file may take longer than the stale timeout
+    """
+    def __init__(self, job_id, job):
+        self.job_id = job_id
+        self.job = job
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        _save_job(job_id, job)
+        threading.Thread(target=self._heartbeat, daemon=True).start()
+
+    def _heartbeat(self):
+        while not self._stopped.wait(TEST_CASE_JOB_HEARTBEAT_INTERVAL):
+            self.save()
+
+    def save(self, **fields):
+        with self._lock:
+            self.job.update(heartbeat=time.time(), **fields)
+            _save_job(self.job_id, dict(self.job))
+
+    def finish(self, **fields):
+        self._stopped.set()
+        self.save(**fields)
+
+
+def _run_test_case_job(state, zip_path, spj):
+    state.save(status=TestCaseJobStatus.PROCESSING)
+    try:
+        info, test_case_id = TestCaseZipProcessor().process_zip(
+            zip_path, spj=spj, progress=lambda done, total: state.save(done=done, total=total))
+        fields = {"status": TestCaseJobStatus.FINISHED, "result": {"id": test_case_id, "info": info, "spj": spj}}
+    except APIError as e:
+        fields = {"status": TestCaseJobStatus.FAILED, "error": e.msg}
+    except Exception as e:
+        logger.exception(e)
+        fields = {"status": TestCaseJobStatus.FAILED, "error": "Failed to process test cases"}
+    finally:
+        _remove_upload(zip_path)
+    state.finish(**fields)
+
+
+def _remove_stale_uploads():
+    """
+    Uploads of jobs killed with their web worker that nobody asked about again
+    """
+    for entry in os.scandir(tempfile.gettempdir()):
+        if entry.name.startswith("test_case_") and entry.name.endswith(".zip"):
+            try:
+                if time.time() - entry.stat().st_mtime > TEST_CASE_JOB_TIMEOUT:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def start_test_case_job(uploaded_file, spj, user_id):
+    """
+    Copy the upload, which is removed at the end of the request, and process it in the background
+    :return: job id for get_test_case_job
+    """
+    _remove_stale_uploads()
+    job_id = rand_str()
+    zip_path = os.path.join(tempfile.gettempdir(), f"test_case_{job_id}.zip")
+    with open(zip_path, "wb") as f:
+        for chunk in uploaded_file.chunks():
+            f.write(chunk)
+    now = time.time()
+    job = {"user_id": user_id, "status": TestCaseJobStatus.QUEUED, "done": 0, "total": 0,
+           "start_time": now, "heartbeat": now, "zip_path": zip_path}
+    _job_executor.submit(_run_test_case_job, _JobState(job_id, job), zip_path, spj)
+    return job_id
+
+
+def _manifest_hash(test_case_dir, test_case_id, name_list):
+    sha256 = hashlib.sha256(test_case_id.encode("utf-8"))
+    for name in name_list:
+        stat = os.stat(os.path.join(test_case_dir, name))
+        sha256.update(f"\0{name}\0{stat.st_size}\0{stat.st_mtime_ns}".encode("utf-8"))
+    return sha256.hexdigest()
+
+
+def _prune_test_case_cache():
+    entries = []
+    for entry in os.scandir(settings.TEST_CASE_CACHE_DIR):
+        if entry.name.endswith(".zip"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= TEST_CASE_CACHE_MAX_SIZE:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _build_test_case_zip(test_case_dir, name_list, path):
+    """
+    Yield the zip while it is compressed, one CHUNK_SIZE read of a test case at a time, and tee it to the cache.
+    The cache entry only appears once the zip is complete, an interrupted download leaves nothing behind.
+    """
+    os.makedirs(settings.TEST_CASE_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{rand_str()}.tmp"
+    stream = ZipStream()
+    try:
+        with open(tmp_path, "wb") as cache_file:
+            with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as zip_file:
+                for name in name_list:
+                    file_path = os.path.join(test_case_dir, name)
+                    zip_info = zipfile.ZipInfo.from_file(file_path, name)
+                    zip_info.compress_type = zipfile.ZIP_DEFLATED
+                    with open(file_path, "rb") as source, zip_file.open(zip_info, "w") as target:
+                        while True:
+                            chunk = source.read(CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            target.write(chunk)
+                            data = stream.pop()
+                            if data:
+                                cache_file.write(data)
+                                yield data
+            data = stream.pop()
+            cache_file.write(data)
+            yield data
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _prune_test_case_cache()
+
+
+def get_test_case_zip(test_case_id, name_list):
+    """
+    Zip of the given files of a test case, cached in TEST_CASE_CACHE_DIR by the hash of their names, sizes and
+    modification times, so nothing is written to the test case directory
+    :return: (iterator of the zip content, size of the zip or None if it is built while it is sent)
+    """
+    test_case_dir = os.path.join(settings.TEST_CASE_DIR, test_case_id)
+    # left by the previous implementation, it would be synced to the judge servers
+    legacy_zip = os.path.join(test_case_dir, f"{test_case_id}.zip")
+    if os.path.exists(legacy_zip):
+        os.remove(legacy_zip)
+
+    path = os.path.join(settings.TEST_CASE_CACHE_DIR, _manifest_hash(test_case_dir, test_case_id, name_list) + ".zip")
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return _build_test_case_zip(test_case_dir, name_list, path), None
+    # the modification time orders the pruning
+    os.utime(path)
+    return FileWrapper(f, CHUNK_SIZE), os.fstat(f.fileno()).st_size
+
+
+def load_test_case_info(test_case_id):
+    """
+    :return: the test cases of the info file ordered by their number
+    """
+    try:
+        with open(os.path.join(settings.TEST_CASE_DIR, test_case_id, "info"), encoding="utf-8") as f:
+            test_cases = json.load(f)["test_cases"]
+    except FileNotFoundError:
+        raise APIError("Test case does not exists")
+    return [test_cases[key] for key in sorted(test_cases, key=int)]
+
+
+def _decode(data):
+    # a read may split a multi byte character
+    return data.decode("utf-8", errors="replace")
+
+
+def preview_test_case_file(path, head=PREVIEW_HEAD_SIZE, tail=PREVIEW_TAIL_SIZE):
+    """
+    Only the first head and the last tail bytes are read, whatever the size of the file
+    :return: {"head", "tail", "truncated"}, the whole file is in head unless it is longer than head + tail
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= head + tail:
+            return {"head": _decode(f.read()), "tail": "", "truncated": False}
+        data = f.read(head)
+        f.seek(size - tail)
+        return {"head": _decode(data), "tail": _decode(f.read(tail)), "truncated": True}
+
+
+def read_test_case_range(path, start, length):
+    """
+    :return: {"start", "data", "size"}, size is the size of the whole file
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        f.seek(min(start, size))
+        return {"start": start, "data": _decode(f.read(length)), "size": size}
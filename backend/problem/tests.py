@@ -1,19 +1,33 @@
 import copy
 import hashlib
+import io
 import os
 import shutil
+import tempfile
+import threading
+import time
 from datetime import timedelta
+from unittest import mock
 from zipfile import ZipFile
 
 from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 
 from utils.api.tests import APITestCase
+from utils.cache import cache
+from utils.constants import CacheKey
 
 from .models import ProblemTag, ProblemIOMode
 from .models import Problem, ProblemRuleType
 from contest.models import Contest
 from contest.tests import DEFAULT_CONTEST_DATA
 
+from .cache import bump_problem_list_version
+from . import test_case
+from .search import update_search_vector
+from .test_case import TestCaseJobStatus, TestCaseWriter
 from .views.admin import TestCaseAPI
 from .utils import parse_problem_template
 
@@ -73,12 +87,29 @@ class ProblemTagListAPITest(APITestCase):
         resp = self.client.get(self.reverse("problem_tag_list_api"))
         self.assertSuccess(resp)
 
+    def test_tag_counts(self):
+        admin = self.create_admin(login=False)
+        contest = Contest.objects.create(created_by=admin, **DEFAULT_CONTEST_DATA)
+        ProblemCreateTestBase.add_problem(DEFAULT_PROBLEM_DATA, admin)
+        for _id, extra in (("A-111", {"visible": False}), ("A-112", {"contest": contest})):
+            data = copy.deepcopy(DEFAULT_PROBLEM_DATA)
+            data.update(_id=_id, **extra)
+            ProblemCreateTestBase.add_problem(data, admin)
+        url = self.reverse("problem_tag_list_api")
+        self.assertEqual([(item["name"], item["problem_count"]) for item in self.client.get(url).data["data"]],
+                         [("test", 1)])
+
+        Problem.objects.filter(_id="A-111").update(visible=True)
+        self.assertEqual(self.client.get(url).data["data"][0]["problem_count"], 1)
+        bump_problem_list_version()
+        self.assertEqual(self.client.get(url).data["data"][0]["problem_count"], 2)
+
 
 class TestCaseUploadAPITest(APITestCase):
     def setUp(self):
         self.api = TestCaseAPI()
         self.url = self.reverse("test_case_api")
-        self.create_super_admin()
+        self.user = self.create_super_admin()
 
     def test_filter_file_name(self):
         self.assertEqual(self.api.filter_name_list(["1.in", "1.out", "2.in", ".DS_Store"], spj=False),
@@ -88,6 +119,19 @@ class TestCaseUploadAPITest(APITestCase):
         self.assertEqual(self.api.filter_name_list(["1.in", "1.out", "2.in"], spj=True), ["1.in", "2.in"])
         self.assertEqual(self.api.filter_name_list(["2.in", "3.in"], spj=True), [])
 
+    def test_test_case_writer(self):
+        content = b"1 2\r\n3 4\r\r\n \r\n\t"
+        f = io.BytesIO()
+        writer = TestCaseWriter(f)
+        # every chunk boundary, including the ones inside \r\n
+        for i in range(len(content)):
+            writer.write(content[i:i + 1])
+        writer.close()
+        expected = content.replace(b"\r\n", b"\n")
+        self.assertEqual(f.getvalue(), expected)
+        self.assertEqual(writer.size, len(expected))
+        self.assertEqual(writer.stripped_output_md5, hashlib.md5(expected.rstrip()).hexdigest())
+
     def make_test_case_zip(self):
         base_dir = os.path.join("/tmp", "test_case")
         shutil.rmtree(base_dir, ignore_errors=True)
@@ -130,6 +174,112 @@ class TestCaseUploadAPITest(APITestCase):
                 with open(os.path.join(test_case_dir, name), "r", encoding="utf-8") as f:
                     self.assertEqual(f.read(), name + "\n" + name + "\n" + "end")
 
+    def upload_in_background(self):
+        with open(self.make_test_case_zip(), "rb") as f:
+            resp = self.client.post(self.url, data={"spj": "false", "file": f, "background": "true"}, format="multipart")
+        self.assertSuccess(resp)
+        return resp.data["data"]["job_id"]
+
+    def get_job(self, job_id):
+        return self.client.get(self.reverse("test_case_job_api"), data={"id": job_id}).data["data"]
+
+    def wait_for_job(self, job_id):
+        for _ in range(100):
+            job = self.get_job(job_id)
+            if job["status"] not in (TestCaseJobStatus.QUEUED, TestCaseJobStatus.PROCESSING):
+                return job
+            time.sleep(0.1)
+        return job
+
+    def test_upload_test_case_zip_in_background(self):
+        job = self.wait_for_job(self.upload_in_background())
+        self.assertEqual(job["status"], TestCaseJobStatus.FINISHED)
+        self.assertEqual((job["done"], job["total"]), (2, 2))
+        self.assertEqual([item["input_name"] for item in job["result"]["info"]], ["1.in"])
+        self.assertTrue(os.path.isdir(os.path.join(settings.TEST_CASE_DIR, job["result"]["id"])))
+
+        self.assertFailed(self.client.get(self.reverse("test_case_job_api"), data={"id": "unknown"}), "Job does not exist")
+
+    @mock.patch.multiple(test_case, TEST_CASE_JOB_HEARTBEAT_INTERVAL=0.1, TEST_CASE_JOB_STALE_TIMEOUT=0.5)
+    def test_queued_test_case_job(self):
+        # both threads of the executor are busy with earlier uploads
+        release = threading.Event()
+        self.addCleanup(release.set)
+        for _ in range(2):
+            test_case._job_executor.submit(release.wait)
+        job_id = self.upload_in_background()
+        time.sleep(1)
+        # waiting longer than the stale timeout is not an interruption
+        self.assertEqual(self.get_job(job_id)["status"], TestCaseJobStatus.QUEUED)
+        release.set()
+        self.assertEqual(self.wait_for_job(job_id)["status"], TestCaseJobStatus.FINISHED)
+
+    def test_stale_test_case_job(self):
+        zip_path = os.path.join(tempfile.gettempdir(), "test_case_stale.zip")
+        open(zip_path, "wb").close()
+        # the web worker running the job was restarted
+        job = {"user_id": self.user.id, "status": TestCaseJobStatus.PROCESSING, "done": 0, "total": 2,
+               "start_time": time.time() - 3600, "heartbeat": time.time() - 3600, "zip_path": zip_path}
+        cache.set(f"{CacheKey.test_case_job}:stale", job)
+        resp = self.client.get(self.reverse("test_case_job_api"), data={"id": "stale"})
+        self.assertSuccess(resp)
+        self.assertEqual(resp.data["data"]["status"], TestCaseJobStatus.FAILED)
+        self.assertNotIn("zip_path", resp.data["data"])
+        self.assertFalse(os.path.exists(zip_path))
+
+    def test_download_test_case_zip(self):
+        with open(self.make_test_case_zip(), "rb") as f:
+            test_case_id = self.client.post(self.url, data={"spj": "false", "file": f}, format="multipart").data["data"]["id"]
+        problem_data = copy.deepcopy(DEFAULT_PROBLEM_DATA)
+        problem_data["test_case_id"] = test_case_id
+        problem = ProblemCreateTestBase.add_problem(problem_data, self.user)
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        with override_settings(TEST_CASE_CACHE_DIR=cache_dir.name):
+            resp = self.client.get(self.url, data={"problem_id": problem.id})
+            self.assertNotIn("Content-Length", resp)
+            content = b"".join(resp.streaming_content)
+            self.assertEqual(len(os.listdir(cache_dir.name)), 1)
+            # served from the cache
+            resp = self.client.get(self.url, data={"problem_id": problem.id})
+            self.assertEqual(int(resp["Content-Length"]), len(content))
+            self.assertEqual(b"".join(resp.streaming_content), content)
+        with ZipFile(io.BytesIO(content)) as f:
+            self.assertEqual(f.namelist(), ["1.in", "1.out", "info"])
+            self.assertEqual(f.read("1.in"), b"1.in\n1.in\nend")
+        self.assertEqual(sorted(os.listdir(os.path.join(settings.TEST_CASE_DIR, test_case_id))), ["1.in", "1.out", "info"])
+
+    def test_preview_test_case(self):
+        with open(self.make_test_case_zip(), "rb") as f:
+            data = self.client.post(self.url, data={"spj": "false", "file": f}, format="multipart").data["data"]
+        problem_data = copy.deepcopy(DEFAULT_PROBLEM_DATA)
+        problem_data["test_case_id"] = data["id"]
+        problem = ProblemCreateTestBase.add_problem(problem_data, self.user)
+        url = self.reverse("test_case_preview_api")
+
+        resp = self.client.get(url, data={"problem_id": problem.id, "head": 4, "tail": 3})
+        self.assertSuccess(resp)
+        preview = resp.data["data"]
+        self.assertEqual(preview["total"], 1)
+        case = preview["results"][0]
+        self.assertEqual(case["stripped_output_md5"], data["info"][0]["stripped_output_md5"])
+        self.assertEqual(case["input"], {"head": "1.in", "tail": "end", "truncated": True})
+        self.assertEqual(case["output"]["head"], "1.ou")
+
+        resp = self.client.get(url, data={"problem_id": problem.id})
+        self.assertEqual(resp.data["data"]["results"][0]["input"], {"head": "1.in\n1.in\nend", "tail": "", "truncated": False})
+
+        resp = self.client.get(url, data={"problem_id": problem.id, "name": "1.out", "start": 6, "length": 4})
+        self.assertEqual(resp.data["data"], {"name": "1.out", "start": 6, "data": "1.ou", "size": 15})
+        self.assertFailed(self.client.get(url, data={"problem_id": problem.id, "name": "info"}),
+                          "Test case file does not exist")
+        self.assertFailed(self.client.get(url, data={"problem_id": problem.id, "head": -1}), "Invalid head")
+        self.assertFailed(self.client.get(url, data={"problem_id": problem.id, "limit": 250, "head": 1024 * 1024}),
+                          "Preview is too large, lower limit, head or tail")
+        # offsets are not capped, they are clamped to the file size
+        resp = self.client.get(url, data={"problem_id": problem.id, "name": "1.in", "start": 10 * 1024 * 1024})
+        self.assertEqual(resp.data["data"]["data"], "")
+
 
 class ProblemAdminAPITest(APITestCase):
     def setUp(self):
@@ -188,6 +338,49 @@ class ProblemAPITest(ProblemCreateTestBase):
         resp = self.client.get(f"{self.url}?limit=10")
         self.assertSuccess(resp)
 
+    def test_problem_list_cache(self):
+        self.assertSuccess(self.client.get(self.url, data={"limit": "10"}))
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(self.url, data={"limit": "10"})
+        self.assertEqual(resp.data["data"]["total"], 1)
+        self.assertFalse([query for query in queries.captured_queries if 'FROM "problem"' in query["sql"]])
+
+        # a new problem is only listed once the version is bumped, like the admin api does
+        data = copy.deepcopy(DEFAULT_PROBLEM_DATA)
+        data["_id"] = "A-111"
+        self.add_problem(data, self.problem.created_by)
+        self.assertEqual(self.client.get(self.url, data={"limit": "10"}).data["data"]["total"], 1)
+        bump_problem_list_version()
+        self.assertEqual(self.client.get(self.url, data={"limit": "10"}).data["data"]["total"], 2)
+
+    def test_problem_list_cache_my_status(self):
+        self.assertIsNone(self.client.get(self.url, data={"limit": "10"}).data["data"]["results"][0]["my_status"])
+        user = self.create_user("solver", "test123")
+        user.userprofile.acm_problems_status = {"problems": {str(self.problem.id): {"status": 0, "_id": "A-110"}}}
+        user.userprofile.save()
+        self.assertEqual(self.client.get(self.url, data={"limit": "10"}).data["data"]["results"][0]["my_status"], 0)
+
+    def test_search_problem(self):
+        data = copy.deepcopy(DEFAULT_PROBLEM_DATA)
+        data.update({"_id": "B-1", "title": "배열 뒤집기", "tags": ["정렬"], "description": "<p>reverse the array</p>"})
+        problem = self.add_problem(data, self.problem.created_by)
+        update_search_vector(self.problem.id, problem.id)
+
+        def search(keyword):
+            resp = self.client.get(self.url, data={"limit": "10", "keyword": keyword})
+            self.assertSuccess(resp)
+            return [item["_id"] for item in resp.data["data"]["results"]]
+
+        # words of the title and tags, prefixes and words of the description
+        self.assertEqual(search("배열"), ["B-1"])
+        self.assertEqual(search("정렬"), ["B-1"])
+        self.assertEqual(search("뒤집"), ["B-1"])
+        self.assertEqual(search("ARRAY"), ["B-1"])
+        # substrings inside a word fall back to the trigram index
+        self.assertEqual(search("열 뒤"), ["B-1"])
+        # the title match is ranked above the description match
+        self.assertEqual(search("test"), ["A-110", "B-1"])
+
     def get_one_problem(self):
         resp = self.client.get(self.url + "?id=" + self.problem._id)
         self.assertSuccess(resp)
@@ -1,10 +1,13 @@
 from django.conf.urls import url
 
 from ..views.admin import (ContestProblemAPI, ProblemAPI, TestCaseAPI, MakeContestProblemPublicAPIView,
-                           CompileSPJAPI, AddContestProblemAPI, TestCaseTextAPI)
+                           CompileSPJAPI, AddContestProblemAPI, TestCaseTextAPI, TestCaseJobAPI,
+                           TestCasePreviewAPI)
 
 urlpatterns = [
     url(r"^test_case/?$", TestCaseAPI.as_view(), name="test_case_api"),
+    url(r"^test_case/job/?$", TestCaseJobAPI.as_view(), name="test_case_job_api"),
+    url(r"^test_case/preview/?$", TestCasePreviewAPI.as_view(), name="test_case_preview_api"),
     url(r"^compile_spj/?$", CompileSPJAPI.as_view(), name="compile_spj"),
     url(r"^problem/?$", ProblemAPI.as_view(), name="problem_admin_api"),
     url(r"^contest/problem/?$", ContestProblemAPI.as_view(), name="contest_problem_admin_api"),
@@ -1,20 +1,23 @@
 import hashlib
 import json
 import os
-import zipfile
-from wsgiref.util import FileWrapper
 
 from django.conf import settings
-from django.db.models import Q
 from django.http import StreamingHttpResponse
 
 from account.decorators import problem_permission_required, ensure_created_by
+from contest.cache import invalidate_contest_cache
 from contest.models import Contest, ContestStatus
 from judge.dispatcher import SPJCompiler
 from submission.models import Submission
-from utils.api import APIView, CSRFExemptAPIView, validate_serializer, APIError
-from utils.shortcuts import rand_str, natural_sort_key
+from utils.api import APIError, APIView, CSRFExemptAPIView, validate_serializer
+from utils.shortcuts import rand_str
+from ..cache import bump_problem_list_version
 from ..models import Problem, ProblemRuleType, ProblemTag
+from ..search import search_problems, update_search_vector
+from ..test_case import (PREVIEW_HEAD_SIZE, PREVIEW_MAX_SIZE, PREVIEW_PAGE_SIZE, PREVIEW_TAIL_SIZE,
+                         TestCaseZipProcessor, get_test_case_job, get_test_case_zip, load_test_case_info, preview_test_case_file,
+                         read_test_case_range, start_test_case_job)
 from ..serializers import (CreateContestProblemSerializer, CompileSPJSerializer,
                            CreateProblemSerializer, EditProblemSerializer, EditContestProblemSerializer,
                            ProblemAdminSerializer, TestCaseUploadForm, ContestProblemMakePublicSerializer,
@@ -25,86 +28,6 @@ from drf_yasg import openapi
 from rest_framework.parsers import MultiPartParser
 
 
-class TestCaseZipProcessor(object):
-    def process_zip(self, uploaded_zip_file, spj, dir=""):
-        try:
-            zip_file = zipfile.ZipFile(uploaded_zip_file, "r")
-        except zipfile.BadZipFile:
-            raise APIError("Bad zip file")
-        name_list = zip_file.namelist()
-        test_case_list = self.filter_name_list(name_list, spj=spj, dir=dir)
-        if not test_case_list:
-            raise APIError("Empty file")
-
-        test_case_id = rand_str()
-        test_case_dir = os.path.join(settings.TEST_CASE_DIR, test_case_id)
-        os.mkdir(test_case_dir)
-        os.chmod(test_case_dir, 0o710)
-
-        size_cache = {}
-        md5_cache = {}
-
-        for item in test_case_list:
-            with open(os.path.join(test_case_dir, item), "wb") as f:
-                content = zip_file.read(f"{dir}{item}").replace(b"\r\n", b"\n")
-                size_cache[item] = len(content)
-                if item.endswith(".out"):
-                    md5_cache[item] = hashlib.md5(content.rstrip()).hexdigest()
-                f.write(content)
-        test_case_info = {"spj": spj, "test_cases": {}}
-
-        info = []
-
-        if spj:
-            for index, item in enumerate(test_case_list):
-                data = {"input_name": item, "input_size": size_cache[item]}
-                info.append(data)
-                test_case_info["test_cases"][str(index + 1)] = data
-        else:
-            # ["1.in", "1.out", "2.in", "2.out"] => [("1.in", "1.out"), ("2.in", "2.out")]
-            test_case_list = zip(*[test_case_list[i::2] for i in range(2)])
-            for index, item in enumerate(test_case_list):
-                data = {"stripped_output_md5": md5_cache[item[1]],
-                        "input_size": size_cache[item[0]],
-                        "output_size": size_cache[item[1]],
-                        "input_name": item[0],
-                        "output_name": item[1]}
-                info.append(data)
-                test_case_info["test_cases"][str(index + 1)] = data
-
-        with open(os.path.join(test_case_dir, "info"), "w", encoding="utf-8") as f:
-            f.write(json.dumps(test_case_info, indent=4))
-
-        for item in os.listdir(test_case_dir):
-            os.chmod(os.path.join(test_case_dir, item), 0o640)
-
-        return info, test_case_id
-
-    def filter_name_list(self, name_list, spj, dir=""):
-        ret = []
-        prefix = 1
-        if spj:
-            while True:
-                in_name = f"{prefix}.in"
-                if f"{dir}{in_name}" in name_list:
-                    ret.append(in_name)
-                    prefix += 1
-                    continue
-                else:
-                    return sorted(ret, key=natural_sort_key)
-        else:
-            while True:
-                in_name = f"{prefix}.in"
-                out_name = f"{prefix}.out"
-                if f"{dir}{in_name}" in name_list and f"{dir}{out_name}" in name_list:
-                    ret.append(in_name)
-                    ret.append(out_name)
-                    prefix += 1
-                    continue
-                else:
-                    return sorted(ret, key=natural_sort_key)
-
-
 class TestCaseAPI(CSRFExemptAPIView, TestCaseZipProcessor):
     parser_classes = [MultiPartParser]
 
@@ -138,15 +61,11 @@ class TestCaseAPI(CSRFExemptAPIView, TestCaseZipProcessor):
             return self.error("Test case does not exists")
         name_list = self.filter_name_list(os.listdir(test_case_dir), problem.spj)
         name_list.append("info")
-        file_name = os.path.join(test_case_dir, problem.test_case_id + ".zip")
-        with zipfile.ZipFile(file_name, "w") as file:
-            for test_case in name_list:
-                file.write(f"{test_case_dir}/{test_case}", test_case)
-        response = StreamingHttpResponse(FileWrapper(open(file_name, "rb")),
-                                         content_type="application/octet-stream")
-
+        content, size = get_test_case_zip(problem.test_case_id, name_list)
+        response = StreamingHttpResponse(content, content_type="application/octet-stream")
         response["Content-Disposition"] = f"attachment; filename=problem_{problem.id}_test_cases.zip"
-        response["Content-Length"] = os.path.getsize(file_name)
+        if size is not None:
+            response["Content-Length"] = size
         return response
 
     @swagger_auto_schema(
@@ -156,6 +75,10 @@ class TestCaseAPI(CSRFExemptAPIView, TestCaseZipProcessor):
             ),
             openapi.Parameter(
                 name="file", in_=openapi.IN_FORM, type=openapi.TYPE_FILE
+            ),
+            openapi.Parameter(
+                name="background", in_=openapi.IN_FORM, type=openapi.TYPE_STRING,
+                description="\'true\' to process the file in the background and return a \'job_id\' for TestCaseJobAPI"
             )
         ],
         operation_description="Upload testcases. Returned \'id\' would be used when uploading problems(for \'testcase_id\')"
@@ -167,15 +90,35 @@ class TestCaseAPI(CSRFExemptAPIView, TestCaseZipProcessor):
             file = form.cleaned_data["file"]
         else:
             return self.error("Upload failed")
-        zip_file = f"/tmp/{rand_str()}.zip"
-        with open(zip_file, "wb") as f:
-            for chunk in file:
-                f.write(chunk)
-        info, test_case_id = self.process_zip(zip_file, spj=spj)
-        os.remove(zip_file)
+        if form.cleaned_data["background"] == "true":
+            return self.success({"job_id": start_test_case_job(file, spj, request.user.id)})
+        # large uploads are already spooled to a temporary file by django, zipfile reads it in place
+        info, test_case_id = self.process_zip(file, spj=spj)
         return self.success({"id": test_case_id, "info": info, "spj": spj})
 
 
+class TestCaseJobAPI(APIView):
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                name="id", in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="job_id returned by a background test case upload",
+                required=True
+            )
+        ],
+        operation_description="Progress of a background test case upload: queued, processing, finished or failed, "
+                              "the upload result once finished."
+    )
+    def get(self, request):
+        job = get_test_case_job(request.GET.get("id", ""))
+        if job is None or job["user_id"] != request.user.id:
+            return self.error("Job does not exist")
+        job.pop("user_id")
+        job.pop("zip_path")
+        return self.success(job)
+
+
 class TestCaseTextAPI(CSRFExemptAPIView, TestCaseZipProcessor):
     @swagger_auto_schema(
         request_body=TestCaseTextSerializer,
@@ -271,6 +214,97 @@ class TestCaseTextAPI(CSRFExemptAPIView, TestCaseZipProcessor):
         return self.success(TestCaseTextSerializer(testcases).data)
 
 
+def _size_param(request, name, default, maximum=PREVIEW_MAX_SIZE):
+    try:
+        value = int(request.GET.get(name, default))
+    except ValueError:
+        raise APIError(f"Invalid {name}")
+    if value < 0 or (maximum is not None and value > maximum):
+        raise APIError(f"Invalid {name}")
+    return value
+
+
+class TestCasePreviewAPI(APIView):
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                name="problem_id", in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=True
+            ),
+            openapi.Parameter(
+                name="offset", in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                description="first test case of the page"
+            ),
+            openapi.Parameter(
+                name="limit", in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                description="test cases per page"
+            ),
+            openapi.Parameter(
+                name="head", in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                description=f"bytes from the start of every file, {PREVIEW_HEAD_SIZE} by default"
+            ),
+            openapi.Parameter(
+                name="tail", in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                description=f"bytes from the end of every file longer than head + tail, {PREVIEW_TAIL_SIZE} by default"
+            ),
+            openapi.Parameter(
+                name="name", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                description="input or output file name, to read the byte range start, length of this file only"
+            ),
+            openapi.Parameter(name="start", in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter(name="length", in_=openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+        operation_description="Page of the test cases of a problem with their sizes and md5 from the info file, "
+                              "and the head and tail of every file. Only the bytes returned are read."
+    )
+    def get(self, request):
+        problem_id = request.GET.get("problem_id")
+        if not problem_id:
+            return self.error("Parameter error, problem_id is required")
+        try:
+            problem = Problem.objects.get(id=problem_id)
+        except Problem.DoesNotExist:
+            return self.error("Problem does not exists")
+
+        if problem.contest:
+            ensure_created_by(problem.contest, request.user)
+        else:
+            ensure_created_by(problem, request.user)
+
+        if not problem.test_case_id:
+            return self.error("Test case does not exists")
+        test_case_dir = os.path.join(settings.TEST_CASE_DIR, problem.test_case_id)
+        test_cases = load_test_case_info(problem.test_case_id)
+
+        name = request.GET.get("name")
+        if name:
+            # only names listed in info are opened
+            if not any(name in (item.get("input_name"), item.get("output_name")) for item in test_cases):
+                return self.error("Test case file does not exist")
+            # read_test_case_range clamps the offset to the size of the file
+            start = _size_param(request, "start", 0, maximum=None)
+            length = _size_param(request, "length", PREVIEW_HEAD_SIZE)
+            data = read_test_case_range(os.path.join(test_case_dir, name), start, length)
+            data["name"] = name
+            return self.success(data)
+
+        head = _size_param(request, "head", PREVIEW_HEAD_SIZE)
+        tail = _size_param(request, "tail", PREVIEW_TAIL_SIZE)
+        # an input and an output per test case
+        if self._get_limit(request) * (head + tail) * 2 > PREVIEW_PAGE_SIZE:
+            return self.error("Preview is too large, lower limit, head or tail")
+        data = self.paginate_data(request, test_cases)
+        results = []
+        for item in data["results"]:
+            item = dict(item)
+            item["input"] = preview_test_case_file(os.path.join(test_case_dir, item["input_name"]), head, tail)
+            if not problem.spj:
+                item["output"] = preview_test_case_file(os.path.join(test_case_dir, item["output_name"]), head, tail)
+            results.append(item)
+        data["results"] = results
+        data["spj"] = problem.spj
+        return self.success(data)
+
+
 class CompileSPJAPI(APIView):
     @validate_serializer(CompileSPJSerializer)
     @swagger_auto_schema(
@@ -343,6 +377,8 @@ class ProblemAPI(ProblemBase):
             except ProblemTag.DoesNotExist:
                 tag = ProblemTag.objects.create(name=item)
             problem.tags.add(tag)
+        update_search_vector(problem.id)
+        bump_problem_list_version()
         return self.success(ProblemAdminSerializer(problem).data)
 
     @problem_permission_required
@@ -378,7 +414,7 @@ class ProblemAPI(ProblemBase):
             except Problem.DoesNotExist:
                 return self.error("Problem does not exist")
 
-        problems = Problem.objects.filter(contest_id__isnull=True).order_by("-create_time")
+        problems = Problem.objects.filter(contest_id__isnull=True).defer("search_vector").order_by("-create_time")
         if rule_type:
             if rule_type not in ProblemRuleType.choices():
                 return self.error("Invalid rule_type")
@@ -387,7 +423,7 @@ class ProblemAPI(ProblemBase):
 
         keyword = request.GET.get("keyword", "").strip()
         if keyword:
-            problems = problems.filter(Q(title__icontains=keyword) | Q(_id__icontains=keyword))
+            problems = search_problems(problems, keyword)
         if not user.can_mgmt_all_problem():
             problems = problems.filter(created_by=user)
         return self.success(self.paginate_data(request, problems, ProblemAdminSerializer))
@@ -432,6 +468,8 @@ class ProblemAPI(ProblemBase):
             except ProblemTag.DoesNotExist:
                 tag = ProblemTag.objects.create(name=tag)
             problem.tags.add(tag)
+        update_search_vector(problem.id)
+        bump_problem_list_version()
 
         return self.success()
 
@@ -460,6 +498,7 @@ class ProblemAPI(ProblemBase):
         # if os.path.isdir(d):
         #     shutil.rmtree(d, ignore_errors=True)
         problem.delete()
+        bump_problem_list_version()
         return self.success()
 
 
@@ -505,6 +544,8 @@ class ContestProblemAPI(ProblemBase):
             except ProblemTag.DoesNotExist:
                 tag = ProblemTag.objects.create(name=item)
             problem.tags.add(tag)
+        update_search_vector(problem.id)
+        invalidate_contest_cache(contest.id)
         return self.success(ProblemAdminSerializer(problem).data)
 
     @swagger_auto_schema(
@@ -604,6 +645,8 @@ class ContestProblemAPI(ProblemBase):
             except ProblemTag.DoesNotExist:
                 tag = ProblemTag.objects.create(name=tag)
             problem.tags.add(tag)
+        update_search_vector(problem.id)
+        invalidate_contest_cache(contest.id)
         return self.success()
 
     @swagger_auto_schema(
@@ -632,6 +675,7 @@ class ContestProblemAPI(ProblemBase):
         # if os.path.isdir(d):
         #    shutil.rmtree(d, ignore_errors=True)
         problem.delete()
+        invalidate_contest_cache(problem.contest_id)
         return self.success()
 
 
@@ -667,6 +711,8 @@ class MakeContestProblemPublicAPIView(APIView):
         problem.statistic_info = {}
         problem.save()
         problem.tags.set(tags)
+        update_search_vector(problem.id)
+        bump_problem_list_version()
         return self.success()
 
 
@@ -699,4 +745,6 @@ class AddContestProblemAPI(APIView):
         problem.statistic_info = {}
         problem.save()
         problem.tags.set(tags)
+        update_search_vector(problem.id)
+        invalidate_contest_cache(contest.id)
         return self.success()
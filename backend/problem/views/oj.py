@@ -1,8 +1,10 @@
-from django.db.models import Q, Count
 from utils.api import APIView
 from account.decorators import check_contest_permission
-from ..models import ProblemTag, Problem, ProblemRuleType
+from ..cache import get_problem_list, get_problem_tags
+from ..models import Problem, ProblemRuleType
+from ..search import search_problems
 from ..serializers import ProblemSerializer, TagSerializer, ProblemSafeSerializer
+from contest.cache import get_contest_problems
 from contest.models import ContestRuleType
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -14,8 +16,7 @@ class ProblemTagAPI(APIView):
         responses=TagSerializer
     )
     def get(self, request):
-        tags = ProblemTag.objects.annotate(problem_count=Count("problem")).filter(problem_count__gt=0)
-        return self.success(TagSerializer(tags, many=True).data)
+        return self.success(get_problem_tags())
 
 
 class ProblemAPI(APIView):
@@ -89,7 +90,14 @@ class ProblemAPI(APIView):
         if not limit:
             return self.error("Limit is needed")
 
-        problems = Problem.objects.select_related("created_by").filter(contest_id__isnull=True, visible=True)
+        # every cache read returns a new copy, so my_status can be added in place
+        data = get_problem_list(request, lambda: self._problem_list(request))
+        self._add_problem_status(request, data)
+        return self.success(data)
+
+    def _problem_list(self, request):
+        problems = Problem.objects.select_related("created_by").filter(contest_id__isnull=True, visible=True) \
+            .defer("search_vector")
         # filter by label
         tag_text = request.GET.get("tag")
         if tag_text:
@@ -98,17 +106,14 @@ class ProblemAPI(APIView):
         # search situation
         keyword = request.GET.get("keyword", "").strip()
         if keyword:
-            problems = problems.filter(Q(title__icontains=keyword) | Q(_id__icontains=keyword))
+            problems = search_problems(problems, keyword)
 
         # difficulty screening
         difficulty = request.GET.get("difficulty")
         if difficulty:
             problems = problems.filter(difficulty=difficulty)
 
-        # Add tags to the topics that have been done according to the profile
-        data = self.paginate_data(request, problems, ProblemSerializer)
-        self._add_problem_status(request, data)
-        return self.success(data)
+        return self.paginate_data(request, problems, ProblemSerializer)
 
 
 class ContestProblemAPI(APIView):
@@ -156,10 +161,9 @@ class ContestProblemAPI(APIView):
                 problem_data = ProblemSafeSerializer(problem).data
             return self.success(problem_data)
 
-        contest_problems = Problem.objects.select_related("created_by").filter(contest=self.contest, visible=True)
         if self.contest.problem_details_permission(request.user):
-            data = ProblemSerializer(contest_problems, many=True).data
+            data = get_contest_problems(self.contest, details=True)
             self._add_problem_status(request, data)
         else:
-            data = ProblemSafeSerializer(contest_problems, many=True).data
+            data = get_contest_problems(self.contest, details=False)
         return self.success(data)
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import zipfile
+from datetime import datetime
+
+import pytz
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+
+from .compression import compress_code, compress_info
+from .models import SubmissionDetail
+
+
+def month_start(value):
+    value = value.astimezone(pytz.UTC)
+    return datetime(value.year, value.month, 1, tzinfo=pytz.UTC)
+
+
+def next_month(value):
+    if value.month == 12:
+        return value.replace(year=value.year + 1, month=1)
+    return value.replace(month=value.month + 1)
+
+
+def archive_path(create_time):
+    return os.path.join(settings.SUBMISSION_ARCHIVE_DIR, f"{month_start(create_time):%Y-%m}.zip")
+
+
+DETAIL_COLUMNS = ("raw_code", "raw_info", "compressed_code", "compressed_info")
+
+
+def _detail_digest(raw_code, raw_info, compressed_code, compressed_info):
+    digest = hashlib.blake2b(digest_size=16)
+    for value in (raw_code, json.dumps(raw_info, sort_keys=True) if raw_info is not None else None,
+                  compressed_code, compressed_info):
+        if value is None:
+            digest.update(b"\0")
+        else:
+            value = value.encode("utf-8") if isinstance(value, str) else bytes(value)
+            digest.update(b"\1" + len(value).to_bytes(8, "big") + value)
+    return digest.digest()
+
+
+class SubmissionArchiver(object):
+    """
+    Move the code and judge info of old submissions out of the database, one zip file per month of create_time.
+    Every submission becomes two entries, {id}.code and {id}.info, holding the compressed bytes of SubmissionDetail,
+    they are stored as is and the zip central directory gives random access for rehydration.
+    The submission rows themselves stay, so lists, ranks and statistics are not affected.
+    A row updated while its month is archived (rejudge, rehydration) is kept in the database, which wins over
+    the archive when the detail is loaded, and goes to the archive with the next run.
+    """
+    chunk_size = 1000
+
+    def archive_month(self, start):
+        end = next_month(start)
+        details = SubmissionDetail.objects.filter(submission__create_time__gte=start, submission__create_time__lt=end)
+        if not details.exists():
+            return 0
+        details = details.values_list("submission_id", *DETAIL_COLUMNS).iterator(chunk_size=self.chunk_size)
+
+        os.makedirs(settings.SUBMISSION_ARCHIVE_DIR, exist_ok=True)
+        path = archive_path(start)
+        tmp_path = f"{path}.tmp"
+        archived_ids = []
+        digests = {}
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED) as zip_file:
+            for submission_id, raw_code, raw_info, compressed_code, compressed_info in details:
+                code = bytes(compressed_code) if compressed_code is not None else compress_code(raw_code)
+                info = bytes(compressed_info) if compressed_info is not None else compress_info(raw_info or {})
+                zip_file.writestr(f"{submission_id}.code", code)
+                zip_file.writestr(f"{submission_id}.info", info)
+                archived_ids.append(submission_id)
+                digests[submission_id] = _detail_digest(raw_code, raw_info, compressed_code, compressed_info)
+            # submissions archived by an earlier run, except the ones rehydrated since then
+            if os.path.exists(path):
+                rehydrated = set(archived_ids)
+                with zipfile.ZipFile(path) as old_file:
+                    for name in old_file.namelist():
+                        if name.rsplit(".", 1)[0] not in rehydrated:
+                            zip_file.writestr(name, old_file.read(name))
+        # the rows are only deleted once the new archive is in place
+        os.replace(tmp_path, path)
+
+        deleted = 0
+        for index in range(0, len(archived_ids), self.chunk_size):
+            deleted += self._delete_archived(archived_ids[index:index + self.chunk_size], digests)
+        return deleted
+
+    def _delete_archived(self, submission_ids, digests):
+        """
+        Delete the rows of the chunk that still hold the archived values, they are locked from the check to the delete
+        :return: number of deleted rows
+        """
+        with transaction.atomic():
+            rows = SubmissionDetail.objects.select_for_update().filter(submission_id__in=submission_ids) \
+                .values_list("submission_id", *DETAIL_COLUMNS)
+            unchanged = [row[0] for row in rows if _detail_digest(*row[1:]) == digests[row[0]]]
+            SubmissionDetail.objects.filter(submission_id__in=unchanged).delete()
+        return len(unchanged)
+
+    def archive_before(self, before):
+        """
+        :param before: archive the months that end before this time
+        :return: {"YYYY-MM": number of archived submissions}
+        """
+        oldest = SubmissionDetail.objects.aggregate(oldest=Min("submission__create_time"))["oldest"]
+        ret = {}
+        if oldest is None:
+            return ret
+        start = month_start(oldest)
+        while next_month(start) <= before:
+            ret[f"{start:%Y-%m}"] = self.archive_month(start)
+            start = next_month(start)
+        return ret
+
+
+def read_archived_detail(submission_id, create_time):
+    """
+    :return: (compressed code, compressed info) or None if the submission is not in the archive
+    """
+    try:
+        with zipfile.ZipFile(archive_path(create_time)) as zip_file:
+            return zip_file.read(f"{submission_id}.code"), zip_file.read(f"{submission_id}.info")
+    except (FileNotFoundError, KeyError):
+        return None
+
+
+def rehydrate_submission_detail(submission):
+    """
+    Put the code and judge info of an archived submission back into the database
+    :return: SubmissionDetail or None if the submission is not in the archive
+    """
+    archived = read_archived_detail(submission.id, submission.create_time)
+    if archived is None:
+        return None
+    code, info = archived
+    detail, _ = SubmissionDetail.objects.get_or_create(submission=submission,
+                                                       defaults={"compressed_code": code, "compressed_info": info})
+    submission.detail = detail
+    return detail
+
+
+def load_submission_detail(submission):
+    try:
+        return submission.detail
+    except SubmissionDetail.DoesNotExist:
+        return rehydrate_submission_detail(submission)
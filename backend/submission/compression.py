@@ -0,0 +1,89 @@
+import json
+import zlib
+
+# The first byte of every stored value is the format, so old rows stay readable
+# when the dictionary or the encoding changes. Never edit a released dictionary, add a new format instead.
+FORMAT_ZLIB_V1 = 1
+
+# Preset dictionary for source code, built from the tokens that dominate submissions in
+# C, C++, Java and Python. zlib matches the end of the dictionary at the shortest distance,
+# so the most frequent fragments come last.
+CODE_DICTIONARY_V1 = (
+    b"public static void main(String[] args) throws IOException {\n"
+    b"BufferedReader br = new BufferedReader(new InputStreamReader(System.in));\n"
+    b"StringTokenizer st = new StringTokenizer(br.readLine());\n"
+    b"Integer.parseInt(st.nextToken());\nScanner sc = new Scanner(System.in);\n"
+    b"System.out.println(\nimport java.util.*;\nimport java.io.*;\npublic class Main {\n"
+    b'def solve():\nif __name__ == "__main__":\nimport sys\ninput = sys.stdin.readline\n'
+    b"for _ in range(int(input())):\nlist(map(int, input().split()))\nmap(int, input().split())\n"
+    b"print(\nfor i in range(\nappend(\nreturn \nelif \nelse:\n"
+    b"ios::sync_with_stdio(false);\ncin.tie(NULL);\ncout.tie(NULL);\n"
+    b"#include <algorithm>\n#include <vector>\n#include <string>\n#include <cstring>\n"
+    b"#include <bits/stdc++.h>\n#include <iostream>\nusing namespace std;\n"
+    b"typedef long long ll;\nvector<int> \nlong long \nstd::\nconst int MAX = \n"
+    b"#include <stdlib.h>\n#include <string.h>\n#include <stdio.h>\n"
+    b'scanf("%d", &\nprintf("%d\\n", \nint main(void) {\nint main() {\n'
+    b"    return 0;\n}\n"
+    b"for (int i = 0; i < n; i++) {\nfor (int j = 0; j < n; j++) {\n"
+    b"cin >> \ncout << \n << endl;\n"
+    b"        \n    \n"
+)
+
+_code_dictionaries = {FORMAT_ZLIB_V1: CODE_DICTIONARY_V1}
+_info_dictionaries = {FORMAT_ZLIB_V1: b""}
+
+
+def _compress(data, zdict):
+    compressor = zlib.compressobj(level=9, zdict=zdict) if zdict else zlib.compressobj(level=9)
+    return bytes([FORMAT_ZLIB_V1]) + compressor.compress(data) + compressor.flush()
+
+
+def _decompress(value, dictionaries):
+    value = bytes(value)
+    zdict = dictionaries.get(value[0])
+    if zdict is None:
+        raise ValueError(f"Unknown compression format {value[0]}")
+    decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+    return decompressor.decompress(value[1:]) + decompressor.flush()
+
+
+def compress_code(code):
+    return _compress(code.encode("utf-8"), CODE_DICTIONARY_V1)
+
+
+def decompress_code(value):
+    return _decompress(value, _code_dictionaries).decode("utf-8")
+
+
+def encode_info(info):
+    """
+    Judge info is {"err": ..., "data": [{"cpu_time": .., "memory": .., "test_case": .., ...}, ...]},
+    the per test case dicts are turned into one list per key so that every key is stored once.
+    Test cases that don't share the same keys are left as rows.
+    """
+    data = info.get("data") if isinstance(info, dict) else None
+    if not isinstance(data, list) or not data or not all(isinstance(row, dict) for row in data):
+        return info
+    keys = list(data[0].keys())
+    if not keys or any(list(row.keys()) != keys for row in data):
+        return info
+    encoded = {k: v for k, v in info.items() if k != "data"}
+    encoded["columns"] = {key: [row[key] for row in data] for key in keys}
+    return encoded
+
+
+def decode_info(encoded):
+    if not isinstance(encoded, dict) or "columns" not in encoded:
+        return encoded
+    info = {k: v for k, v in encoded.items() if k != "columns"}
+    columns = encoded["columns"]
+    info["data"] = [dict(zip(columns.keys(), values)) for values in zip(*columns.values())]
+    return info
+
+
+def compress_info(info):
+    return _compress(json.dumps(encode_info(info), separators=(",", ":")).encode("utf-8"), b"")
+
+
+def decompress_info(value):
+    return decode_info(json.loads(_decompress(value, _info_dictionaries)))
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from submission.archive import SubmissionArchiver, month_start
+
+
+class Command(BaseCommand):
+    help = "Move the code and judge info of old submissions to monthly archive files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, default=12, help="Keep this many recent months in the database")
+
+    def handle(self, *args, **options):
+        if options["months"] < 1:
+            self.stdout.write(self.style.ERROR("Invalid args"))
+            exit(1)
+        before = month_start(now())
+        for _ in range(options["months"] - 1):
+            before = month_start(before - timedelta(days=1))
+        for month, count in SubmissionArchiver().archive_before(before).items():
+            self.stdout.write(self.style.SUCCESS(f"{month}: archived {count} submissions"))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from psycopg2.extras import execute_values
+
+from utils.shortcuts import rand_str, time_sortable_id
+
+
+class Command(BaseCommand):
+    help = "Compare insert throughput and primary key index size of random and time sortable submission ids"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200000)
+        parser.add_argument("--batch_size", type=int, default=1000)
+
+    def _run(self, cursor, table, id_generator, rows, batch_size):
+        # generated before the clock starts, only the inserts are timed
+        ids = [(id_generator(), ) for _ in range(rows)]
+        # same primary key as the submission table, not temporary so that the inserts are written to the WAL too
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"CREATE TABLE {table} (id text PRIMARY KEY, create_time timestamptz NOT NULL)")
+        try:
+            start = time.time()
+            for index in range(0, rows, batch_size):
+                execute_values(cursor, f"INSERT INTO {table} (id, create_time) VALUES %s",
+                               ids[index:index + batch_size], template="(%s, now())")
+            cost = time.time() - start
+            cursor.execute("SELECT pg_relation_size(%s)", [f"{table}_pkey"])
+            index_size = cursor.fetchone()[0]
+        finally:
+            cursor.execute(f"DROP TABLE {table}")
+        return cost, index_size
+
+    def handle(self, *args, **options):
+        rows, batch_size = options["rows"], options["batch_size"]
+        with connection.cursor() as cursor:
+            # random ids of the width of the new ones tell the effect of the order from the effect of the width
+            for name, table, id_generator in (("rand_str", "bench_random_id", rand_str),
+                                              ("rand_str(13)", "bench_short_random_id", lambda: rand_str(13, "lower_str")),
+                                              ("time_sortable_id", "bench_sortable_id", time_sortable_id)):
+                cost, index_size = self._run(cursor, table, id_generator, rows, batch_size)
+                self.stdout.write(self.style.SUCCESS(f"{name}: {rows / cost:.0f} rows/s, "
+                                                     f"primary key index {index_size / 1024 / 1024:.1f}MB"))
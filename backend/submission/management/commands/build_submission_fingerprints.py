@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from submission.models import JudgeStatus, Submission
+from submission.tasks import save_submission_fingerprints
+
+
+class Command(BaseCommand):
+    help = "Index the fingerprints of the accepted submissions of a contest judged before the similarity index existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--contest_id", type=int)
+
+    def handle(self, *args, **options):
+        contest_id = options["contest_id"]
+        if not contest_id:
+            self.stdout.write(self.style.ERROR("Invalid args"))
+            exit(1)
+
+        submissions = Submission.objects.filter(contest_id=contest_id, result=JudgeStatus.ACCEPTED) \
+            .select_related("detail").iterator(chunk_size=500)
+        count = 0
+        for submission in submissions:
+            save_submission_fingerprints(submission)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} submissions of contest {contest_id}"))
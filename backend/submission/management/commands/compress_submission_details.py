@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from submission.tasks import compress_submission_details, compress_submission_detail_batch
+
+
+class Command(BaseCommand):
+    help = "Compress the code and judge info of submissions stored before compression was introduced"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch_size", type=int, default=500)
+        parser.add_argument("--sync", action="store_true", help="Run in this process instead of the dramatiq workers")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if not options["sync"]:
+            compress_submission_details.send("", batch_size)
+            self.stdout.write(self.style.SUCCESS("Compression is running in the background"))
+            return
+
+        count = 0
+        last_id = compress_submission_detail_batch("", batch_size)
+        while last_id is not None:
+            count += 1
+            last_id = compress_submission_detail_batch(last_id, batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Compressed {count} batches"))
@@ -0,0 +1,56 @@
+# Generated by Django 2.2.28 on 2026-10-19 15:47
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submission', '0012_auto_20180501_0436'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        # username__icontains is compiled to UPPER("username"::text) LIKE UPPER(...)
+        migrations.RunSQL(
+            "CREATE INDEX submission_username_trgm_idx ON submission USING gin (UPPER(username) gin_trgm_ops)",
+            "DROP INDEX submission_username_trgm_idx",
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='contest',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='contest.Contest'),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='problem',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='problem.Problem'),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='user_id',
+            field=models.IntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['contest', 'create_time'], name='submission_contest_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['problem', 'create_time'], name='submission_problem_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['user_id', 'create_time'], name='submission_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(contest__isnull=True), fields=['create_time'], name='submission_public_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(contest__isnull=True), fields=['user_id', 'create_time'], name='submission_public_user_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-19 15:48
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submission', '0013_submission_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionDetail',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='detail', serialize=False, to='submission.Submission')),
+                ('code', models.TextField()),
+                ('info', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+            ],
+            options={
+                'db_table': 'submission_detail',
+            },
+        ),
+        migrations.RunSQL(
+            "INSERT INTO submission_detail (submission_id, code, info) SELECT id, code, info FROM submission",
+            "UPDATE submission SET code = d.code, info = d.info FROM submission_detail d WHERE d.submission_id = submission.id",
+        ),
+        migrations.RemoveField(
+            model_name='submission',
+            name='code',
+        ),
+        migrations.RemoveField(
+            model_name='submission',
+            name='info',
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.28 on 2026-10-19 16:05
+
+from django.db import migrations, models
+import django.contrib.postgres.fields.jsonb
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submission', '0014_submission_detail'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='submissiondetail',
+            old_name='code',
+            new_name='raw_code',
+        ),
+        migrations.RenameField(
+            model_name='submissiondetail',
+            old_name='info',
+            new_name='raw_info',
+        ),
+        migrations.AlterField(
+            model_name='submissiondetail',
+            name='raw_code',
+            field=models.TextField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='submissiondetail',
+            name='raw_info',
+            field=django.contrib.postgres.fields.jsonb.JSONField(null=True),
+        ),
+        migrations.AddField(
+            model_name='submissiondetail',
+            name='compressed_code',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='submissiondetail',
+            name='compressed_info',
+            field=models.BinaryField(null=True),
+        ),
+    ]
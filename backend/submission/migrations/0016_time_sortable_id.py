@@ -0,0 +1,36 @@
+# Generated by Django 2.2.28 on 2026-10-19 15:54
+
+from django.db import migrations, models
+import utils.shortcuts
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submission', '0015_compress_submission_detail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='submission',
+            name='id',
+            field=models.TextField(default=utils.shortcuts.time_sortable_id, primary_key=True, serialize=False),
+        ),
+        # text_pattern_ops copies of the primary keys, only useful for LIKE queries which are never run on ids
+        migrations.RunSQL(
+            r"""
+            DO $$
+            DECLARE
+                like_index text;
+            BEGIN
+                FOR like_index IN SELECT indexname FROM pg_indexes
+                        WHERE (tablename = 'submission' AND indexname LIKE 'submission\_id\_%\_like')
+                        OR (tablename = 'submission_detail' AND indexname LIKE 'submission\_detail\_submission\_id\_%\_like')
+                LOOP
+                    EXECUTE 'DROP INDEX ' || quote_ident(like_index);
+                END LOOP;
+            END $$;
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-19 15:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submission', '0016_time_sortable_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionFingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('problem_id', models.IntegerField()),
+                ('user_id', models.IntegerField()),
+                ('fingerprint', models.BigIntegerField()),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='submission.Submission')),
+            ],
+            options={
+                'db_table': 'submission_fingerprint',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='submissionfingerprint',
+            index=models.Index(fields=['problem_id', 'fingerprint'], name='fingerprint_problem_idx'),
+        ),
+    ]
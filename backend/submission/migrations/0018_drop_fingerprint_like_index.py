@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submission', '0017_submissionfingerprint'),
+    ]
+
+    operations = [
+        # text_pattern_ops copy of the submission_id index created with the foreign key, see 0016_time_sortable_id
+        migrations.RunSQL(
+            r"""
+            DO $$
+            DECLARE
+                like_index text;
+            BEGIN
+                FOR like_index IN SELECT indexname FROM pg_indexes
+                        WHERE tablename = 'submission_fingerprint'
+                        AND indexname LIKE 'submission\_fingerprint\_submission\_id\_%\_like'
+                LOOP
+                    EXECUTE 'DROP INDEX ' || quote_ident(like_index);
+                END LOOP;
+            END $$;
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.28 on 2026-10-19 16:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submission', '0018_drop_fingerprint_like_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='submission',
+            name='submission_contest_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='submission',
+            name='submission_problem_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='submission',
+            name='submission_user_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='submission',
+            name='submission_public_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='submission',
+            name='submission_public_user_idx',
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['contest', 'create_time', 'id'], name='submission_contest_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['problem', 'create_time', 'id'], name='submission_problem_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['user_id', 'create_time', 'id'], name='submission_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(contest__isnull=True), fields=['create_time', 'id'], name='submission_public_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(contest__isnull=True), fields=['user_id', 'create_time', 'id'], name='submission_public_user_idx'),
+        ),
+    ]
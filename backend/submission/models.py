@@ -1,11 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 
 from utils.constants import ContestStatus
 from utils.models import JSONField
 from problem.models import Problem
 from contest.models import Contest
 
-from utils.shortcuts import rand_str
+from utils.shortcuts import time_sortable_id
+from .compression import compress_code, compress_info, decompress_code, decompress_info
 
 
 class JudgeStatus:
@@ -22,17 +23,24 @@ class JudgeStatus:
     PARTIALLY_ACCEPTED = 8
 
 
+class SubmissionManager(models.Manager):
+    def create_with_detail(self, code, info=None, **kwargs):
+        with transaction.atomic():
+            submission = self.create(**kwargs)
+            SubmissionDetail.objects.create(submission=submission, code=code, info=info or {})
+        return submission
+
+
 class Submission(models.Model):
-    id = models.TextField(default=rand_str, primary_key=True, db_index=True)
-    contest = models.ForeignKey(Contest, null=True, on_delete=models.CASCADE)
-    problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
+    # older ids are 32 random hex characters, they are still valid primary keys
+    id = models.TextField(default=time_sortable_id, primary_key=True)
+    # the composite indexes in Meta start with these columns, single column indexes would be redundant
+    contest = models.ForeignKey(Contest, null=True, on_delete=models.CASCADE, db_index=False)
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, db_index=False)
     create_time = models.DateTimeField(auto_now_add=True)
-    user_id = models.IntegerField(db_index=True)
+    user_id = models.IntegerField()
     username = models.TextField()
-    code = models.TextField()
     result = models.IntegerField(db_index=True, default=JudgeStatus.PENDING)
-    # Judgment details returned from JudgeServer
-    info = JSONField(default=dict)
     language = models.TextField()
     shared = models.BooleanField(default=False)
     # Store the time and memory value of the submission to facilitate the submission list display
@@ -40,6 +48,8 @@ class Submission(models.Model):
     statistic_info = JSONField(default=dict)
     ip = models.TextField(null=True)
 
+    objects = SubmissionManager()
+
     def check_user_permission(self, user, check_share=True):
         if self.user_id == user.id or user.is_super_admin() or user.can_mgmt_all_problem() or self.problem.created_by_id == user.id:
             return True
@@ -51,9 +61,108 @@ class Submission(models.Model):
                 return True
         return False
 
+    @classmethod
+    def check_user_permissions(cls, submissions, user, check_share=True):
+        """
+        check_user_permission for a page of submissions, the status of their contests is loaded in one query
+        :return: {submission id: bool}
+        """
+        if user.is_super_admin() or user.can_mgmt_all_problem():
+            return {submission.id: True for submission in submissions}
+        contest_ids = {submission.contest_id for submission in submissions if submission.contest_id}
+        contest_ended = {contest.id: contest.status == ContestStatus.CONTEST_ENDED for contest in
+                         Contest.objects.filter(id__in=contest_ids).only("id", "start_time", "end_time")} if contest_ids else {}
+
+        ret = {}
+        for submission in submissions:
+            if submission.user_id == user.id or submission.problem.created_by_id == user.id:
+                ret[submission.id] = True
+            elif not check_share or (submission.contest_id and not contest_ended[submission.contest_id]):
+                ret[submission.id] = False
+            else:
+                ret[submission.id] = submission.problem.share_submission or submission.shared
+        return ret
+
     class Meta:
         db_table = "submission"
         ordering = ("-create_time",)
+        # access paths of submission/views.py, the lists are ordered by (create_time, id), see APIView.paginate_data_by_cursor
+        # username__icontains is served by the trigram index on UPPER(username) created in migration 0013
+        indexes = [
+            models.Index(fields=["contest", "create_time", "id"], name="submission_contest_time_idx"),
+            models.Index(fields=["problem", "create_time", "id"], name="submission_problem_time_idx"),
+            models.Index(fields=["user_id", "create_time", "id"], name="submission_user_time_idx"),
+            models.Index(fields=["create_time", "id"], name="submission_public_time_idx",
+                         condition=models.Q(contest__isnull=True)),
+            models.Index(fields=["user_id", "create_time", "id"], name="submission_public_user_idx",
+                         condition=models.Q(contest__isnull=True)),
+        ]
 
     def __str__(self):
         return self.id
+
+
+class SubmissionDetail(models.Model):
+    """
+    The heavy columns of a submission, kept out of the submission table so that list queries stay small
+    """
+    submission = models.OneToOneField(Submission, primary_key=True, related_name="detail", on_delete=models.CASCADE)
+    # rows written before compression keep the raw columns until compress_submission_details converts them,
+    # read and write code / info instead of these columns
+    raw_code = models.TextField(null=True)
+    raw_info = JSONField(null=True)
+    compressed_code = models.BinaryField(null=True)
+    # Judgment details returned from JudgeServer
+    compressed_info = models.BinaryField(null=True)
+
+    class Meta:
+        db_table = "submission_detail"
+
+    @property
+    def code(self):
+        if self.compressed_code is not None:
+            return decompress_code(self.compressed_code)
+        return self.raw_code
+
+    @code.setter
+    def code(self, value):
+        self.compressed_code = compress_code(value)
+        self.raw_code = None
+
+    @property
+    def info(self):
+        if self.compressed_info is not None:
+            return decompress_info(self.compressed_info)
+        return self.raw_info or {}
+
+    @info.setter
+    def info(self, value):
+        self.compressed_info = compress_info(value)
+        self.raw_info = None
+
+    def compress(self):
+        """
+        :return: whether there was anything left to compress
+        """
+        compressed = False
+        if self.raw_code is not None:
+            self.code = self.raw_code
+            compressed = True
+        if self.raw_info is not None:
+            self.info = self.raw_info
+            compressed = True
+        return compressed
+
+
+class SubmissionFingerprint(models.Model):
+    """
+    Inverted index of the winnowed fingerprints (submission/similarity.py) of accepted contest submissions
+    """
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE)
+    problem_id = models.IntegerField()
+    user_id = models.IntegerField()
+    fingerprint = models.BigIntegerField()
+
+    class Meta:
+        db_table = "submission_fingerprint"
+        indexes = [models.Index(fields=["problem_id", "fingerprint"], name="fingerprint_problem_idx")]
@@ -18,6 +18,8 @@ class ShareSubmissionSerializer(serializers.Serializer):
 
 class SubmissionModelSerializer(serializers.ModelSerializer):
     problem_name = serializers.CharField(source="problem.title")
+    code = serializers.CharField(source="detail.code")
+    info = serializers.JSONField(source="detail.info")
 
     class Meta:
         model = Submission
@@ -27,10 +29,11 @@ class SubmissionModelSerializer(serializers.ModelSerializer):
 # Serializer that does not display submission info, used for ACM rule_type
 class SubmissionSafeModelSerializer(serializers.ModelSerializer):
     problem = serializers.SlugRelatedField(read_only=True, slug_field="_id")
+    code = serializers.CharField(source="detail.code")
 
     class Meta:
         model = Submission
-        exclude = ("info", "contest", "ip")
+        exclude = ("contest", "ip")
 
 
 class SubmissionListSerializer(serializers.ModelSerializer):
@@ -40,13 +43,18 @@ class SubmissionListSerializer(serializers.ModelSerializer):
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop("user", None)
         super().__init__(*args, **kwargs)
+        self._show_links = None
 
     class Meta:
         model = Submission
-        exclude = ("info", "contest", "code", "ip")
+        exclude = ("contest", "ip")
 
     def get_show_link(self, obj):
         # No user or anonymous user
         if self.user is None or not self.user.is_authenticated:
             return False
-        return obj.check_user_permission(self.user)
+        # with many=True this is the child serializer of the page, evaluate the whole page at the first row
+        if self._show_links is None or obj.id not in self._show_links:
+            submissions = self.parent.instance if self.parent is not None else [obj]
+            self._show_links = Submission.check_user_permissions(submissions, self.user)
+        return self._show_links[obj.id]
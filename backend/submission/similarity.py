@@ -0,0 +1,119 @@
+import hashlib
+import heapq
+import keyword
+import re
+from collections import Counter
+from itertools import groupby, islice
+from operator import itemgetter
+
+from judge.languages import languages
+
+# tokens per k-gram and k-grams per winnowing window, any match of WINDOW + K - 1 tokens is always detected
+K = 5
+WINDOW = 4
+# fingerprints found in more submissions of a problem than this share are boilerplate, not evidence
+MAX_DOCUMENT_FREQUENCY = 0.5
+# and so are the ones found in more submissions than this whatever their share, the pairs of a posting list
+# grow with the square of its length
+MAX_GROUP_SIZE = 200
+
+_C_KEYWORDS = {
+    "auto", "break", "case", "char", "const", "continue", "default", "do", "double", "else", "enum", "extern", "float",
+    "for", "goto", "if", "int", "long", "register", "return", "short", "signed", "sizeof", "static", "struct", "switch",
+    "typedef", "union", "unsigned", "void", "volatile", "while", "bool", "true", "false", "class", "public", "private",
+    "protected", "new", "delete", "this", "template", "typename", "namespace", "using", "try", "catch", "throw",
+    "virtual", "operator", "friend", "inline", "nullptr", "final", "extends", "implements", "import", "package",
+    "interface", "boolean", "byte", "null", "throws", "instanceof", "func", "go", "chan", "map", "range", "var",
+    "defer", "select", "type", "fallthrough", "nil", "string", "vector", "cin", "cout", "printf", "scanf",
+}
+_PYTHON_KEYWORDS = set(keyword.kwlist) | {"print", "input", "range", "len", "int", "str", "list", "map", "dict", "set"}
+
+_C_TOKEN = re.compile(r"""
+    (?P<skip>\s+|//[^\n]*|/\*.*?\*/|\#[^\n]*)
+    |(?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|`[^`]*`)
+    |(?P<number>\d[\w.]*)
+    |(?P<name>[A-Za-z_]\w*)
+    |(?P<op>\S)
+""", re.S | re.X)
+_PYTHON_TOKEN = re.compile(r"""
+    (?P<skip>\s+|\#[^\n]*)
+    |(?P<string>[rbuRBU]{0,2}(?:\"\"\".*?\"\"\"|'''.*?'''|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'))
+    |(?P<number>\d[\w.]*)
+    |(?P<name>[A-Za-z_]\w*)
+    |(?P<op>\S)
+""", re.S | re.X)
+
+_lexers = {item["name"]: (_PYTHON_TOKEN, _PYTHON_KEYWORDS) if item["content_type"] == "text/x-python"
+           else (_C_TOKEN, _C_KEYWORDS) for item in languages}
+
+
+def tokenize(code, language):
+    """
+    Comments and layout are dropped, literals and identifiers are normalized so that renaming variables
+    or changing constants does not hide a copy. The C lexer also drops preprocessor lines.
+    """
+    pattern, keywords = _lexers.get(language, (_C_TOKEN, _C_KEYWORDS))
+    tokens = []
+    for match in pattern.finditer(code):
+        kind = match.lastgroup
+        if kind == "skip":
+            continue
+        if kind == "name":
+            value = match.group()
+            tokens.append(value if value in keywords else "I")
+        elif kind == "string":
+            tokens.append("S")
+        elif kind == "number":
+            tokens.append("N")
+        else:
+            tokens.append(match.group())
+    return tokens
+
+
+def _hash(gram):
+    return int.from_bytes(hashlib.blake2b(" ".join(gram).encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def fingerprints(code, language):
+    """
+    Winnowing (Schleimer et al.): hash every k-gram of tokens and keep the minimum hash of every window
+    :return: set of 64 bits fingerprints
+    """
+    tokens = tokenize(code, language)
+    hashes = [_hash(tokens[i:i + K]) for i in range(len(tokens) - K + 1)]
+    if len(hashes) <= WINDOW:
+        return set(hashes)
+    return {min(hashes[i:i + WINDOW]) for i in range(len(hashes) - WINDOW + 1)}
+
+
+def similar_pairs(postings, sizes, limit=20, min_similarity=0.5):
+    """
+    Candidate pairs from an inverted index instead of comparing all pairs of submissions.
+    The posting lists are paired one at a time while they are read, only the shared counts of the pairs are kept.
+    :param postings: iterable of (fingerprint, submission_id, user_id) ordered by fingerprint
+    :param sizes: {(submission_id, user_id): number of fingerprints} of every submission in postings
+    :return: list of (similarity, shared fingerprints, (submission_id, user_id), (submission_id, user_id)),
+             most similar first, one pair per two users.
+             similarity is shared / fingerprints of the smaller submission, so copying a part of a longer program counts
+    """
+    max_frequency = max(2, min(MAX_GROUP_SIZE, int(len(sizes) * MAX_DOCUMENT_FREQUENCY)))
+
+    shared = Counter()
+    for _, group in groupby(postings, key=itemgetter(0)):
+        # the rest of a longer list is skipped by groupby without being held
+        group = [posting[1:] for posting in islice(group, max_frequency + 1)]
+        if len(group) > max_frequency:
+            continue
+        group.sort()
+        for i in range(len(group)):
+            for j in range(i + 1, len(group)):
+                if group[i][1] != group[j][1]:
+                    shared[(group[i], group[j])] += 1
+
+    best = {}
+    for (a, b), count in shared.items():
+        similarity = count / min(sizes[a], sizes[b])
+        users = tuple(sorted((a[1], b[1])))
+        if similarity >= min_similarity and (users not in best or best[users][0] < similarity):
+            best[users] = (similarity, count, a, b)
+    return heapq.nlargest(limit, best.values(), key=lambda item: (item[0], item[1]))
@@ -0,0 +1,40 @@
+from utils.cache import cache
+from utils.constants import CacheKey
+
+# long enough for the frontend to poll a submission until it is judged
+SUBMISSION_STATUS_TIMEOUT = 60 * 60
+
+
+def _status_key(submission_id):
+    return f"{CacheKey.submission_status}:{submission_id}"
+
+
+def set_submission_status(submission_id, user_id, result, statistic_info=None):
+    """
+    Written at every state change of a submission, the hash holds user_id, result, time_cost, memory_cost and score
+    """
+    mapping = {"user_id": user_id, "result": result}
+    for field in ("time_cost", "memory_cost", "score"):
+        if statistic_info and statistic_info.get(field) is not None:
+            mapping[field] = statistic_info[field]
+    key = _status_key(submission_id)
+    pipe = cache.pipeline()
+    pipe.delete(key)
+    pipe.hset(key, mapping=mapping)
+    pipe.expire(key, SUBMISSION_STATUS_TIMEOUT)
+    pipe.execute()
+    return mapping
+
+
+def get_submission_statuses(submission_ids):
+    """
+    :return: {submission_id: {"user_id": .., "result": .., ...}} of the submissions found in the cache
+    """
+    pipe = cache.pipeline()
+    for submission_id in submission_ids:
+        pipe.hgetall(_status_key(submission_id))
+    ret = {}
+    for submission_id, status in zip(submission_ids, pipe.execute()):
+        if status:
+            ret[submission_id] = {k.decode("utf-8"): int(v) for k, v in status.items()}
+    return ret
@@ -0,0 +1,60 @@
+import dramatiq
+from django.db import transaction
+from django.db.models import Q
+
+from utils.shortcuts import DRAMATIQ_WORKER_ARGS
+from .archive import load_submission_detail
+from .models import JudgeStatus, Submission, SubmissionDetail, SubmissionFingerprint
+from .similarity import fingerprints
+
+
+def compress_submission_detail_batch(after="", batch_size=500):
+    """
+    Compress the next batch of rows still stored raw, ordered by submission id
+    :return: the last submission id of the batch, None when nothing is left
+    """
+    with transaction.atomic():
+        # skip_locked: rows being judged right now are picked up by a later run
+        details = list(SubmissionDetail.objects.select_for_update(skip_locked=True)
+                       .filter(Q(raw_code__isnull=False) | Q(raw_info__isnull=False), submission_id__gt=after)
+                       .order_by("submission_id")[:batch_size])
+        for detail in details:
+            if detail.compress():
+                detail.save(update_fields=["raw_code", "raw_info", "compressed_code", "compressed_info"])
+    return details[-1].submission_id if details else None
+
+
+# a batch per message, so a restart of the workers only loses the batch in progress
+@dramatiq.actor(**DRAMATIQ_WORKER_ARGS(max_retries=3))
+def compress_submission_details(after="", batch_size=500):
+    last_id = compress_submission_detail_batch(after, batch_size)
+    if last_id is not None:
+        compress_submission_details.send(last_id, batch_size)
+
+
+def save_submission_fingerprints(submission):
+    """
+    Replace the fingerprints of a submission, only accepted ones are indexed
+    :return: number of fingerprints
+    """
+    values = set()
+    if submission.result == JudgeStatus.ACCEPTED:
+        detail = load_submission_detail(submission)
+        if detail is not None:
+            values = fingerprints(detail.code, submission.language)
+    with transaction.atomic():
+        SubmissionFingerprint.objects.filter(submission_id=submission.id).delete()
+        SubmissionFingerprint.objects.bulk_create([
+            SubmissionFingerprint(submission_id=submission.id, problem_id=submission.problem_id,
+                                  user_id=submission.user_id, fingerprint=value) for value in values], batch_size=1000)
+    return len(values)
+
+
+# sent by the dispatcher for every judged contest submission, a rejudge to another result removes the fingerprints
+@dramatiq.actor(**DRAMATIQ_WORKER_ARGS(max_retries=3))
+def fingerprint_submission(submission_id):
+    try:
+        submission = Submission.objects.select_related("detail").get(id=submission_id)
+    except Submission.DoesNotExist:
+        return
+    save_submission_fingerprints(submission)
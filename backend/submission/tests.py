@@ -1,9 +1,22 @@
+import tempfile
 from copy import deepcopy
+from datetime import datetime, timedelta
 from unittest import mock
 
+import pytz
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from contest.models import Contest, ContestRuleType
 from problem.models import Problem, ProblemTag
 from utils.api.tests import APITestCase
-from .models import Submission
+from utils.shortcuts import rand_str
+from .archive import SubmissionArchiver, load_submission_detail
+from .models import JudgeStatus, Submission, SubmissionDetail
+from .status import set_submission_status
+from .tasks import compress_submission_detail_batch
 
 DEFAULT_PROBLEM_DATA = {"_id": "A-110", "title": "test", "description": "<p>test</p>", "input_description": "test",
                         "output_description": "test", "time_limit": 1000, "memory_limit": 256, "difficulty": "Level1",
@@ -43,7 +56,7 @@ class SubmissionPrepare(APITestCase):
         self.problem.save()
         self.submission_data = deepcopy(DEFAULT_SUBMISSION_DATA)
         self.submission_data["problem_id"] = self.problem.id
-        self.submission = Submission.objects.create(**self.submission_data)
+        self.submission = Submission.objects.create_with_detail(**self.submission_data)
 
 
 class SubmissionListTest(SubmissionPrepare):
@@ -56,6 +69,207 @@ class SubmissionListTest(SubmissionPrepare):
         resp = self.client.get(self.url, data={"limit": "10"})
         self.assertSuccess(resp)
 
+    def test_get_submission_list_queries(self):
+        # the first request fills the option and session caches
+        self.client.get(self.url, data={"limit": "10"})
+        with CaptureQueriesContext(connection) as one_row:
+            self.assertSuccess(self.client.get(self.url, data={"limit": "10"}))
+        for _ in range(5):
+            Submission.objects.create_with_detail(**self.submission_data)
+        with CaptureQueriesContext(connection) as six_rows:
+            resp = self.client.get(self.url, data={"limit": "10"})
+        self.assertEqual(len(resp.data["data"]["results"]), 6)
+        self.assertEqual(len(one_row.captured_queries), len(six_rows.captured_queries))
+
+    def test_get_submission_list_total(self):
+        resp = self.client.get(self.url, data={"limit": "10"})
+        self.assertEqual(resp.data["data"]["total"], 1)
+        self.assertFalse(resp.data["data"]["approximate_total"])
+
+    @mock.patch("utils.api.api.APPROXIMATE_COUNT_THRESHOLD", 1)
+    def test_get_submission_list_cached_total(self):
+        self.client.get(self.url, data={"limit": "10"})
+        Submission.objects.create_with_detail(**self.submission_data)
+
+        resp = self.client.get(self.url, data={"limit": "10"})
+        self.assertEqual(resp.data["data"]["total"], 1)
+        self.assertTrue(resp.data["data"]["approximate_total"])
+
+        resp = self.client.get(self.url, data={"limit": "10", "exact_total": "1"})
+        self.assertEqual(resp.data["data"]["total"], 2)
+        self.assertFalse(resp.data["data"]["approximate_total"])
+
+    def test_get_submission_list_by_cursor(self):
+        for _ in range(4):
+            Submission.objects.create_with_detail(**self.submission_data)
+        expected = list(Submission.objects.order_by("-create_time", "-id").values_list("id", flat=True))
+
+        ids, cursor, pages = [], "", []
+        while cursor is not None:
+            resp = self.client.get(self.url, data={"limit": "2", "cursor": cursor})
+            self.assertSuccess(resp)
+            data = resp.data["data"]
+            self.assertNotIn("total", data)
+            pages.append(data)
+            ids += [item["id"] for item in data["results"]]
+            cursor = data["next"]
+        self.assertEqual(ids, expected)
+        self.assertIsNone(pages[0]["prev"])
+
+        resp = self.client.get(self.url, data={"limit": "2", "cursor": pages[-1]["prev"]})
+        self.assertEqual([item["id"] for item in resp.data["data"]["results"]], expected[2:4])
+
+    def test_get_submission_list_by_invalid_cursor(self):
+        resp = self.client.get(self.url, data={"limit": "10", "cursor": "xxx"})
+        self.assertDictEqual(resp.data, {"error": "error", "data": "Invalid cursor"})
+
+
+class ContestSubmissionListTest(SubmissionPrepare):
+    def setUp(self):
+        self._create_problem_and_submission()
+        now = timezone.now()
+        self.contest = Contest.objects.create(title="test", description="test", real_time_rank=True, password=None,
+                                              rule_type=ContestRuleType.ACM, start_time=now - timedelta(hours=1),
+                                              end_time=now + timedelta(days=1), created_by=self.problem.created_by)
+        Problem.objects.filter(id=self.problem.id).update(contest=self.contest)
+        Submission.objects.filter(id=self.submission.id).update(contest=self.contest)
+        self.submission_data["contest_id"] = self.contest.id
+        # a regular user, whose permission on the submissions of others depends on the status of the contest
+        self.user = self.create_user("viewer", "viewer123")
+        self.url = self.reverse("contest_submission_list_api")
+
+    def test_get_contest_submission_list_queries(self):
+        data = {"limit": "10", "contest_id": self.contest.id}
+        # the first request fills the option, session and contest caches
+        self.client.get(self.url, data=data)
+        with CaptureQueriesContext(connection) as one_row:
+            self.assertSuccess(self.client.get(self.url, data=data))
+        for i in range(5):
+            user = self.create_user(f"user{i}", "test123", login=False)
+            Submission.objects.create_with_detail(**dict(self.submission_data, user_id=user.id, username=user.username))
+        Submission.objects.create_with_detail(**dict(self.submission_data, user_id=self.user.id, username=self.user.username))
+        with CaptureQueriesContext(connection) as seven_rows:
+            resp = self.client.get(self.url, data=data)
+        results = resp.data["data"]["results"]
+        self.assertEqual(len(results), 7)
+        self.assertEqual(len(one_row.captured_queries), len(seven_rows.captured_queries))
+        # only the own submission of the user is linked while the contest is underway
+        self.assertEqual([item["show_link"] for item in results], [True] + [False] * 6)
+
+
+class SubmissionQueryPlanTest(SubmissionPrepare):
+    """
+    Test tables are tiny and the planner would always pick sequential scans and sorts,
+    so they are disabled and any Seq Scan left in the plan means no index matches the query,
+    any Sort left in the plan of an ordered page means no index matches the order
+    """
+    def setUp(self):
+        self._create_problem_and_submission()
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_sort = off")
+
+    def assertIndexScan(self, query_set, index_name=None, ordered=False):
+        plan = query_set.explain()
+        self.assertNotIn("Seq Scan on submission", plan)
+        if index_name:
+            self.assertIn(index_name, plan)
+        if ordered:
+            self.assertNotIn("Sort", plan)
+
+    def test_submission_list_plans(self):
+        submissions = Submission.objects.filter(contest_id__isnull=True).order_by("-create_time", "-id")
+        # a page of paginate_data_by_cursor is read in index order
+        self.assertIndexScan(submissions[:11], "submission_public_time_idx", ordered=True)
+        self.assertIndexScan(submissions.filter(problem_id=self.problem.id)[:11], ordered=True)
+        self.assertIndexScan(submissions.filter(user_id=1))
+        self.assertIndexScan(submissions.filter(username__icontains="test"))
+
+    def test_contest_submission_list_plans(self):
+        submissions = Submission.objects.filter(contest_id=1).order_by("-create_time", "-id")
+        self.assertIndexScan(submissions[:11], "submission_contest_time_idx", ordered=True)
+        self.assertIndexScan(submissions.filter(user_id=1))
+
+    def test_username_search_plan(self):
+        self.assertIndexScan(Submission.objects.filter(username__icontains="test"), "submission_username_trgm_idx")
+
+
+class SubmissionDetailCompressionTest(SubmissionPrepare):
+    def setUp(self):
+        self._create_problem_and_submission()
+        self.info = {"err": None, "data": [{"cpu_time": i, "memory": 1024, "result": 0, "test_case": str(i)}
+                                           for i in range(1, 4)]}
+
+    def test_compressed_round_trip(self):
+        detail = SubmissionDetail.objects.get(submission=self.submission)
+        detail.info = self.info
+        detail.save()
+
+        detail = SubmissionDetail.objects.get(submission=self.submission)
+        self.assertIsNone(detail.raw_code)
+        self.assertIsNone(detail.raw_info)
+        self.assertEqual(detail.code, self.submission_data["code"])
+        self.assertEqual(detail.info, self.info)
+
+    def test_compress_raw_rows(self):
+        SubmissionDetail.objects.filter(submission=self.submission).update(
+            raw_code="raw code", raw_info=self.info, compressed_code=None, compressed_info=None)
+        last_id = compress_submission_detail_batch()
+        self.assertEqual(last_id, self.submission.id)
+        self.assertIsNone(compress_submission_detail_batch(last_id))
+
+        detail = SubmissionDetail.objects.get(submission=self.submission)
+        self.assertIsNone(detail.raw_code)
+        self.assertIsNotNone(detail.compressed_info)
+        self.assertEqual(detail.code, "raw code")
+        self.assertEqual(detail.info, self.info)
+
+
+class SubmissionArchiveTest(SubmissionPrepare):
+    def setUp(self):
+        self._create_problem_and_submission()
+        Submission.objects.filter(id=self.submission.id).update(create_time=datetime(2020, 1, 15, tzinfo=pytz.UTC))
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_dir.cleanup)
+
+    def _get_submission(self):
+        return Submission.objects.select_related("detail").get(id=self.submission.id)
+
+    def test_archive_and_rehydrate(self):
+        with override_settings(SUBMISSION_ARCHIVE_DIR=self.archive_dir.name):
+            archived = SubmissionArchiver().archive_before(datetime(2020, 3, 1, tzinfo=pytz.UTC))
+            self.assertEqual(archived, {"2020-01": 1, "2020-02": 0})
+            self.assertFalse(SubmissionDetail.objects.exists())
+
+            detail = load_submission_detail(self._get_submission())
+            self.assertEqual(detail.code, self.submission_data["code"])
+            self.assertTrue(SubmissionDetail.objects.filter(submission_id=self.submission.id).exists())
+
+            # archiving the month again keeps a single copy of the rehydrated submission
+            SubmissionArchiver().archive_before(datetime(2020, 2, 1, tzinfo=pytz.UTC))
+            self.assertEqual(load_submission_detail(self._get_submission()).code, self.submission_data["code"])
+
+    def test_archive_keeps_updated_detail(self):
+        delete_archived = SubmissionArchiver._delete_archived
+
+        def rejudge_then_delete(archiver, submission_ids, digests):
+            # a rejudge lands between the write of the archive and the delete
+            detail = SubmissionDetail.objects.get(submission_id=self.submission.id)
+            detail.info = {"err": None, "data": [{"result": 0}]}
+            detail.save()
+            return delete_archived(archiver, submission_ids, digests)
+
+        with override_settings(SUBMISSION_ARCHIVE_DIR=self.archive_dir.name), \
+                mock.patch.object(SubmissionArchiver, "_delete_archived", rejudge_then_delete):
+            archived = SubmissionArchiver().archive_before(datetime(2020, 2, 1, tzinfo=pytz.UTC))
+        self.assertEqual(archived, {"2020-01": 0})
+        self.assertEqual(load_submission_detail(self._get_submission()).info, {"err": None, "data": [{"result": 0}]})
+
+    def test_rehydrate_missing_archive(self):
+        SubmissionDetail.objects.all().delete()
+        with override_settings(SUBMISSION_ARCHIVE_DIR=self.archive_dir.name):
+            self.assertIsNone(load_submission_detail(self._get_submission()))
+
 
 @mock.patch("judge.tasks.judge_task.send")
 class SubmissionAPITest(SubmissionPrepare):
@@ -69,6 +283,35 @@ class SubmissionAPITest(SubmissionPrepare):
         self.assertSuccess(resp)
         judge_task.assert_called()
 
+    def test_get_submission(self, judge_task):
+        Submission.objects.filter(id=self.submission.id).update(shared=True)
+        resp = self.client.get(self.url, data={"id": self.submission.id})
+        self.assertSuccess(resp)
+        self.assertEqual(resp.data["data"]["code"], self.submission_data["code"])
+        self.assertNotIn("info", resp.data["data"])
+
+    def test_get_legacy_submission(self, judge_task):
+        self.assertEqual(len(self.submission.id), 13)
+        legacy = Submission.objects.create_with_detail(id=rand_str(), shared=True, **self.submission_data)
+        resp = self.client.get(self.url, data={"id": legacy.id})
+        self.assertSuccess(resp)
+        self.assertEqual(len(resp.data["data"]["id"]), 32)
+
+    def test_get_submission_status(self, judge_task):
+        resp = self.client.post(self.url, self.submission_data)
+        submission_id = resp.data["data"]["submission_id"]
+        url = self.reverse("submission_status_api")
+
+        resp = self.client.get(url, data={"ids": f"{submission_id},{self.submission.id}"})
+        self.assertSuccess(resp)
+        # the other submission belongs to the admin
+        self.assertDictEqual(resp.data["data"], {submission_id: {"result": JudgeStatus.PENDING}})
+
+        set_submission_status(submission_id, self.user.id, JudgeStatus.ACCEPTED, {"time_cost": 10, "memory_cost": 1024})
+        resp = self.client.get(url, data={"ids": submission_id})
+        self.assertDictEqual(resp.data["data"][submission_id],
+                             {"result": JudgeStatus.ACCEPTED, "time_cost": 10, "memory_cost": 1024})
+
     def test_create_submission_with_wrong_language(self, judge_task):
         self.submission_data.update({"language": "Python3"})
         resp = self.client.post(self.url, self.submission_data)
@@ -13,11 +13,18 @@ from utils.api import APIView, validate_serializer
 from utils.cache import cache
 from utils.captcha import Captcha
 from utils.throttling import TokenBucket
+from .archive import load_submission_detail
 from .models import Submission
+from .status import get_submission_statuses, set_submission_status
 from .serializers import (CreateSubmissionSerializer, SubmissionModelSerializer,
                           ShareSubmissionSerializer)
 from .serializers import SubmissionSafeModelSerializer, SubmissionListSerializer
 
+# columns used by SubmissionListSerializer and Submission.check_user_permission,
+# the problem row is joined only for its display id and permission columns
+LIST_FIELDS = ("id", "contest_id", "create_time", "user_id", "username", "result", "language", "shared",
+               "statistic_info", "problem__id", "problem___id", "problem__created_by_id", "problem__share_submission")
+
 
 class SubmissionAPI(APIView):
     def throttling(self, request):
@@ -65,13 +72,14 @@ class SubmissionAPI(APIView):
             return self.error("Problem not exist")
         if data["language"] not in problem.languages:
             return self.error(f"{data['language']} is now allowed in the problem")
-        submission = Submission.objects.create(user_id=request.user.id,
-                                               username=request.user.username,
-                                               language=data["language"],
-                                               code=data["code"],
-                                               problem_id=problem.id,
-                                               ip=request.session["ip"],
-                                               contest_id=data.get("contest_id"))
+        submission = Submission.objects.create_with_detail(user_id=request.user.id,
+                                                           username=request.user.username,
+                                                           language=data["language"],
+                                                           code=data["code"],
+                                                           problem_id=problem.id,
+                                                           ip=request.session["ip"],
+                                                           contest_id=data.get("contest_id"))
+        set_submission_status(submission.id, submission.user_id, submission.result)
         # use this for debug
         # JudgeDispatcher(submission.id, problem.id).judge()
         judge_task.send(submission.id, problem.id)
@@ -93,11 +101,13 @@ class SubmissionAPI(APIView):
         if not submission_id:
             return self.error("Parameter id doesn't exist")
         try:
-            submission = Submission.objects.select_related("problem").get(id=submission_id)
+            submission = Submission.objects.select_related("problem", "detail").get(id=submission_id)
         except Submission.DoesNotExist:
             return self.error("Submission doesn't exist")
         if not submission.check_user_permission(request.user):
             return self.error("No permission for this submission")
+        if load_submission_detail(submission) is None:
+            return self.error("Submission code is not available")
 
         if submission.problem.rule_type == ProblemRuleType.OI or request.user.is_admin_role():
             submission_data = SubmissionModelSerializer(submission).data
@@ -172,6 +182,13 @@ class SubmissionListAPI(APIView):
                 in_=openapi.IN_QUERY,
                 required=False,
                 type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                name="cursor",
+                in_=openapi.IN_QUERY,
+                required=False,
+                type=openapi.TYPE_STRING,
+                description="Keyset pagination, pass an empty cursor for the first page and then the next/prev cursor"
             )
         ]
     )
@@ -181,7 +198,7 @@ class SubmissionListAPI(APIView):
         if request.GET.get("contest_id"):
             return self.error("Parameter error")
 
-        submissions = Submission.objects.filter(contest_id__isnull=True).select_related("problem__created_by")
+        submissions = Submission.objects.filter(contest_id__isnull=True).select_related("problem").only(*LIST_FIELDS)
         problem_id = request.GET.get("problem_id")
         myself = request.GET.get("myself")
         result = request.GET.get("result")
@@ -198,7 +215,10 @@ class SubmissionListAPI(APIView):
             submissions = submissions.filter(username__icontains=username)
         if result:
             submissions = submissions.filter(result=result)
-        data = self.paginate_data(request, submissions)
+        if "cursor" in request.GET:
+            data = self.paginate_data_by_cursor(request, submissions)
+        else:
+            data = self.paginate_data(request, submissions)
         data["results"] = SubmissionListSerializer(data["results"], many=True, user=request.user).data
         return self.success(data)
 
@@ -245,6 +265,13 @@ class ContestSubmissionListAPI(APIView):
             ),
             openapi.Parameter(
                 name="page", in_=openapi.IN_QUERY, required=False, type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                name="cursor",
+                in_=openapi.IN_QUERY,
+                required=False,
+                type=openapi.TYPE_STRING,
+                description="Keyset pagination, pass an empty cursor for the first page and then the next/prev cursor"
             )
         ]
     )
@@ -254,7 +281,7 @@ class ContestSubmissionListAPI(APIView):
             return self.error("Limit is needed")
 
         contest = self.contest
-        submissions = Submission.objects.filter(contest_id=contest.id).select_related("problem__created_by")
+        submissions = Submission.objects.filter(contest_id=contest.id).select_related("problem").only(*LIST_FIELDS)
         problem_id = request.GET.get("problem_id")
         myself = request.GET.get("myself")
         result = request.GET.get("result")
@@ -282,7 +309,10 @@ class ContestSubmissionListAPI(APIView):
             if not contest.real_time_rank and not request.user.is_contest_admin(contest):
                 submissions = submissions.filter(user_id=request.user.id)
 
-        data = self.paginate_data(request, submissions)
+        if "cursor" in request.GET:
+            data = self.paginate_data_by_cursor(request, submissions)
+        else:
+            data = self.paginate_data(request, submissions)
         data["results"] = SubmissionListSerializer(data["results"], many=True, user=request.user).data
         return self.success(data)
 
@@ -301,3 +331,43 @@ class SubmissionExistsAPI(APIView):
         return self.success(request.user.is_authenticated and
                             Submission.objects.filter(problem_id=request.GET["problem_id"],
                                                       user_id=request.user.id).exists())
+
+
+class SubmissionStatusAPI(APIView):
+    # ids polled in one request
+    batch_limit = 50
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                name="ids", in_=openapi.IN_QUERY, required=True, type=openapi.TYPE_STRING,
+                description="Comma separated submission ids"
+            )
+        ]
+    )
+    @login_required
+    def get(self, request):
+        """
+        Judge status of several submissions, read from the status cache maintained by the dispatcher
+        """
+        ids = [item for item in request.GET.get("ids", "").split(",") if item]
+        if not ids:
+            return self.error("Parameter ids is required")
+        if len(ids) > self.batch_limit:
+            return self.error(f"At most {self.batch_limit} submissions at a time")
+
+        statuses = get_submission_statuses(ids)
+        missing = [item for item in ids if item not in statuses]
+        if missing:
+            submissions = Submission.objects.filter(id__in=missing).values_list("id", "user_id", "result", "statistic_info")
+            for submission_id, user_id, result, statistic_info in submissions:
+                statuses[submission_id] = set_submission_status(submission_id, user_id, result, statistic_info)
+
+        user = request.user
+        see_all = user.is_super_admin() or user.can_mgmt_all_problem()
+        ret = {}
+        for submission_id, status in statuses.items():
+            owner_id = status.pop("user_id")
+            if see_all or owner_id == user.id:
+                ret[submission_id] = status
+        return self.success(ret)
@@ -1,16 +1,28 @@
+import base64
+import datetime
 import functools
+import hashlib
 import io
 import json
 import logging
 
+from django.db import connections
+from django.db.models import Q, QuerySet
 from django.http import HttpResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
 
+from utils.cache import cache
+from utils.constants import CacheKey
+
 logger = logging.getLogger("")
 
+# counting fewer rows than this is cheap enough to be done exactly on every request
+APPROXIMATE_COUNT_THRESHOLD = 100000
+COUNT_CACHE_TIMEOUT = 30
+
 
 class APIError(Exception):
     def __init__(self, msg, err=None):
@@ -111,12 +123,7 @@ class APIView(View):
         :param object_serializer: Used to serialize the query set, if it is None, slice the query set directly
         :return:
         """
-        try:
-            limit = int(request.GET.get("limit", "10"))
-        except ValueError:
-            limit = 10
-        if limit < 0 or limit > 250:
-            limit = 10
+        limit = self._get_limit(request)
         try:
             offset = int(request.GET.get("offset", "0"))
         except ValueError:
@@ -124,15 +131,106 @@ class APIView(View):
         if offset < 0:
             offset = 0
         results = query_set[offset:offset + limit]
+        count, approximate = self._count(request, query_set)
         if object_serializer:
-            count = query_set.count()
             results = object_serializer(results, many=True).data
-        else:
-            count = query_set.count()
         data = {"results": results,
-                "total": count}
+                "total": count,
+                "approximate_total": approximate}
         return data
 
+    @staticmethod
+    def _count(request, query_set):
+        """
+        Exact counts of large tables cost more than the page itself, so above APPROXIMATE_COUNT_THRESHOLD
+        unfiltered query sets use the planner estimate and filtered ones reuse a recent exact count.
+        Pass exact_total=1 to always count.
+        :return: (count, whether the count is approximate)
+        """
+        if not isinstance(query_set, QuerySet):
+            return len(query_set), False
+        if request.GET.get("exact_total") == "1":
+            return query_set.count(), False
+
+        query = query_set.query
+        if not query.where and not query.distinct and query.combinator is None:
+            with connections[query_set.db].cursor() as cursor:
+                cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [query_set.model._meta.db_table])
+                row = cursor.fetchone()
+            # reltuples is 0 or -1 until the table is analyzed
+            if row and row[0] >= APPROXIMATE_COUNT_THRESHOLD:
+                return int(row[0]), True
+            return query_set.count(), False
+
+        sql, params = query.sql_with_params()
+        signature = hashlib.md5(f"{sql}{params!r}".encode("utf-8")).hexdigest()
+        cache_key = f"{CacheKey.paginate_count}:{query_set.model._meta.db_table}:{signature}"
+        count = cache.get(cache_key)
+        if count is not None:
+            return count, True
+        count = query_set.count()
+        if count >= APPROXIMATE_COUNT_THRESHOLD:
+            cache.set(cache_key, count, timeout=COUNT_CACHE_TIMEOUT)
+        return count, False
+
+    @staticmethod
+    def _get_limit(request):
+        try:
+            limit = int(request.GET.get("limit", "10"))
+        except ValueError:
+            limit = 10
+        if limit < 0 or limit > 250:
+            limit = 10
+        return limit
+
+    @staticmethod
+    def _encode_cursor(obj, direction):
+        data = {"t": obj.create_time.isoformat(), "id": obj.id, "d": direction}
+        return base64.urlsafe_b64encode(json.dumps(data).encode("utf-8")).decode("utf-8")
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode("utf-8")))
+            return datetime.datetime.fromisoformat(data["t"]), data["id"], data["d"]
+        except Exception:
+            raise APIError("Invalid cursor")
+
+    def paginate_data_by_cursor(self, request, query_set):
+        """
+        Keyset pagination on (create_time, id) in descending order, the cost of a page doesn't depend on its depth.
+        Pass an empty cursor to get the first page, then the next/prev cursor of the response.
+        :param request: django's request
+        :param query_set: django model query set, the model must have create_time and id
+        :return: {"results": [...], "next": cursor or None, "prev": cursor or None}, no total is counted
+        """
+        limit = self._get_limit(request)
+        cursor = request.GET.get("cursor")
+        direction = "next"
+        if cursor:
+            create_time, id, direction = self._decode_cursor(cursor)
+            if direction == "next":
+                query_set = query_set.filter(Q(create_time__lt=create_time) | Q(create_time=create_time, id__lt=id),
+                                             create_time__lte=create_time)
+            else:
+                query_set = query_set.filter(Q(create_time__gt=create_time) | Q(create_time=create_time, id__gt=id),
+                                             create_time__gte=create_time)
+
+        if direction == "next":
+            results = list(query_set.order_by("-create_time", "-id")[:limit + 1])
+            has_more = len(results) > limit
+            results = results[:limit]
+            has_next, has_prev = has_more, bool(cursor)
+        else:
+            results = list(query_set.order_by("create_time", "id")[:limit + 1])
+            has_more = len(results) > limit
+            results = results[:limit][::-1]
+            has_next, has_prev = True, has_more
+
+        return {"results": results,
+                "next": self._encode_cursor(results[-1], "next") if results and has_next else None,
+                "prev": self._encode_cursor(results[0], "prev") if results and has_prev else None}
+
     def dispatch(self, request, *args, **kwargs):
         if self.parser_classes:
             try:
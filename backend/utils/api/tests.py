@@ -3,11 +3,18 @@ from django.test.testcases import TestCase
 from rest_framework.test import APIClient
 
 from account.models import AdminType, ProblemPermission, User, UserProfile
+from utils.cache import cache
 
 
 class APITestCase(TestCase):
     client_class = APIClient
 
+    def _pre_setup(self):
+        super()._pre_setup()
+        # the test database restarts its id sequences, rows cached by a previous run must not leak in.
+        # manage.py test uses a redis database of its own, see CACHES in oj/settings.py
+        cache.clear()
+
     def create_user(self, username, password, admin_type=AdminType.REGULAR_USER, login=True,
                     problem_permission=ProblemPermission.NONE):
         user = User.objects.create(username=username, admin_type=admin_type, problem_permission=problem_permission)
@@ -1,3 +1,5 @@
+import time
+
 from django.core.cache import cache, caches  # noqa
 from django.conf import settings  # noqa
 
@@ -25,3 +27,34 @@ class MyRedisCache(RedisCache):
 
     def __getattr__(self, item):
         return getattr(self.client, item)
+
+
+def get_or_build(key, build, timeout, lock_timeout=10, wait_timeout=3):
+    """
+    Single flight cache read: on a miss only one worker calls build() and stores the result,
+    concurrent misses wait for that value instead of all hitting the database.
+    build() must not return None
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            value = build()
+            cache.set(key, value, timeout=timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.time() + wait_timeout
+    while time.time() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key)
+        if value is not None:
+            return value
+        # the builder failed or finished without storing a value
+        if cache.get(lock_key) is None:
+            break
+    return build()
@@ -24,6 +24,14 @@ class ContestRuleType(Choices):
 class CacheKey:
     waiting_queue = "waiting_queue"
     contest_rank_cache = "contest_rank_cache"
+    contest_cache = "contest_cache"
+    contest_problems_cache = "contest_problems_cache"
+    paginate_count = "paginate_count"
+    problem_list_cache = "problem_list_cache"
+    problem_list_version = "problem_list_version"
+    problem_tags_cache = "problem_tags_cache"
+    submission_status = "submission_status"
+    test_case_job = "test_case_job"
     website_config = "website_config"
 
 
@@ -0,0 +1,64 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Length
+
+from problem.models import Problem
+from utils.xss_filter import XSSHtml, clean_html
+
+RICH_TEXT_FIELDS = ("description", "input_description", "output_description", "hint")
+
+
+class Command(BaseCommand):
+    help = "Time the rich text sanitizer on the statements of the problems in the database or on a saved corpus"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=500, help="number of problems, the largest first")
+        parser.add_argument("--corpus", type=str, help="read the corpus from this json lines file")
+        parser.add_argument("--dump", type=str, help="save the corpus to this json lines file and exit")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def _load_corpus(self, options):
+        if options["corpus"]:
+            with open(options["corpus"], encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        problems = Problem.objects.annotate(size=Length("description")).order_by("-size") \
+            .values_list(*RICH_TEXT_FIELDS)[:options["limit"]]
+        return [text for fields in problems for text in fields if text]
+
+    def _time(self, function, corpus, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for text in corpus:
+                function(text)
+            cost = time.perf_counter() - start
+            best = cost if best is None else min(best, cost)
+        return best
+
+    def handle(self, *args, **options):
+        corpus = self._load_corpus(options)
+        if options["dump"]:
+            with open(options["dump"], "w", encoding="utf-8") as f:
+                for text in corpus:
+                    f.write(json.dumps(text, ensure_ascii=False) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Saved {len(corpus)} documents to {options['dump']}"))
+            return
+        if not corpus:
+            self.stdout.write(self.style.ERROR("Empty corpus"))
+            exit(1)
+
+        def parse(text):
+            with XSSHtml() as parser:
+                parser.clean(text)
+
+        size = sum(len(text) for text in corpus) / 1024 / 1024
+        parse_cost = self._time(parse, corpus, options["repeat"])
+        # the first pass fills the memo
+        for text in corpus:
+            clean_html(text)
+        memo_cost = self._time(clean_html, corpus, options["repeat"])
+        self.stdout.write(self.style.SUCCESS(f"{len(corpus)} documents, {size:.2f}MB"))
+        self.stdout.write(self.style.SUCCESS(f"parse: {parse_cost:.3f}s, {size / parse_cost:.2f}MB/s"))
+        self.stdout.write(self.style.SUCCESS(f"memo hit: {memo_cost:.3f}s, {size / memo_cost:.2f}MB/s"))
@@ -1,5 +1,7 @@
 # flake8: noqa
+from problem.cache import bump_problem_list_version
 from problem.models import Problem, ProblemTag, ProblemDifficulty, ProblemRuleType
+from problem.search import update_search_vector
 from account.models import User, UserProfile, AdminType, ProblemPermission
 from django.conf import settings
 import os
@@ -143,42 +145,53 @@ def import_problems():
     print("import problems using prefix: %s? (yes/no)" % prefix)
     if get_input_result():
         default_creator = User.objects.first()
-        for data in problems:
-            data["_id"] = prefix + str(data.pop("id"))
-            if Problem.objects.filter(_id=data["_id"]).exists():
-                print("%s has the same display_id with the db problem" % data["title"])
-                continue
-            try:
-                creator_id = \
-                    User.objects.filter(username=users[data["created_by"]]["username"]).values_list("id", flat=True)[0]
-            except (User.DoesNotExist, IndexError):
-                print("The origin creator does not exist, set it to default_creator")
-                creator_id = default_creator.id
-            data["created_by_id"] = creator_id
-            data.pop("created_by")
-            data["difficulty"] = ProblemDifficulty.Level1
-            if data["spj_language"]:
-                data["spj_language"] = languages_map[data["spj_language"]]
-            data["samples"] = json.loads(data["samples"])
-            data["languages"] = ["C", "C++"]
-            test_case_score = get_test_case_score(data["test_case_id"])
-            if not test_case_score:
-                print("%s test_case files don't exist, omitted" % data["title"])
-                continue
-            data["test_case_score"] = test_case_score
-            data["rule_type"] = ProblemRuleType.ACM
-            data["template"] = {}
-            data.pop("total_submit_number")
-            data.pop("total_accepted_number")
-            tag_ids = data.pop("tags")
-            problem = Problem.objects.create(**data)
-            problem.create_time = data["create_time"]
-            problem.save()
-            for tag_id in tag_ids:
-                tag, _ = ProblemTag.objects.get_or_create(name=tags[tag_id])
-                problem.tags.add(tag)
-            i += 1
-            print("%s imported successfully" % data["title"])
+        imported_ids = []
+        try:
+            for data in problems:
+                data["_id"] = prefix + str(data.pop("id"))
+                if Problem.objects.filter(_id=data["_id"]).exists():
+                    print("%s has the same display_id with the db problem" % data["title"])
+                    continue
+                try:
+                    creator_id = \
+                        User.objects.filter(username=users[data["created_by"]]["username"]).values_list("id", flat=True)[0]
+                except (User.DoesNotExist, IndexError):
+                    print("The origin creator does not exist, set it to default_creator")
+                    creator_id = default_creator.id
+                data["created_by_id"] = creator_id
+                data.pop("created_by")
+                data["difficulty"] = ProblemDifficulty.Level1
+                if data["spj_language"]:
+                    data["spj_language"] = languages_map[data["spj_language"]]
+                data["samples"] = json.loads(data["samples"])
+                data["languages"] = ["C", "C++"]
+                test_case_score = get_test_case_score(data["test_case_id"])
+                if not test_case_score:
+                    print("%s test_case files don't exist, omitted" % data["title"])
+                    continue
+                data["test_case_score"] = test_case_score
+                data["rule_type"] = ProblemRuleType.ACM
+                data["template"] = {}
+                data.pop("total_submit_number")
+                data.pop("total_accepted_number")
+                tag_ids = data.pop("tags")
+                problem = Problem.objects.create(**data)
+                imported_ids.append(problem.id)
+                problem.create_time = data["create_time"]
+                problem.save()
+                for tag_id in tag_ids:
+                    tag, _ = ProblemTag.objects.get_or_create(name=tags[tag_id])
+                    problem.tags.add(tag)
+                i += 1
+                print("%s imported successfully" % data["title"])
+        finally:
+            # also after a failed import, the problems and tags created so far are visible
+            if imported_ids:
+                # the vector includes the tags, it is computed once they are all set
+                update_search_vector(*imported_ids)
+                # the cached pages of the problem list and the tag counts, keyed by the same version,
+                # don't have the imported problems
+                bump_problem_list_version()
     print("%d problems have successfully imported" % i)
 
 
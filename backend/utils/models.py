@@ -1,10 +1,9 @@
 from django.contrib.postgres.fields import JSONField  # NOQA
 from django.db import models
 
-from utils.xss_filter import XSSHtml
+from utils.xss_filter import clean_html
 
 
 class RichTextField(models.TextField):
     def get_prep_value(self, value):
-        with XSSHtml() as parser:
-            return parser.clean(value or "")
+        return clean_html(value or "")
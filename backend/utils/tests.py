@@ -0,0 +1,36 @@
+from django.test import SimpleTestCase
+
+from .shortcuts import time_sortable_id
+from .xss_filter import XSSHtml, _clean_memo, _memo_key, clean_html
+
+
+class XSSHtmlTest(SimpleTestCase):
+    def clean(self, content):
+        with XSSHtml() as parser:
+            return parser.clean(content)
+
+    def test_clean(self):
+        self.assertEqual(self.clean('<p onclick="alert(1)" class="x">a<script>b</script></p>'), '<p class="x">ab</p>')
+        self.assertEqual(self.clean('<a href="javascript:alert(1)" target="self">x</a>'),
+                         '<a href="http://javascript:alert(1)">x</a>')
+        # the last value of a repeated attribute wins
+        self.assertEqual(self.clean('<img src="/a.png" onerror=alert(1) width=1 width=2>'),
+                         '<img src="/a.png" width="2" />')
+        self.assertEqual(self.clean('<span style="width: expression(alert(1))">\'</span>'),
+                         '<span style="width: _(alert(1))">&#039;</span>')
+
+    def test_clean_html_memo(self):
+        content = '<table border="1"><tr><td>1 &lt; 2</td></tr></table>'
+        html = clean_html(content)
+        self.assertEqual(html, self.clean(content))
+        self.assertEqual(_clean_memo.get(_memo_key(content))[0], html)
+        self.assertEqual(clean_html(content), html)
+
+
+class TimeSortableIdTest(SimpleTestCase):
+    def test_unique_and_sorted(self):
+        # far more ids per millisecond than the 22 random bits can keep apart
+        ids = [time_sortable_id() for _ in range(100000)]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(sorted(ids), ids)
+        self.assertTrue(all(len(item) == 13 for item in ids))
@@ -25,8 +25,10 @@ Python 2.6+ or 3.2+
 Cannot defense xss in browser which is belowed IE7
 浏览器版本：IE7+ 或其他浏览器，无法防御IE6及以下版本浏览器中的XSS
 """
+import hashlib
 import re
-import copy
+import threading
+from collections import OrderedDict
 from html.parser import HTMLParser
 
 
@@ -45,13 +47,18 @@ class XSSHtml(HTMLParser):
         "table": ["border", "cellpadding", "cellspacing"],
         "font": ["color"]
     }
+    url_pattern = re.compile(r"(^(http|https|ftp)://.+)|(^/)", re.I | re.S)
+    style_escape_pattern = re.compile(r"(\\|&#|/\*|\*/)")
+    style_expression_pattern = re.compile(r"e.*x.*p.*r.*e.*s.*s.*i.*o.*n")
 
     def __init__(self, allows=[]):
         HTMLParser.__init__(self)
-        self.allow_tags = allows if allows else self.allow_tags
+        self.allow_tags = frozenset(allows if allows else self.allow_tags)
         self.result = []
         self.start = []
         self.data = []
+        # allowed attributes of every tag, looked up once per tag instead of once per attribute
+        self._tag_attrs = {}
 
     def __enter__(self):
         return self
@@ -67,9 +74,7 @@ class XSSHtml(HTMLParser):
         """
         Get the safe html code
         """
-        for i in range(0, len(self.result)):
-            if self.result[i].strip('\n'):
-                self.data.append(self.result[i])
+        self.data.extend(item for item in self.result if item.strip('\n'))
         return ''.join(self.data)
 
     def handle_startendtag(self, tag, attrs):
@@ -81,24 +86,16 @@ class XSSHtml(HTMLParser):
         end_diagonal = ' /' if tag in self.nonend_tags else ''
         if not end_diagonal:
             self.start.append(tag)
-        attdict = {}
-        for attr in attrs:
-            attdict[attr[0]] = attr[1]
 
-        attdict = self._wash_attr(attdict, tag)
-        if hasattr(self, "node_%s" % tag):
-            attdict = getattr(self, "node_%s" % tag)(attdict)
-        else:
-            attdict = self.node_default(attdict)
+        attdict = self._wash_attr(attrs, tag)
+        node = getattr(self, "node_" + tag, None)
+        attdict = node(attdict) if node else self.node_default(attdict)
 
-        attrs = []
-        for (key, value) in attdict.items():
-            attrs.append('%s="%s"' % (key, self._htmlspecialchars(value)))
-        attrs = (' ' + ' '.join(attrs)) if attrs else ''
+        attrs = ''.join(' %s="%s"' % (key, self._htmlspecialchars(value)) for key, value in attdict.items())
         self.result.append('<' + tag + attrs + end_diagonal + '>')
 
     def handle_endtag(self, tag):
-        if self.start and tag == self.start[len(self.start) - 1]:
+        if self.start and tag == self.start[-1]:
             self.result.append('</' + tag + '>')
             self.start.pop()
 
@@ -142,16 +139,15 @@ class XSSHtml(HTMLParser):
         return attrs
 
     def _true_url(self, url):
-        prog = re.compile(r"(^(http|https|ftp)://.+)|(^/)", re.I | re.S)
-        if prog.match(url):
+        if self.url_pattern.match(url):
             return url
         else:
             return "http://%s" % url
 
     def _true_style(self, style):
         if style:
-            style = re.sub(r"(\\|&#|/\*|\*/)", "_", style)
-            style = re.sub(r"e.*x.*p.*r.*e.*s.*s.*i.*o.*n", "_", style)
+            style = self.style_escape_pattern.sub("_", style)
+            style = self.style_expression_pattern.sub("_", style)
         return style
 
     def _get_style(self, attrs):
@@ -165,15 +161,14 @@ class XSSHtml(HTMLParser):
         return attrs
 
     def _wash_attr(self, attrs, tag):
-        if tag in self.tags_own_attrs:
-            other = self.tags_own_attrs.get(tag)
-        else:
-            other = []
-        if attrs:
-            for key, value in copy.deepcopy(attrs).items():
-                if key not in self.common_attrs + other:
-                    del attrs[key]
-        return attrs
+        """
+        :param attrs: list of (name, value) from the parser, the last value of a repeated attribute wins
+        :return: dict of the allowed attributes
+        """
+        allowed = self._tag_attrs.get(tag)
+        if allowed is None:
+            allowed = self._tag_attrs[tag] = frozenset(self.common_attrs + self.tags_own_attrs.get(tag, []))
+        return {key: value for key, value in attrs if key in allowed}
 
     def _common_attr(self, attrs):
         attrs = self._get_style(attrs)
@@ -197,6 +192,59 @@ class XSSHtml(HTMLParser):
             .replace("'", "&#039;")
 
 
+class _CleanMemo(object):
+    """
+    LRU of sanitized html keyed by the hash of the input, bounded by the total size of the kept inputs and outputs
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value, size):
+        if size > self.max_size:
+            return
+        with self.lock:
+            if key in self.items:
+                return
+            self.items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, old_size) = self.items.popitem(last=False)
+                self.size -= old_size
+
+
+# problem statements are saved several times per edit and import, with the same html
+_clean_memo = _CleanMemo(max_size=16 * 1024 * 1024)
+
+
+def _memo_key(content):
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+
+
+def clean_html(content):
+    """
+    XSSHtml().clean with the default allowed tags, unchanged html is not parsed again
+    """
+    key = _memo_key(content)
+    hit = _clean_memo.get(key)
+    if hit is not None:
+        return hit[0]
+    with XSSHtml() as parser:
+        html = parser.clean(content)
+    _clean_memo.set(key, html, len(content) + len(html))
+    return html
+
+
 if "__main__" == __name__:
     with XSSHtml() as parser:
         ret = parser.clean("""<p><img src=1 onerror=alert(/xss/)></p><div class="left">